@@ -0,0 +1,80 @@
+"""
+HyperLogLog sketches for approximate distinct counts.
+
+A sketch with precision ``p`` keeps ``2 ** p`` one-byte registers, so memory
+is fixed no matter how many values are added, and the relative standard
+error is about ``1.04 / sqrt(2 ** p)``. Sketches with the same precision
+merge by taking the register-wise maximum, which is what makes per-day
+sketches combinable into arbitrary ranges.
+"""
+import hashlib
+import math
+
+
+DEFAULT_PRECISION = 14
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.size)
+        else:
+            if len(registers) != self.size:
+                raise ValueError('register count does not match precision')
+            self.registers = bytearray(registers)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.size)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('cannot merge sketches with different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        if self.size == 16:
+            alpha = 0.673
+        elif self.size == 32:
+            alpha = 0.697
+        elif self.size == 64:
+            alpha = 0.709
+        else:
+            alpha = 0.7213 / (1 + 1.079 / self.size)
+
+        estimate = alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Small-range correction (linear counting)
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes([self.precision]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        return cls(precision=data[0], registers=data[1:])
+
+    @classmethod
+    def merged(cls, blobs, precision=DEFAULT_PRECISION):
+        """Merge serialized sketches; an empty input gives an empty sketch."""
+        result = cls(precision)
+        for blob in blobs:
+            result.merge(cls.from_bytes(blob))
+        return result
@@ -0,0 +1,142 @@
+"""
+In-process ingestion pipeline for UserActivity events.
+
+Request threads only append to a bounded ring buffer; a daemon thread drains
+it and writes the events with ``bulk_create``. When the buffer is full the
+oldest events are dropped and counted instead of blocking the request.
+"""
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_ipv46_address
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.common.utils import get_client_ip, get_user_agent
+
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityBuffer:
+    """
+    Bounded buffer of pending UserActivity rows plus its flusher thread.
+    """
+
+    def __init__(self, capacity, batch_size, flush_interval):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.events = deque(maxlen=capacity)
+        self.dropped = 0
+        self.flushed = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def push(self, activity):
+        with self._lock:
+            if len(self.events) == self.capacity:
+                self.dropped += 1
+            self.events.append(activity)
+            pending = len(self.events)
+
+        if self._thread is None:
+            self.start()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name='activity-flusher',
+                daemon=True
+            )
+            self._thread.start()
+
+    def drain(self):
+        with self._lock:
+            count = min(len(self.events), self.batch_size)
+            return [self.events.popleft() for _ in range(count)]
+
+    def flush(self):
+        """Write everything that is currently buffered."""
+        from .models import UserActivity
+
+        while True:
+            batch = self.drain()
+            if not batch:
+                return
+            # Rollups find new rows by insert time; created_at is when the
+            # event happened, which can be long before the row is written.
+            inserted_at = timezone.now()
+            for activity in batch:
+                activity.inserted_at = inserted_at
+            try:
+                UserActivity.objects.bulk_create(batch, batch_size=self.batch_size)
+            except Exception:
+                logger.exception('Failed to write %d user activities', len(batch))
+                with self._lock:
+                    self.dropped += len(batch)
+            else:
+                with self._lock:
+                    self.flushed += len(batch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'buffered': len(self.events),
+                'dropped': self.dropped,
+                'flushed': self.flushed,
+            }
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+buffer = ActivityBuffer(
+    capacity=getattr(settings, 'ANALYTICS_ACTIVITY_BUFFER_SIZE', 50000),
+    batch_size=getattr(settings, 'ANALYTICS_ACTIVITY_BATCH_SIZE', 2000),
+    flush_interval=getattr(settings, 'ANALYTICS_ACTIVITY_FLUSH_INTERVAL', 5),
+)
+atexit.register(buffer.flush)
+
+
+def record_activity(request, user, action, target=None, details=None):
+    """
+    Queue a UserActivity for ``user``. Never writes to the database.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from .models import UserActivity
+
+    ip_address = get_client_ip(request)
+    try:
+        validate_ipv46_address(ip_address)
+    except ValidationError:
+        ip_address = '0.0.0.0'
+
+    activity = UserActivity(
+        user_id=user.id,
+        action=action,
+        details=details or {},
+        ip_address=ip_address,
+        user_agent=get_user_agent(request),
+        created_at=timezone.now(),
+    )
+    if target is not None:
+        model, object_id = target
+        activity.target_content_type = ContentType.objects.get_for_model(model)
+        activity.target_object_id = object_id
+
+    buffer.push(activity)
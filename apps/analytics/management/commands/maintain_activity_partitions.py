@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.analytics import partitions
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming user_activities partitions and apply the retention policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=settings.ANALYTICS_ACTIVITY_RETENTION_MONTHS,
+            help='Keep this many months of activity; 0 keeps everything'
+        )
+        parser.add_argument(
+            '--archive',
+            action='store_true',
+            help='Detach expired partitions instead of dropping them'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        if partitions.is_partitioned():
+            created = partitions.ensure_partitions(now, options['months_ahead'])
+            for name in created:
+                self.stdout.write(f'Created partition {name}')
+        else:
+            self.stdout.write('user_activities is not partitioned; using batched deletes for retention')
+
+        retention_months = options['retention_months']
+        if retention_months <= 0:
+            return
+
+        cutoff = partitions.add_months(partitions.month_start(now), -retention_months)
+        result = partitions.apply_retention(cutoff, archive=options['archive'])
+        if isinstance(result, list):
+            verb = 'Archived' if options['archive'] else 'Dropped'
+            for name in result:
+                self.stdout.write(f'{verb} partition {name}')
+        else:
+            self.stdout.write(f'Deleted {result} activities older than {cutoff:%Y-%m}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.analytics.rollups import roll_up
+
+
+class Command(BaseCommand):
+    help = 'Fold new activities and creations into the hourly/daily analytics rollups (run every few minutes)'
+
+    def handle(self, *args, **options):
+        roll_up()
+        self.stdout.write('Analytics rollups updated')
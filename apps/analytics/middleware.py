@@ -0,0 +1,62 @@
+"""
+Middleware that captures user activity without writing to the database.
+"""
+from apps.attachments.downloads import counts_as_download
+
+from .ingest import record_activity
+
+
+class ActivityTrackingMiddleware:
+    """
+    Queue a UserActivity for successful requests to tracked endpoints.
+
+    ``TRACKED_VIEWS`` maps URL names to ``(action, model path)``; the target
+    object ID is taken from the ``pk`` URL kwarg. Runs after the view so the
+    user authenticated by DRF (token or session) is available. Downloads
+    are recorded by the rule that counts them (``counts_as_download``):
+    the range that starts the file, or the redirect to the storage URL.
+    """
+    TRACKED_VIEWS = {
+        'finding-detail': ('view', 'findings.Finding'),
+        'publication-detail': ('view', 'publications.Publication'),
+        'project-detail': ('view', 'projects.Project'),
+        'experiment-detail': ('view', 'experiments.Experiment'),
+        'attachment-download': ('download', 'attachments.Attachment'),
+        'search': ('search', None),
+    }
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if request.method == 'GET' and response.status_code in (200, 206, 302):
+            self.track(request, response)
+        return response
+
+    def track(self, request, response):
+        match = request.resolver_match
+        tracked = self.TRACKED_VIEWS.get(match.url_name) if match else None
+        user = getattr(request, 'user', None)
+        if tracked is None or user is None or not user.is_authenticated:
+            return
+
+        action, model_path = tracked
+        if action == 'download':
+            if not counts_as_download(request, response):
+                return
+        elif response.status_code != 200:
+            return
+        target = None
+        details = {}
+        if model_path and 'pk' in match.kwargs:
+            from django.apps import apps
+            target = (apps.get_model(model_path), match.kwargs['pk'])
+        if action == 'search':
+            details = {
+                'q': request.GET.get('q', ''),
+                'type': request.GET.get('type', 'all'),
+            }
+
+        record_activity(request, user, action, target=target, details=details)
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_activity_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['created_at'], name='user_act_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'created_at'], name='user_act_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:45
+
+from django.db import migrations
+
+
+def partition_user_activities(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from apps.analytics.partitions import partition_table
+    partition_table()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_activity_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_user_activities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivitySketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('scope', models.CharField(max_length=50)),
+                ('sketch', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'analytics_sketches',
+                'unique_together': {('scope', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:42
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0007_activity_sketches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollupwatermark',
+            name='counted_before',
+            field=models.DateTimeField(blank=True, help_text='Every row inserted before this has been counted', null=True),
+        ),
+        # Existing rows stay NULL: they were counted by row ID already.
+        migrations.AddField(
+            model_name='useractivity',
+            name='inserted_at',
+            field=models.DateTimeField(editable=False, help_text='When the row was written; rollups scan by this', null=True),
+        ),
+        migrations.AlterField(
+            model_name='useractivity',
+            name='inserted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='When the row was written; rollups scan by this', null=True),
+        ),
+        migrations.AlterField(
+            model_name='rollupwatermark',
+            name='last_id',
+            field=models.BigIntegerField(default=0, help_text='Last row ID counted before counted_before was used'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['inserted_at'], name='user_act_inserted_idx'),
+        ),
+    ]
@@ -2,11 +2,26 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.utils import timezone
 
 
 User = get_user_model()
 
 
+class UserActivityQuerySet(models.QuerySet):
+    def created_between(self, start=None, end=None):
+        """
+        Half-open ``[start, end)`` range on ``created_at``. Keeping an explicit
+        bound on the partition key lets PostgreSQL prune monthly partitions.
+        """
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=start)
+        if end is not None:
+            queryset = queryset.filter(created_at__lt=end)
+        return queryset
+
+
 class UserActivity(models.Model):
     ACTION_CHOICES = [
         ('view', 'View'),
@@ -27,11 +42,20 @@ class UserActivity(models.Model):
     details = models.JSONField(default=dict, blank=True)
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    inserted_at = models.DateTimeField(default=timezone.now, null=True, editable=False,
+                                       help_text="When the row was written; rollups scan by this")
+
+    objects = UserActivityQuerySet.as_manager()
 
     class Meta:
         db_table = 'user_activities'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='user_act_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='user_act_user_created_idx'),
+            models.Index(fields=['inserted_at'], name='user_act_inserted_idx'),
+        ]
 
     @property
     def target_type(self):
@@ -43,3 +67,75 @@ class UserActivity(models.Model):
 
     def __str__(self):
         return f"{self.user.full_name} {self.action} at {self.created_at}"
+
+
+class AnalyticsRollup(models.Model):
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    metric = models.CharField(max_length=50)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_rollups'
+        ordering = ['bucket']
+        unique_together = ['granularity', 'metric', 'bucket']
+
+    def __str__(self):
+        return f"{self.metric} {self.granularity} {self.bucket}: {self.value}"
+
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0, help_text="Last row ID counted before counted_before was used")
+    counted_before = models.DateTimeField(null=True, blank=True,
+                                          help_text="Every row inserted before this has been counted")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_rollup_watermarks'
+
+    def __str__(self):
+        return f"{self.name}: {self.counted_before or self.last_id}"
+
+    def new_rows(self, queryset, inserted_field, settled_before):
+        """
+        Rows of ``queryset`` inserted since the previous run and before
+        ``settled_before``, judged by ``inserted_field``: the time the row
+        was written, not the time the event happened.
+        """
+        window = {f'{inserted_field}__lt': settled_before}
+        if self.counted_before is not None:
+            return queryset.filter(**window, **{f'{inserted_field}__gte': self.counted_before})
+        # Watermarks from before counted_before existed hold the last row ID;
+        # older rows may have no insert time.
+        return queryset.filter(
+            models.Q(**window) | models.Q(**{f'{inserted_field}__isnull': True}), id__gt=self.last_id
+        )
+
+    def advance(self, settled_before):
+        self.counted_before = settled_before
+        self.save(update_fields=['counted_before', 'updated_at'])
+
+
+class ActivitySketch(models.Model):
+    """
+    Daily HyperLogLog sketch of distinct users, either across all activity
+    (scope ``users``) or per viewed object (scope ``<model>:<id>``).
+    """
+    day = models.DateField()
+    scope = models.CharField(max_length=50)
+    sketch = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_sketches'
+        unique_together = ['scope', 'day']
+
+    def __str__(self):
+        return f"{self.scope} {self.day}"
@@ -0,0 +1,195 @@
+"""
+Monthly partitioning and retention for the ``user_activities`` table.
+
+On PostgreSQL the table is a native range-partitioned table keyed on
+``created_at`` with one partition per calendar month (UTC) plus a default
+partition. Retention drops or detaches whole partitions, which is a metadata
+operation regardless of how many rows they hold. Other backends keep a plain
+table indexed on ``created_at`` and fall back to batched deletes.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+
+TABLE = 'user_activities'
+LEGACY_TABLE = 'user_activities_legacy'
+SEQUENCE = 'user_activities_id_seq'
+PARTITION_RE = re.compile(r'^user_activities_p(\d{4})_(\d{2})$')
+DELETE_BATCH_SIZE = 10000
+
+
+def month_start(value):
+    """Return the first instant (UTC) of the month containing ``value``."""
+    if value.tzinfo is not None:
+        value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    month_index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month.year:04d}_{month.month:02d}'
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    if not is_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Return ``[(month_start, table_name)]`` for the monthly partitions."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s",
+            [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            partitions.append((month, name))
+    return sorted(partitions)
+
+
+def create_partition(cursor, month):
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {partition_name(month)} '
+        f'PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)',
+        [month.isoformat(), add_months(month, 1).isoformat()]
+    )
+
+
+def ensure_partitions(now, months_ahead=3):
+    """
+    Create the partitions for the current month and ``months_ahead`` more.
+    Returns the names of the partitions that were created.
+    """
+    existing = {name for _, name in list_partitions()}
+    first = month_start(now)
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            month = add_months(first, offset)
+            if partition_name(month) not in existing:
+                create_partition(cursor, month)
+                created.append(partition_name(month))
+    return created
+
+
+def partition_table(months_ahead=3):
+    """
+    Convert ``user_activities`` into a partitioned table, keeping its rows,
+    indexes and foreign keys. The primary key becomes ``(id, created_at)``
+    because PostgreSQL requires unique keys to include the partition key.
+    """
+    if not is_supported() or is_partitioned():
+        return
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND indexname <> %s",
+            [TABLE, f'{TABLE}_pkey']
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT MIN(created_at) FROM {TABLE}')
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}')
+        cursor.execute(f'ALTER INDEX {TABLE}_pkey RENAME TO {LEGACY_TABLE}_pkey')
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {LEGACY_TABLE} '
+            f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'CREATE SEQUENCE {TABLE}_new_id_seq')
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_new_id_seq')")
+        cursor.execute(f'ALTER SEQUENCE {TABLE}_new_id_seq OWNED BY {TABLE}.id')
+        cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)')
+        cursor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+        now = datetime.now(dt_timezone.utc)
+        month = month_start(oldest or now)
+        last = add_months(month_start(now), months_ahead)
+        while month <= last:
+            create_partition(cursor, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {LEGACY_TABLE}')
+        cursor.execute(
+            f"SELECT setval('{TABLE}_new_id_seq', COALESCE(MAX(id), 0) + 1, false) FROM {TABLE}"
+        )
+        cursor.execute(f'DROP TABLE {LEGACY_TABLE}')
+        cursor.execute(f'ALTER SEQUENCE {TABLE}_new_id_seq RENAME TO {SEQUENCE}')
+
+        # Definitions were read before the rename, so they already target
+        # the new table; the names are free again once the legacy table is gone.
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+
+def apply_retention(cutoff, archive=False):
+    """
+    Remove activity older than the month containing ``cutoff``.
+
+    Partitioned tables drop (or, with ``archive``, detach and keep as
+    ``user_activities_archive_YYYY_MM``) every partition that ends before the
+    cutoff month. Returns a list of the affected partitions, or the number of
+    deleted rows when falling back to batched deletes.
+    """
+    boundary = month_start(cutoff)
+
+    if not is_partitioned():
+        from .models import UserActivity
+
+        deleted = 0
+        old_rows = UserActivity.objects.filter(created_at__lt=boundary)
+        while True:
+            ids = list(old_rows.values_list('id', flat=True)[:DELETE_BATCH_SIZE])
+            if not ids:
+                return deleted
+            deleted += UserActivity.objects.filter(id__in=ids).delete()[0]
+
+    removed = []
+    with connection.cursor() as cursor:
+        for month, name in list_partitions():
+            if add_months(month, 1) > boundary:
+                continue
+            if archive:
+                archive_name = f'{TABLE}_archive_{month.year:04d}_{month.month:02d}'
+                cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+                cursor.execute(f'ALTER TABLE {name} RENAME TO {archive_name}')
+            else:
+                cursor.execute(f'DROP TABLE {name}')
+            removed.append(name)
+    return removed
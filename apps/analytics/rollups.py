@@ -0,0 +1,199 @@
+"""
+Hourly and daily analytics rollups.
+
+``roll_up()`` is meant to run every few minutes (``manage.py
+rollup_analytics``). Each source keeps a watermark of the insert time up to
+which it has counted, so every run only reads rows written since the
+previous one. Activities are written in batches some time after they
+happen, so they are found by ``inserted_at`` but bucketed by
+``created_at``; a late batch lands in old buckets instead of being skipped.
+"""
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import AnalyticsRollup, RollupWatermark, UserActivity
+from .sketches import update_sketches
+
+
+User = get_user_model()
+
+# Rows inserted less than this long ago are left for the next run, so a
+# transaction that stamped its rows before committing is not skipped.
+SETTLE_SECONDS = 60
+
+GRANULARITIES = {
+    'hour': (TruncHour, timedelta(hours=1)),
+    'day': (TruncDay, timedelta(days=1)),
+}
+
+# Ranges up to this long are answered from hourly buckets.
+HOURLY_RANGE_LIMIT = timedelta(days=2)
+
+
+def _creation_sources():
+    from apps.projects.models import Project
+    from apps.findings.models import Finding
+    from apps.publications.models import Publication
+
+    # Creation times are stamped when the row is saved, so they double as
+    # insert times.
+    return [
+        ('created.user', User.objects.all(), 'date_joined'),
+        ('created.project', Project.objects.all(), 'created_at'),
+        ('created.finding', Finding.objects.all(), 'created_at'),
+        ('created.publication', Publication.objects.all(), 'created_at'),
+    ]
+
+
+def _snapshot_sources():
+    from apps.projects.models import Project
+    from apps.findings.models import Finding
+    from apps.publications.models import Publication
+
+    return [
+        ('total.users', User.objects.all()),
+        ('total.active_users', User.objects.filter(is_active=True)),
+        ('total.projects', Project.objects.all()),
+        ('total.active_projects', Project.objects.filter(is_active=True)),
+        ('total.findings', Finding.objects.filter(is_active=True)),
+        ('total.publications', Publication.objects.filter(is_active=True)),
+    ]
+
+
+def _increment(granularity, bucket, metric, amount):
+    updated = AnalyticsRollup.objects.filter(
+        granularity=granularity, bucket=bucket, metric=metric
+    ).update(value=F('value') + amount)
+    if not updated:
+        AnalyticsRollup.objects.create(
+            granularity=granularity, bucket=bucket, metric=metric, value=amount
+        )
+
+
+def _set(granularity, bucket, metric, value):
+    AnalyticsRollup.objects.update_or_create(
+        granularity=granularity, bucket=bucket, metric=metric,
+        defaults={'value': value}
+    )
+
+
+def _roll_up_source(name, queryset, date_field, settled_before, count_by=None, inserted_field=None):
+    """
+    Count rows of ``queryset`` inserted since the watermark ``name`` into
+    hourly and daily buckets of ``date_field``. Returns the buckets that
+    changed per granularity.
+    """
+    touched = {granularity: set() for granularity in GRANULARITIES}
+
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=name)
+        rows = watermark.new_rows(queryset, inserted_field or date_field, settled_before).order_by()
+        for granularity, (trunc, _) in GRANULARITIES.items():
+            group_by = ['bucket', count_by] if count_by else ['bucket']
+            counts = rows.annotate(bucket=trunc(date_field)).values(*group_by).annotate(n=Count('id'))
+            for row in counts:
+                metric = f"{name}.{row[count_by]}" if count_by else name
+                _increment(granularity, row['bucket'], metric, row['n'])
+                touched[granularity].add(row['bucket'])
+
+        watermark.advance(settled_before)
+
+    return touched
+
+
+def roll_up(now=None):
+    """Fold new activities and creations into the rollup and sketch tables."""
+    now = now or timezone.now()
+    settled_before = now - timedelta(seconds=SETTLE_SECONDS)
+
+    touched = _roll_up_source(
+        'activity', UserActivity.objects.all(), 'created_at', settled_before,
+        count_by='action', inserted_field='inserted_at'
+    )
+    # Distinct users are not additive, so recount only the buckets that
+    # received new activity.
+    for granularity, buckets in touched.items():
+        span = GRANULARITIES[granularity][1]
+        for bucket in buckets:
+            active = UserActivity.objects.created_between(bucket, bucket + span).order_by()
+            _set(granularity, bucket, 'active_users', active.values('user').distinct().count())
+
+    update_sketches(settled_before)
+
+    for name, queryset, date_field in _creation_sources():
+        _roll_up_source(name, queryset, date_field, settled_before)
+
+    today = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    for metric, queryset in _snapshot_sources():
+        _set('day', today, metric, queryset.count())
+
+
+def latest_totals():
+    """Return the most recent ``total.*`` snapshot as ``{name: value}``."""
+    snapshots = AnalyticsRollup.objects.filter(granularity='day', metric__startswith='total.')
+    latest = snapshots.aggregate(bucket=Max('bucket'))['bucket']
+    if latest is None:
+        return {}
+    return {
+        metric[len('total.'):]: value
+        for metric, value in snapshots.filter(bucket=latest).values_list('metric', 'value')
+    }
+
+
+def _granularity_for(start, end):
+    if start is not None and end is not None and end - start <= HOURLY_RANGE_LIMIT:
+        return 'hour'
+    return 'day'
+
+
+def _bucketed(granularity, start, end):
+    queryset = AnalyticsRollup.objects.filter(granularity=granularity)
+    if start is not None:
+        trunc_start = timezone.localtime(start).replace(minute=0, second=0, microsecond=0)
+        if granularity == 'day':
+            trunc_start = trunc_start.replace(hour=0)
+        queryset = queryset.filter(bucket__gte=trunc_start)
+    if end is not None:
+        queryset = queryset.filter(bucket__lt=end)
+    return queryset
+
+
+def range_totals(metrics, start=None, end=None):
+    """Sum ``metrics`` over ``[start, end)``. Returns ``{metric: total}``."""
+    granularity = _granularity_for(start, end)
+    totals = dict.fromkeys(metrics, 0)
+    rows = _bucketed(granularity, start, end).filter(metric__in=metrics).values('metric').annotate(total=Sum('value'))
+    for row in rows:
+        totals[row['metric']] = row['total']
+    return totals
+
+
+def growth_series(metrics, start=None, end=None):
+    """
+    Return ``{metric: {'labels': [...], 'data': [...]}}`` of new rows per
+    hour, day or month depending on the length of the range.
+    """
+    granularity = _granularity_for(start, end)
+    if granularity == 'hour':
+        label_format = '%H:%M'
+    elif start is not None and end is not None and end - start <= timedelta(days=62):
+        label_format = '%Y-%m-%d'
+    else:
+        label_format = '%Y-%m'
+
+    series = {metric: OrderedDict() for metric in metrics}
+    rows = _bucketed(granularity, start, end).filter(metric__in=metrics).values_list('metric', 'bucket', 'value')
+    for metric, bucket, value in rows.order_by('bucket'):
+        label = timezone.localtime(bucket).strftime(label_format)
+        series[metric][label] = series[metric].get(label, 0) + value
+
+    return {
+        metric: {'labels': list(points.keys()), 'data': list(points.values())}
+        for metric, points in series.items()
+    }
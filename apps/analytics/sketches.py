@@ -0,0 +1,112 @@
+"""
+Per-day distinct-user sketches built from UserActivity.
+
+The ``users`` scope counts everyone who did anything that day (DAU, and by
+merging days, WAU/MAU). Object scopes such as ``finding:12`` count distinct
+viewers of one finding or publication and use a smaller precision, since
+there is one sketch per object per day.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .hll import HyperLogLog
+from .models import ActivitySketch, RollupWatermark, UserActivity
+
+
+USERS_SCOPE = 'users'
+USERS_PRECISION = 14
+OBJECT_PRECISION = 10
+VIEWER_MODELS = ('finding', 'publication')
+CHUNK_SIZE = 50000
+
+
+def object_scope(model_name, object_id):
+    return f'{model_name}:{object_id}'
+
+
+def _precision_for(scope):
+    return USERS_PRECISION if scope == USERS_SCOPE else OBJECT_PRECISION
+
+
+def _save_sketches(pending):
+    keys = list(pending)
+    existing = {
+        (sketch.scope, sketch.day): sketch
+        for sketch in ActivitySketch.objects.filter(
+            scope__in={scope for scope, _ in keys},
+            day__in={day for _, day in keys},
+        )
+    }
+
+    to_create, to_update = [], []
+    for key, sketch in pending.items():
+        row = existing.get(key)
+        if row is None:
+            to_create.append(ActivitySketch(scope=key[0], day=key[1], sketch=sketch.to_bytes()))
+        else:
+            row.sketch = HyperLogLog.from_bytes(row.sketch).merge(sketch).to_bytes()
+            to_update.append(row)
+
+    ActivitySketch.objects.bulk_create(to_create)
+    ActivitySketch.objects.bulk_update(to_update, ['sketch'])
+
+
+def update_sketches(settled_before):
+    """Add activities inserted since the ``sketches`` watermark to the sketches."""
+    from django.contrib.contenttypes.models import ContentType
+
+    viewer_types = {
+        content_type.id: content_type.model
+        for content_type in ContentType.objects.filter(model__in=VIEWER_MODELS)
+    }
+
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name='sketches')
+        rows = watermark.new_rows(UserActivity.objects.all(), 'inserted_at', settled_before).order_by().values_list(
+            'created_at', 'user_id', 'action', 'target_content_type_id', 'target_object_id'
+        )
+
+        # Save every CHUNK_SIZE rows so memory is bounded by the chunk, not the backlog.
+        pending = {}
+        for number, (created_at, user_id, action, content_type_id, object_id) in enumerate(
+            rows.iterator(chunk_size=5000), start=1
+        ):
+            day = timezone.localdate(created_at)
+            scopes = [USERS_SCOPE]
+            if action == 'view' and content_type_id in viewer_types and object_id is not None:
+                scopes.append(object_scope(viewer_types[content_type_id], object_id))
+            for scope in scopes:
+                key = (scope, day)
+                if key not in pending:
+                    pending[key] = HyperLogLog(_precision_for(scope))
+                pending[key].add(user_id)
+            if number % CHUNK_SIZE == 0:
+                _save_sketches(pending)
+                pending = {}
+        _save_sketches(pending)
+
+        watermark.advance(settled_before)
+
+
+def distinct_users(scope, first_day, last_day):
+    """
+    Estimate distinct users for ``scope`` between two dates (inclusive).
+    Returns ``(estimate, relative_error)``.
+    """
+    blobs = ActivitySketch.objects.filter(
+        scope=scope, day__gte=first_day, day__lte=last_day
+    ).values_list('sketch', flat=True)
+    sketch = HyperLogLog.merged(blobs, precision=_precision_for(scope))
+    return sketch.count(), sketch.relative_error
+
+
+def active_users(day):
+    """DAU/WAU/MAU for the windows ending on ``day``."""
+    result = {}
+    for name, days in (('dau', 1), ('wau', 7), ('mau', 30)):
+        count, error = distinct_users(USERS_SCOPE, day - timedelta(days=days - 1), day)
+        result[name] = count
+    result['relative_error'] = round(error, 4)
+    return result
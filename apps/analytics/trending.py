@@ -0,0 +1,204 @@
+"""
+Trending findings and publications.
+
+Scores use forward exponential decay: an event at time ``t`` adds
+``weight * 2 ** ((t - epoch) / half_life)``. Old scores never need to be
+touched to decay them, since newer events simply weigh more, and the ranking
+at any moment is the ranking of the stored values. When the multiplier gets
+large the scores are rescaled and the epoch moved forward.
+
+Every item is scored in a few slices (everything, each of its tags and its
+research group). Each slice is a Redis sorted set when
+``ANALYTICS_TRENDING_BACKEND = 'redis'`` (the default when ``REDIS_URL`` is
+set), otherwise an in-process dict. The in-process backend gives every worker
+its own ranking, so it is only suitable for a single process. A slice may
+grow to ``TRIM_AT`` times K entries before it is cut back to the best
+``TRIM_TO`` times K, so a newly rising item has room to build up a score
+before it competes with the established top K.
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+WEIGHTS = {
+    'view': 1.0,
+    'like': 3.0,
+    'comment': 5.0,
+}
+TRENDING_MODELS = ('finding', 'publication')
+
+# Rescale once the multiplier reaches 2 ** REBASE_HALF_LIVES.
+REBASE_HALF_LIVES = 64
+# Slices are trimmed to TRIM_TO * K entries once they exceed TRIM_AT * K.
+TRIM_TO = 2
+TRIM_AT = 4
+
+
+class MemoryBackend:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.epoch = time.time()
+        self.slices = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def get_epoch(self):
+        return self.epoch
+
+    def increment(self, keys, member, amount):
+        with self._lock:
+            for key in keys:
+                scores = self.slices[key]
+                scores[member] = scores.get(member, 0.0) + amount
+                # Prune lazily so the cost is amortized over K increments.
+                if len(scores) > TRIM_AT * self.capacity:
+                    self.slices[key] = dict(
+                        heapq.nlargest(TRIM_TO * self.capacity, scores.items(), key=itemgetter(1))
+                    )
+
+    def top(self, key, limit):
+        with self._lock:
+            return heapq.nlargest(limit, self.slices.get(key, {}).items(), key=itemgetter(1))
+
+    def rebase(self, epoch, factor):
+        with self._lock:
+            if epoch <= self.epoch:
+                return
+            for scores in self.slices.values():
+                for member in scores:
+                    scores[member] *= factor
+            self.epoch = epoch
+
+
+class RedisBackend:
+    PREFIX = 'trending:'
+
+    def __init__(self, url, capacity):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.capacity = capacity
+
+    def get_epoch(self):
+        key = self.PREFIX + 'epoch'
+        epoch = self.client.get(key)
+        if epoch is None:
+            self.client.set(key, time.time(), nx=True)
+            epoch = self.client.get(key)
+        return float(epoch)
+
+    def increment(self, keys, member, amount):
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zincrby(self.PREFIX + key, amount, member)
+            pipe.zcard(self.PREFIX + key)
+        pipe.sadd(self.PREFIX + 'keys', *keys)
+        sizes = pipe.execute()[1:-1:2]
+        # Trim only the slices that outgrew the slack, in a second round trip.
+        oversized = [key for key, size in zip(keys, sizes) if size > TRIM_AT * self.capacity]
+        if oversized:
+            pipe = self.client.pipeline(transaction=False)
+            for key in oversized:
+                pipe.zremrangebyrank(self.PREFIX + key, 0, -(TRIM_TO * self.capacity + 1))
+            pipe.execute()
+
+    def top(self, key, limit):
+        rows = self.client.zrevrange(self.PREFIX + key, 0, limit - 1, withscores=True)
+        return [(member.decode(), score) for member, score in rows]
+
+    def rebase(self, epoch, factor):
+        with self.client.lock(self.PREFIX + 'rebase', timeout=60):
+            if epoch <= self.get_epoch():
+                return
+            for key in self.client.smembers(self.PREFIX + 'keys'):
+                name = self.PREFIX + key.decode()
+                self.client.zunionstore(name, {name: factor})
+            self.client.set(self.PREFIX + 'epoch', epoch)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                capacity = getattr(settings, 'ANALYTICS_TRENDING_TOP_K', 200)
+                if getattr(settings, 'ANALYTICS_TRENDING_BACKEND', 'memory') == 'redis':
+                    _backend = RedisBackend(settings.ANALYTICS_TRENDING_REDIS_URL, capacity)
+                else:
+                    _backend = MemoryBackend(capacity)
+    return _backend
+
+
+def _half_life():
+    return getattr(settings, 'ANALYTICS_TRENDING_HALF_LIFE_HOURS', 24) * 3600
+
+
+def slice_key(model_name, tag=None, group=None):
+    if tag is not None:
+        return f'{model_name}:tag:{tag}'
+    if group is not None:
+        return f'{model_name}:group:{group}'
+    return f'{model_name}:all'
+
+
+def _slices_for(instance):
+    model_name = instance._meta.model_name
+    keys = [slice_key(model_name)]
+    keys += [slice_key(model_name, tag=slug) for slug in instance.tags.values_list('slug', flat=True)]
+
+    if model_name == 'finding':
+        group_id = type(instance).objects.filter(pk=instance.pk).values_list(
+            'experiment__project__research_group_id', flat=True
+        ).first()
+    else:
+        group_id = type(instance).objects.filter(pk=instance.pk).values_list(
+            'project__research_group_id', flat=True
+        ).first()
+    if group_id is not None:
+        keys.append(slice_key(model_name, group=group_id))
+    return keys
+
+
+def record(instance, event, now=None):
+    """
+    Add an ``event`` on a Finding or Publication to its trending scores.
+    Failures are logged and never propagate to the caller.
+    """
+    try:
+        backend = get_backend()
+        now = now or time.time()
+        half_life = _half_life()
+        epoch = backend.get_epoch()
+        if now - epoch > REBASE_HALF_LIVES * half_life:
+            backend.rebase(now, 2 ** ((epoch - now) / half_life))
+            epoch = backend.get_epoch()
+
+        amount = WEIGHTS[event] * 2 ** ((now - epoch) / half_life)
+        backend.increment(_slices_for(instance), str(instance.pk), amount)
+    except Exception:
+        logger.exception('Failed to record trending %s for %s', event, instance)
+
+
+def top(model_name, limit, tag=None, group=None, now=None):
+    """
+    Return up to ``limit`` ``(object_id, score)`` pairs for one slice, with
+    scores decayed to ``now``.
+    """
+    backend = get_backend()
+    now = now or time.time()
+    decay = 2 ** ((backend.get_epoch() - now) / _half_life())
+    return [
+        (int(member), score * decay)
+        for member, score in backend.top(slice_key(model_name, tag=tag, group=group), limit)
+    ]
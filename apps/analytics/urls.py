@@ -5,4 +5,9 @@ from . import views
 urlpatterns = [
     path('summary/', views.analytics_summary, name='analytics-summary'),
     path('user-activities/', views.UserActivityListView.as_view(), name='user-activity-list'),
+    path('user-activities/export/', views.UserActivityExportView.as_view(), name='user-activity-export'),
+    path('rollups/export/', views.AnalyticsRollupExportView.as_view(), name='analytics-rollup-export'),
+    path('active-users/', views.active_users, name='analytics-active-users'),
+    path('trending/', views.trending_content, name='analytics-trending'),
+    path('unique-viewers/<str:target_type>/<int:pk>/', views.unique_viewers, name='analytics-unique-viewers'),
 ]
@@ -1,15 +1,16 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.db.models import Count, Q
 from django.utils import timezone
-from datetime import timedelta, datetime
+from datetime import date, timedelta, datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
-from .models import UserActivity
+from .models import AnalyticsRollup, UserActivity
 from .serializers import UserActivitySerializer, AnalyticsSummarySerializer
+from . import exports, rollups, sketches, trending
 from apps.projects.models import Project
 from apps.findings.models import Finding
 from apps.publications.models import Publication
@@ -30,6 +31,10 @@ def analytics_summary(request):
     if start_date and end_date:
         start = datetime.fromisoformat(start_date)
         end = datetime.fromisoformat(end_date)
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        if timezone.is_naive(end):
+            end = timezone.make_aware(end)
     elif period == 'day':
         start = now - timedelta(days=1)
         end = now
@@ -46,29 +51,20 @@ def analytics_summary(request):
         start = None
         end = None
 
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    total_projects = Project.objects.count()
-    active_projects = Project.objects.filter(is_active=True).count()
-    total_findings = Finding.objects.filter(is_active=True).count()
-    total_publications = Publication.objects.filter(is_active=True).count()
-
-    activities_query = UserActivity.objects.all()
-    if start and end:
-        activities_query = activities_query.filter(created_at__range=[start, end])
-
-    total_views = activities_query.filter(action='view').count()
-    total_downloads = activities_query.filter(action='download').count()
-
-    user_growth = {
-        'labels': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
-        'data': [10, 20, 30, 40, 50, 60]
-    }
+    totals = rollups.latest_totals()
+    if not totals:
+        # Rollups have not run yet (fresh install); fall back to live counts.
+        totals = {
+            'users': User.objects.count(),
+            'active_users': User.objects.filter(is_active=True).count(),
+            'projects': Project.objects.count(),
+            'active_projects': Project.objects.filter(is_active=True).count(),
+            'findings': Finding.objects.filter(is_active=True).count(),
+            'publications': Publication.objects.filter(is_active=True).count(),
+        }
 
-    project_growth = {
-        'labels': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
-        'data': [5, 10, 15, 20, 25, 30]
-    }
+    activity_totals = rollups.range_totals(['activity.view', 'activity.download'], start, end)
+    growth = rollups.growth_series(['created.user', 'created.project'], start, end)
 
     top_viewed_findings = Finding.objects.filter(is_active=True).order_by('-views_count')[:5]
     top_viewed_findings_data = [
@@ -91,16 +87,16 @@ def analytics_summary(request):
     ]
 
     data = {
-        'total_users': total_users,
-        'active_users': active_users,
-        'total_projects': total_projects,
-        'active_projects': active_projects,
-        'total_findings': total_findings,
-        'total_publications': total_publications,
-        'total_views': total_views,
-        'total_downloads': total_downloads,
-        'user_growth': user_growth,
-        'project_growth': project_growth,
+        'total_users': totals.get('users', 0),
+        'active_users': totals.get('active_users', 0),
+        'total_projects': totals.get('projects', 0),
+        'active_projects': totals.get('active_projects', 0),
+        'total_findings': totals.get('findings', 0),
+        'total_publications': totals.get('publications', 0),
+        'total_views': activity_totals['activity.view'],
+        'total_downloads': activity_totals['activity.download'],
+        'user_growth': growth['created.user'],
+        'project_growth': growth['created.project'],
         'top_viewed_findings': top_viewed_findings_data,
         'top_cited_publications': top_cited_publications_data,
     }
@@ -119,15 +115,149 @@ class UserActivityListView(generics.ListAPIView):
     ordering = ['-created_at']
 
     def get_queryset(self):
-        queryset = UserActivity.objects.all()
-
-        # Filter by date range
+        # Filter by date range; bounded ranges only scan the matching partitions
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
 
-        if start_date and end_date:
-            queryset = queryset.filter(
-                created_at__range=[start_date, end_date]
+        return UserActivity.objects.created_between(start_date, end_date)
+
+
+class ExportMixin:
+    """Stream the filtered queryset as CSV or NDJSON (``?file_format=``)"""
+    permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    export_fields = None
+    export_ordering = None
+    export_filename = None
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in exports.FILE_FORMATS:
+            return Response(
+                {'detail': f'file_format must be one of {list(exports.FILE_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
+        queryset = self.filter_queryset(self.get_queryset()).order_by(*self.export_ordering)
+        return exports.stream_queryset(queryset, self.export_fields, file_format, self.export_filename)
+
+
+class UserActivityExportView(ExportMixin, UserActivityListView):
+    """Export user activities"""
+    export_fields = exports.ACTIVITY_FIELDS
+    export_ordering = ['created_at', 'id']
+    export_filename = 'user-activities'
+
+
+class AnalyticsRollupExportView(ExportMixin, generics.GenericAPIView):
+    """Export hourly or daily analytics rollups"""
+    filterset_fields = ['granularity', 'metric']
+    export_fields = exports.ROLLUP_FIELDS
+    export_ordering = ['bucket', 'metric']
+    export_filename = 'analytics-rollups'
+
+    def get_queryset(self):
+        queryset = AnalyticsRollup.objects.all()
+        start_date = self.request.query_params.get('start_date')
+        end_date = self.request.query_params.get('end_date')
+        if start_date:
+            queryset = queryset.filter(bucket__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(bucket__lt=end_date)
         return queryset
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def active_users(request):
+    """Approximate daily, weekly and monthly active users"""
+    day = request.query_params.get('date')
+    try:
+        day = date.fromisoformat(day) if day else timezone.localdate()
+    except ValueError:
+        return Response(
+            {'detail': 'date must be in YYYY-MM-DD format'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    data = sketches.active_users(day)
+    data['date'] = day
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def unique_viewers(request, target_type, pk):
+    """Approximate distinct viewers of a finding or publication"""
+    if target_type not in sketches.VIEWER_MODELS:
+        return Response(
+            {'detail': f'target_type must be one of {list(sketches.VIEWER_MODELS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    today = timezone.localdate()
+    try:
+        start = date.fromisoformat(request.query_params.get('start_date', '2000-01-01'))
+        end = date.fromisoformat(request.query_params.get('end_date', today.isoformat()))
+    except ValueError:
+        return Response(
+            {'detail': 'start_date and end_date must be in YYYY-MM-DD format'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    count, error = sketches.distinct_users(sketches.object_scope(target_type, pk), start, end)
+    return Response({
+        'target_type': target_type,
+        'target_id': pk,
+        'start_date': start,
+        'end_date': end,
+        'unique_viewers': count,
+        'relative_error': round(error, 4),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def trending_content(request):
+    """List trending findings and publications"""
+    content_type = request.query_params.get('type')
+    tag = request.query_params.get('tag')
+    group = request.query_params.get('group')
+
+    if content_type and content_type not in trending.TRENDING_MODELS:
+        return Response(
+            {'detail': f'type must be one of {list(trending.TRENDING_MODELS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if tag and group:
+        return Response(
+            {'detail': 'Filter by either tag or group, not both'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = int(request.query_params.get('limit', 10))
+        group = int(group) if group else None
+    except ValueError:
+        return Response(
+            {'detail': 'limit and group must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = max(1, min(limit, 100))
+
+    querysets = {
+        'finding': Finding.objects.filter(is_active=True, visibility='public'),
+        'publication': Publication.objects.filter(is_active=True),
+    }
+    results = []
+    for model_name in ([content_type] if content_type else trending.TRENDING_MODELS):
+        scores = trending.top(model_name, limit, tag=tag or None, group=group)
+        titles = dict(
+            querysets[model_name].filter(id__in=[pk for pk, _ in scores]).values_list('id', 'title')
+        )
+        results.extend(
+            {'type': model_name, 'id': pk, 'title': titles[pk], 'score': round(score, 4)}
+            for pk, score in scores if pk in titles
+        )
+
+    results.sort(key=lambda item: item['score'], reverse=True)
+    return Response({'results': results[:limit]})
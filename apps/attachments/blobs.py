@@ -0,0 +1,130 @@
+"""
+Content-addressed storage for attachment files.
+
+Each distinct file is stored once, under its SHA-256 digest, as a
+``StoredFile``. Every attachment row holds one reference, soft-deleted
+ones too until ``reaper`` purges them. ``acquire`` adds a reference,
+writing the file only when its digest is new (``adopt`` moves a file that
+is already in storage into place instead). ``release`` drops one. When the
+count reaches zero the row is removed, and the file and its thumbnails are
+deleted after commit.
+
+Reference counts change under a row lock, so a concurrent ``release``
+cannot delete a blob that ``acquire`` has just reused.
+"""
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from . import storage
+from .models import Attachment, StoredFile
+
+
+HASH_BUFFER_SIZE = 64 * 1024
+
+
+def blob_path(sha256):
+    return f'blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+def hash_file(file):
+    """Return ``(sha256 hex, size)`` of an uploaded file, leaving it rewound."""
+    digest = hashlib.sha256()
+    size = 0
+    for block in file.chunks(HASH_BUFFER_SIZE):
+        digest.update(block)
+        size += len(block)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def _reference(sha256):
+    """Add a reference to the stored file with ``sha256``, if there is one."""
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(sha256=sha256).first()
+        if stored is not None:
+            stored.ref_count = F('ref_count') + 1
+            stored.save(update_fields=['ref_count'])
+            stored.refresh_from_db(fields=['ref_count'])
+        return stored
+
+
+def _register(sha256, size, path):
+    """Record a newly written blob; ``None`` if another upload stored the same content first."""
+    try:
+        with transaction.atomic():
+            return StoredFile.objects.create(sha256=sha256, size=size, storage_path=path, ref_count=1)
+    except IntegrityError:
+        return None
+
+
+def acquire(sha256, size, open_content):
+    """
+    Take a reference to the blob with ``sha256``, storing it first if it is
+    new. ``open_content()`` returns a fresh file object with the content and
+    is only called when the bytes have to be written.
+    """
+    stored = _reference(sha256)
+    if stored is not None:
+        return stored
+
+    path = storage.attachment_storage.save(blob_path(sha256), open_content())
+    stored = _register(sha256, size, path)
+    if stored is None:
+        storage.delete_many([path])
+        return acquire(sha256, size, open_content)
+    return stored
+
+
+def adopt(sha256, size, name):
+    """
+    Like ``acquire`` for content already in storage as ``name``, which is
+    moved into place (or deleted if the blob exists) instead of copied.
+    """
+    stored = _reference(sha256)
+    if stored is not None:
+        storage.delete_many([name])
+        return stored
+
+    path = storage.move(name, blob_path(sha256))
+    while True:
+        stored = _register(sha256, size, path)
+        if stored is not None:
+            return stored
+        stored = _reference(sha256)
+        if stored is not None:
+            storage.delete_many([path])
+            return stored
+
+
+def release(stored_file_id):
+    """Drop one reference; deletes the blob when none are left."""
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(id=stored_file_id).first()
+        if stored is None:
+            return
+        if stored.ref_count > 1:
+            StoredFile.objects.filter(id=stored.id).update(ref_count=F('ref_count') - 1)
+            return
+        paths = [stored.storage_path, *stored.thumbnails.values()]
+        stored.delete()
+        storage.delete_on_commit(paths)
+
+
+def storage_stats():
+    """Logical vs. physical bytes of active attachments."""
+    attachments = Attachment.objects.filter(is_active=True, stored_file__isnull=False).aggregate(
+        count=Count('id'), logical=Sum('file_size')
+    )
+    blobs = StoredFile.objects.aggregate(count=Count('id'), physical=Sum('size'))
+    logical = attachments['logical'] or 0
+    physical = blobs['physical'] or 0
+    return {
+        'attachments': attachments['count'],
+        'stored_files': blobs['count'],
+        'logical_bytes': logical,
+        'physical_bytes': physical,
+        'saved_bytes': max(logical - physical, 0),
+        'dedup_ratio': round(logical / physical, 3) if physical else None,
+    }
@@ -0,0 +1,162 @@
+"""
+Serving attachment files.
+
+Depending on configuration and storage, a download takes one of three paths:
+
+* With ``ATTACHMENTS_ACCEL_REDIRECT_PREFIX`` set, the response is empty and
+  carries an ``X-Accel-Redirect`` header. nginx then serves the file from
+  an ``internal`` location, including Range requests.
+* With local storage, full downloads use ``FileResponse``, which lets the
+  WSGI server use ``sendfile``. A single byte range is streamed from an
+  offset with status 206. Multi-range requests get the whole file, which
+  RFC 9110 allows.
+* Storage without local paths redirects to ``storage.url()``.
+
+A download is counted once per response that starts it (a 200 or a 206
+from byte 0, or a redirect without Range), through the buffered counter
+rather than a row write per request. Errors, resumed ranges and HEAD
+requests are not counted. A blob missing from local storage is a 404.
+"""
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+
+from apps.common import counters
+
+from .storage import attachment_storage
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single-range header, ``None``
+    to serve the whole file, or ``'unsatisfiable'``.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Malformed or multiple ranges: ignore the header.
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def is_download_start(request):
+    """True for requests that begin a download, as opposed to resuming one."""
+    header = request.headers.get('Range', '')
+    return not header or header.replace(' ', '').startswith('bytes=0-')
+
+
+def _etag(attachment):
+    return f'"{attachment.stored_file.sha256}"' if attachment.stored_file_id else None
+
+
+def _disposition(attachment):
+    filename = attachment.filename or os.path.basename(attachment.storage_path) or 'download'
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+def _read_range(path, start, end):
+    with attachment_storage.open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = file.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                return
+            remaining -= len(block)
+            yield block
+
+
+def _local_path(name):
+    try:
+        return attachment_storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def counts_as_download(request, response):
+    """Whether ``response`` starts a download; shared with the activity middleware."""
+    if request.method != 'GET':
+        return False
+    if response.status_code in (200, 206):
+        return is_download_start(request)
+    # The client fetches the file from the redirect target; a Range request
+    # here is resuming a download that was already counted.
+    return response.status_code == 302 and 'Range' not in request.headers
+
+
+def serve(request, attachment):
+    response = _response(request, attachment)
+    if counts_as_download(request, response):
+        counters.increment(attachment, 'downloads_count')
+    return response
+
+
+def _response(request, attachment):
+    if not attachment.storage_path:
+        # Uploaded before storage paths were recorded.
+        return HttpResponseRedirect(attachment.file_url)
+
+    etag = _etag(attachment)
+    prefix = settings.ATTACHMENTS_ACCEL_REDIRECT_PREFIX
+    if prefix:
+        response = HttpResponse(content_type=attachment.content_type)
+        response['X-Accel-Redirect'] = quote(prefix.rstrip('/') + '/' + attachment.storage_path)
+    else:
+        local_path = _local_path(attachment.storage_path)
+        if local_path is None:
+            return HttpResponseRedirect(attachment_storage.url(attachment.storage_path))
+        if not os.path.isfile(local_path):
+            raise Http404('Attachment file is missing')
+
+        size = attachment.file_size
+        byte_range = parse_range(request.headers.get('Range'), size)
+        if_range = request.headers.get('If-Range')
+        if byte_range is not None and if_range and if_range != etag:
+            # The client's partial copy is of a different version.
+            byte_range = None
+
+        if byte_range == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is None or request.method == 'HEAD':
+            try:
+                file = open(local_path, 'rb')
+            except FileNotFoundError:
+                # Removed between the check above and here.
+                raise Http404('Attachment file is missing')
+            response = FileResponse(file, content_type=attachment.content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(attachment.storage_path, start, end),
+                status=206, content_type=attachment.content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = _disposition(attachment)
+    if etag:
+        response['ETag'] = etag
+    return response
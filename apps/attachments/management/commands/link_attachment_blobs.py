@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.attachments import blobs
+from apps.attachments.models import Attachment
+from apps.attachments.storage import stable_url
+from apps.common.utils import safe_delete_file
+
+
+class Command(BaseCommand):
+    help = 'Move attachments stored under their upload filename into content-addressed storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+
+    def _legacy_path(self, attachment):
+        if attachment.storage_path:
+            return attachment.storage_path
+        if attachment.file_url.startswith(settings.MEDIA_URL):
+            return attachment.file_url[len(settings.MEDIA_URL):]
+        return None
+
+    def handle(self, *args, **options):
+        linked = missing = 0
+        attachments = Attachment.objects.filter(is_active=True, stored_file__isnull=True)
+        for attachment in attachments.iterator(chunk_size=500):
+            path = self._legacy_path(attachment)
+            if not path or not default_storage.exists(path):
+                missing += 1
+                continue
+            with default_storage.open(path, 'rb') as file:
+                sha256, size = blobs.hash_file(file)
+            if options['dry_run']:
+                self.stdout.write(f'{attachment.id}: {path} -> {blobs.blob_path(sha256)}')
+                linked += 1
+                continue
+
+            with transaction.atomic():
+                stored = blobs.acquire(sha256, size, lambda: default_storage.open(path, 'rb'))
+                Attachment.objects.filter(id=attachment.id).update(
+                    stored_file=stored,
+                    storage_path=stored.storage_path,
+                    file_url=stable_url(stored.storage_path),
+                    file_size=size,
+                    filename=attachment.filename or path.rsplit('/', 1)[-1]
+                )
+            # Other attachments may still point at the old name.
+            if path != stored.storage_path and not Attachment.objects.filter(
+                storage_path=path, stored_file__isnull=True
+            ).exists():
+                safe_delete_file(path)
+            linked += 1
+
+        self.stdout.write(f'Linked {linked} attachments, {missing} files not found')
+        self.stdout.write(str(blobs.storage_stats()))
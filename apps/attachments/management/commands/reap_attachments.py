@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from apps.attachments import reaper
+
+
+class Command(BaseCommand):
+    help = 'Expire stale uploads, purge old soft-deleted attachments and delete orphaned files from storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted without deleting')
+        parser.add_argument('--verify', action='store_true', help='Re-hash every stored file and report problems')
+        parser.add_argument('--purge-after-days', type=int, default=None)
+        parser.add_argument('--grace-hours', type=int, default=None,
+                            help='Leave unreferenced files younger than this alone')
+        parser.add_argument('--workers', type=int, default=None)
+
+    def handle(self, *args, **options):
+        report = reaper.reap(
+            dry_run=options['dry_run'],
+            verify=options['verify'],
+            purge_after_days=options['purge_after_days'],
+            grace_hours=options['grace_hours'],
+            workers=options['workers'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        for name in report.orphans:
+            self.stdout.write(f'{verb} orphan {name}')
+        for problem in report.problems:
+            self.stderr.write(f"Stored file {problem['id']} ({problem['sha256']}): {problem['problem']}")
+        self.stdout.write(str(report.as_dict()))
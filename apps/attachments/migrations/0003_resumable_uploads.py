@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiments', '0002_initial'),
+        ('findings', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attachments', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='storage_path',
+            field=models.CharField(blank=True, default='', help_text='Name in default storage', max_length=500),
+        ),
+        migrations.AlterField(
+            model_name='attachment',
+            name='file_size',
+            field=models.PositiveBigIntegerField(help_text='File size in bytes'),
+        ),
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('file_type', models.CharField(choices=[('document', 'Document'), ('image', 'Image'), ('dataset', 'Dataset'), ('code', 'Code'), ('video', 'Video'), ('other', 'Other')], max_length=20)),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=100)),
+                ('total_size', models.PositiveBigIntegerField()),
+                ('chunk_size', models.PositiveIntegerField()),
+                ('checksum', models.CharField(blank=True, default='', help_text='Expected SHA-256 of the whole file', max_length=64)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('completed', 'Completed'), ('aborted', 'Aborted')], default='active', max_length=20)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('attachment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_session', to='attachments.attachment')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+                ('experiment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='experiments.experiment')),
+                ('finding', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='findings.finding')),
+            ],
+            options={
+                'db_table': 'attachment_upload_sessions',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UploadChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('size', models.PositiveIntegerField()),
+                ('checksum', models.CharField(help_text='SHA-256 of the chunk, hex', max_length=64)),
+                ('storage_path', models.CharField(max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='attachments.uploadsession')),
+            ],
+            options={
+                'db_table': 'attachment_upload_chunks',
+                'ordering': ['session', 'index'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='uploadsession',
+            index=models.Index(fields=['status', 'expires_at'], name='upload_session_expiry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='uploadchunk',
+            constraint=models.UniqueConstraint(fields=('session', 'index'), name='upload_chunk_unique_index'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0003_resumable_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('storage_path', models.CharField(max_length=500)),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Active attachments using this file')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'stored_files',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='filename',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='stored_file',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attachments', to='attachments.storedfile'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0004_stored_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedfile',
+            name='thumbnail_status',
+            field=models.CharField(choices=[('none', 'Not generated'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed'), ('unsupported', 'Unsupported')], default='none', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='storedfile',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0005_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedfile',
+            name='preview',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='storedfile',
+            name='preview_status',
+            field=models.CharField(choices=[('none', 'Not generated'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed'), ('unsupported', 'Unsupported')], default='none', max_length=20),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:20
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_soft_deletes(apps, schema_editor):
+    Attachment = apps.get_model('attachments', 'Attachment')
+    StoredFile = apps.get_model('attachments', 'StoredFile')
+    Attachment.objects.filter(is_active=False).update(deleted_at=F('updated_at'))
+    # Soft-deleted attachments now keep their reference until purged.
+    references = Attachment.objects.filter(stored_file=OuterRef('pk')).order_by().values('stored_file').annotate(
+        total=Count('id')
+    ).values('total')
+    StoredFile.objects.update(ref_count=Coalesce(Subquery(references), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0006_dataset_preview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, help_text='When the attachment was soft-deleted', null=True),
+        ),
+        migrations.AlterField(
+            model_name='storedfile',
+            name='ref_count',
+            field=models.PositiveIntegerField(default=0, help_text='Attachments using this file, including soft-deleted ones'),
+        ),
+        migrations.AddIndex(
+            model_name='attachment',
+            index=models.Index(fields=['is_active', 'deleted_at'], name='attachment_deleted_idx'),
+        ),
+        migrations.RunPython(backfill_soft_deletes, migrations.RunPython.noop),
+    ]
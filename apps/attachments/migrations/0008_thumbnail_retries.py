@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0007_soft_delete_retention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedfile',
+            name='thumbnail_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='storedfile',
+            name='thumbnail_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
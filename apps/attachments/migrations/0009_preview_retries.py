@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0008_thumbnail_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedfile',
+            name='preview_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='storedfile',
+            name='preview_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
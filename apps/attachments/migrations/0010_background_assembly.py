@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0009_preview_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='error',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='attachment',
+            name='file_url',
+            field=models.URLField(max_length=500),
+        ),
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('assembling', 'Assembling'), ('completed', 'Completed'), ('aborted', 'Aborted')], default='active', max_length=20),
+        ),
+    ]
@@ -1,11 +1,89 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Q
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from apps.common.models import RollupTrackedMixin
 
 
 User = get_user_model()
 
 
-class Attachment(models.Model):
+class StoredFileQuerySet(models.QuerySet):
+    def claim(self, stored_file_id, kind, timeout):
+        """
+        Move ``<kind>_status`` of a stored file to ``processing`` unless
+        another worker holds it. A run that failed, or has been processing
+        for longer than ``timeout``, can be claimed again once its
+        ``<kind>_retry_at`` has passed, up to ``ATTACHMENTS_DERIVED_MAX_ATTEMPTS``
+        attempts. Returns whether the caller got the claim.
+        """
+        now = timezone.now()
+        status, attempts, retry_at = f'{kind}_status', f'{kind}_attempts', f'{kind}_retry_at'
+        retryable = Q(**{
+            f'{status}__in': ['processing', 'failed'],
+            f'{retry_at}__lte': now,
+            f'{attempts}__lt': settings.ATTACHMENTS_DERIVED_MAX_ATTEMPTS,
+        })
+        return bool(self.filter(Q(**{status: 'none'}) | retryable, id=stored_file_id).update(**{
+            status: 'processing', attempts: F(attempts) + 1, retry_at: now + timeout,
+        }))
+
+    def finish(self, stored_file_id, kind, status, **fields):
+        """Record the outcome of a claimed run; failures back off exponentially."""
+        attempts, retry_at = f'{kind}_attempts', f'{kind}_retry_at'
+        if status == 'failed':
+            tried = self.filter(id=stored_file_id).values_list(attempts, flat=True).first() or 1
+            fields[retry_at] = timezone.now() + timedelta(
+                seconds=settings.ATTACHMENTS_DERIVED_RETRY_SECONDS * 2 ** (tried - 1)
+            )
+        else:
+            fields.update({attempts: 0, retry_at: None})
+        self.filter(id=stored_file_id).update(**{f'{kind}_status': status}, **fields)
+
+
+class StoredFile(models.Model):
+    """A file stored once under its SHA-256, shared by identical attachments."""
+    DERIVED_STATUS_CHOICES = [
+        ('none', 'Not generated'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+        ('unsupported', 'Unsupported'),
+    ]
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()
+    storage_path = models.CharField(max_length=500)
+    ref_count = models.PositiveIntegerField(default=0, help_text="Attachments using this file, including soft-deleted ones")
+    thumbnail_status = models.CharField(max_length=20, choices=DERIVED_STATUS_CHOICES, default='none')
+    # {"<max edge in px>": "<storage path of the WebP>"}
+    thumbnails = models.JSONField(default=dict, blank=True)
+    # Claims made since the last success, and when a stuck or failed run may be retried
+    thumbnail_attempts = models.PositiveSmallIntegerField(default=0)
+    thumbnail_retry_at = models.DateTimeField(null=True, blank=True)
+    preview_status = models.CharField(max_length=20, choices=DERIVED_STATUS_CHOICES, default='none')
+    # Schema, column statistics and sample rows of a dataset (see previews.py)
+    preview = models.JSONField(null=True, blank=True)
+    preview_attempts = models.PositiveSmallIntegerField(default=0)
+    preview_retry_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StoredFileQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'stored_files'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.sha256
+
+
+class Attachment(RollupTrackedMixin, models.Model):
     FILE_TYPE_CHOICES = [
         ('document', 'Document'),
         ('image', 'Image'),
@@ -18,14 +96,20 @@ class Attachment(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     file_type = models.CharField(max_length=20, choices=FILE_TYPE_CHOICES)
-    file_url = models.URLField()
-    file_size = models.PositiveIntegerField(help_text="File size in bytes")
+    # Stable (unsigned) storage URL; downloads are signed when served
+    file_url = models.URLField(max_length=500)
+    storage_path = models.CharField(max_length=500, blank=True, default='', help_text="Name in default storage")
+    stored_file = models.ForeignKey(StoredFile, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='attachments')
+    filename = models.CharField(max_length=255, blank=True, default='')
+    file_size = models.PositiveBigIntegerField(help_text="File size in bytes")
     content_type = models.CharField(max_length=100)
     finding = models.ForeignKey('findings.Finding', on_delete=models.CASCADE, related_name='attachments')
     experiment = models.ForeignKey('experiments.Experiment', on_delete=models.CASCADE, null=True, blank=True,
                                    related_name='attachments')
     downloads_count = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, help_text="When the attachment was soft-deleted")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_attachments')
@@ -34,6 +118,9 @@ class Attachment(models.Model):
     class Meta:
         db_table = 'attachments'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_active', 'deleted_at'], name='attachment_deleted_idx'),
+        ]
 
     @property
     def project(self):
@@ -41,3 +128,74 @@ class Attachment(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class UploadSession(models.Model):
+    """A resumable upload whose chunks may arrive in any order."""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('assembling', 'Assembling'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    finding = models.ForeignKey('findings.Finding', on_delete=models.CASCADE, related_name='upload_sessions')
+    experiment = models.ForeignKey('experiments.Experiment', on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='upload_sessions')
+    title = models.CharField(max_length=100)
+    description = models.TextField(blank=True, null=True)
+    file_type = models.CharField(max_length=20, choices=Attachment.FILE_TYPE_CHOICES)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    total_size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64, blank=True, default='', help_text="Expected SHA-256 of the whole file")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    # Why the last completion failed
+    error = models.CharField(max_length=255, blank=True, default='')
+    attachment = models.OneToOneField(Attachment, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='upload_session')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+
+    class Meta:
+        db_table = 'attachment_upload_sessions'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='upload_session_expiry_idx'),
+        ]
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    def expected_chunk_size(self, index):
+        if index == self.chunk_count - 1:
+            return self.total_size - self.chunk_size * index
+        return self.chunk_size
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.filename})"
+
+
+class UploadChunk(models.Model):
+    """One stored chunk of an upload session."""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64, help_text="SHA-256 of the chunk, hex")
+    storage_path = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'attachment_upload_chunks'
+        ordering = ['session', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='upload_chunk_unique_index'),
+        ]
+
+    def __str__(self):
+        return f"Chunk {self.index} of {self.session_id}"
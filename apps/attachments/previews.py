@@ -0,0 +1,445 @@
+"""
+Schema, column statistics and sample rows for dataset attachments.
+
+The file is streamed from storage and decoded incrementally, so memory use
+depends on ``ATTACHMENTS_PREVIEW_CHUNK_ROWS`` rather than the file size.
+Each batch of rows is turned into one NumPy array per column. Column types
+are inferred batch by batch (empty, boolean, integer, float, then string),
+and numeric batches are merged into a running count, mean and variance.
+Scanning stops after ``ATTACHMENTS_PREVIEW_MAX_ROWS`` rows, in which case
+``complete`` is false and the statistics describe only the rows read.
+
+CSV and TSV are read with the standard library. Parquet needs the optional
+pyarrow package: the row count comes from the file footer, and batches are
+read column by column. Without pyarrow, Parquet files are marked
+``unsupported``.
+
+Like thumbnails, the result is stored on the ``StoredFile`` and computed
+once per distinct file, and failed or stuck runs are retried with backoff.
+It is queued after upload. If it is still missing when the preview
+endpoint is called, the endpoint claims it, queues it and answers 202, so
+a file is never parsed in a request thread.
+"""
+import csv
+import io
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import StoredFile
+from .storage import attachment_storage
+
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_FILE_TYPES = ('dataset',)
+READ_BLOCK_SIZE = 64 * 1024
+SNIFF_SIZE = 64 * 1024
+DISTINCT_LIMIT = 1000
+SAMPLE_CELL_LENGTH = 200
+
+EXTENSION_FORMATS = {
+    '.csv': 'csv',
+    '.tsv': 'tsv',
+    '.tab': 'tsv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+}
+CONTENT_TYPE_FORMATS = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'text/tab-separated-values': 'tsv',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+}
+PARQUET_MAGIC = b'PAR1'
+
+NULL_VALUES = {'', 'na', 'n/a', 'nan', 'null', 'none', '-'}
+TRUE_VALUES = {'true', 't', 'yes', 'y'}
+BOOLEAN_VALUES = TRUE_VALUES | {'false', 'f', 'no', 'n'}
+INTEGER_RE = re.compile(r'[+-]?\d+')
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ATTACHMENTS_PREVIEW_WORKERS, thread_name_prefix='previews'
+)
+
+
+class UnsupportedFile(Exception):
+    pass
+
+
+class ColumnStats:
+    """Running statistics for one column, updated a batch at a time."""
+
+    def __init__(self, name, kind=None):
+        self.name = name
+        # Typed sources (Parquet) fix the kind; text sources infer it.
+        self.kind = kind
+        self.infer = kind is None
+        self.count = 0
+        self.nulls = 0
+        self.true_count = 0
+        self.max_length = 0
+        self.distinct = set()
+        self.distinct_exact = True
+        self.numeric_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def _widen(self, kind):
+        if self.kind is None or self.kind == kind:
+            self.kind = kind
+        elif {self.kind, kind} == {'integer', 'float'}:
+            self.kind = 'float'
+        else:
+            self.kind = 'string'
+
+    def _add_distinct(self, values):
+        if not self.distinct_exact:
+            return
+        self.distinct.update(values)
+        if len(self.distinct) > DISTINCT_LIMIT:
+            self.distinct = set()
+            self.distinct_exact = False
+
+    def add_numbers(self, numbers):
+        """Merge a float64 array into the running mean and variance (Chan et al.)."""
+        numbers = numbers[np.isfinite(numbers)]
+        if not numbers.size:
+            return
+        size = numbers.size
+        mean = float(numbers.mean())
+        m2 = float(((numbers - mean) ** 2).sum())
+        total = self.numeric_count + size
+        delta = mean - self.mean
+        self.mean += delta * size / total
+        self.m2 += m2 + delta * delta * self.numeric_count * size / total
+        self.numeric_count = total
+        low, high = float(numbers.min()), float(numbers.max())
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+    def add_text(self, values):
+        """Add a batch of raw cell strings."""
+        present = [value.strip() for value in values]
+        present = [value for value in present if value.lower() not in NULL_VALUES]
+        self.nulls += len(values) - len(present)
+        self.count += len(present)
+        if not present:
+            return
+        self._add_distinct(present)
+        self.max_length = max(self.max_length, max(map(len, present)))
+
+        lowered = np.char.lower(np.array(present))
+        if self.kind in (None, 'boolean') and np.isin(lowered, list(BOOLEAN_VALUES)).all():
+            self._widen('boolean')
+            self.true_count += int(np.isin(lowered, list(TRUE_VALUES)).sum())
+            return
+        if self.kind == 'string':
+            return
+        try:
+            numbers = np.array(present, dtype=np.float64)
+        except ValueError:
+            self._widen('string')
+            return
+        self._widen('integer' if all(INTEGER_RE.fullmatch(value) for value in present) else 'float')
+        if self.kind in ('integer', 'float'):
+            self.add_numbers(numbers)
+
+    def add_arrow(self, column):
+        """Add a batch from a typed pyarrow array."""
+        self.nulls += column.null_count
+        values = column.drop_null()
+        self.count += len(values)
+        if not len(values):
+            return
+        if self.kind in ('integer', 'float'):
+            self.add_numbers(values.to_numpy(zero_copy_only=False).astype(np.float64))
+        elif self.kind == 'boolean':
+            self.true_count += int(values.to_numpy(zero_copy_only=False).sum())
+        else:
+            strings = [str(value) for value in values.to_pylist()]
+            self._add_distinct(strings)
+            self.max_length = max(self.max_length, max(map(len, strings)))
+
+    def as_dict(self):
+        kind = self.kind or 'empty'
+        result = {
+            'name': self.name,
+            'type': kind,
+            'count': self.count,
+            'nulls': self.nulls,
+        }
+        if self.infer or kind == 'string':
+            result['distinct'] = len(self.distinct) if self.distinct_exact else None
+        if kind == 'boolean':
+            result['true_count'] = self.true_count
+        elif kind in ('integer', 'float') and self.numeric_count:
+            cast = int if kind == 'integer' else float
+            result.update({
+                'min': cast(self.minimum),
+                'max': cast(self.maximum),
+                'mean': self.mean,
+                'std': (self.m2 / (self.numeric_count - 1)) ** 0.5 if self.numeric_count > 1 else 0.0,
+            })
+        elif kind == 'string':
+            result['max_length'] = self.max_length
+        return result
+
+
+def _sample_cell(value):
+    if value is None:
+        return None
+    value = str(value)
+    return value if len(value) <= SAMPLE_CELL_LENGTH else value[:SAMPLE_CELL_LENGTH] + '…'
+
+
+def detect_format(filename, content_type, head):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in EXTENSION_FORMATS:
+        return EXTENSION_FORMATS[extension]
+    base_type = (content_type or '').split(';')[0].strip().lower()
+    if base_type in CONTENT_TYPE_FORMATS:
+        return CONTENT_TYPE_FORMATS[base_type]
+    if head.startswith(PARQUET_MAGIC):
+        return 'parquet'
+    if base_type.startswith('text/'):
+        return 'csv'
+    raise UnsupportedFile(f'Unrecognised dataset format ({content_type or extension or "unknown"})')
+
+
+class _RawReader(io.RawIOBase):
+    """Adapts any storage file with ``read()`` for ``io.TextIOWrapper``."""
+
+    def __init__(self, file):
+        self._file = file
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._file.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _iter_lines(file):
+    """Decode ``file`` as UTF-8 a block at a time, yielding lines with their endings."""
+    # newline='' splits on \n, \r\n and \r but leaves the endings for csv.
+    return io.TextIOWrapper(
+        io.BufferedReader(_RawReader(file), READ_BLOCK_SIZE),
+        encoding='utf-8-sig', errors='replace', newline=''
+    )
+
+
+def _sniff_delimiter(lines, default):
+    sample = ''.join(lines)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return default
+
+
+def _preview_text(file, file_format):
+    lines = _iter_lines(file)
+    head = []
+    head_size = 0
+    for line in lines:
+        head.append(line)
+        head_size += len(line)
+        if head_size >= SNIFF_SIZE:
+            break
+    delimiter = '\t' if file_format == 'tsv' else _sniff_delimiter(head, ',')
+
+    def all_lines():
+        yield from head
+        yield from lines
+
+    reader = csv.reader(all_lines(), delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        raise UnsupportedFile('The file is empty')
+    names = [name.strip() or f'column_{index + 1}' for index, name in enumerate(header)]
+    width = len(names)
+    columns = [ColumnStats(name) for name in names]
+
+    sample_rows = settings.ATTACHMENTS_PREVIEW_SAMPLE_ROWS
+    chunk_rows = settings.ATTACHMENTS_PREVIEW_CHUNK_ROWS
+    max_rows = settings.ATTACHMENTS_PREVIEW_MAX_ROWS
+    sample = []
+    ragged_rows = 0
+    rows_read = 0
+    complete = True
+    batch = []
+
+    def flush():
+        for stats, values in zip(columns, zip(*batch)):
+            stats.add_text(values)
+        batch.clear()
+
+    for row in reader:
+        if not row:
+            continue
+        if rows_read >= max_rows:
+            complete = False
+            break
+        if len(row) != width:
+            ragged_rows += 1
+            row = (row + [''] * width)[:width]
+        if len(sample) < sample_rows:
+            sample.append([_sample_cell(value) for value in row])
+        batch.append(row)
+        rows_read += 1
+        if len(batch) >= chunk_rows:
+            flush()
+    flush()
+
+    return {
+        'format': file_format,
+        'delimiter': delimiter,
+        # Unknown without reading to the end.
+        'row_count': rows_read if complete else None,
+        'rows_scanned': rows_read,
+        'complete': complete,
+        'ragged_rows': ragged_rows,
+        'columns': [stats.as_dict() for stats in columns],
+        'sample': sample,
+    }
+
+
+def _arrow_kind(data_type):
+    import pyarrow as pa
+
+    if pa.types.is_boolean(data_type):
+        return 'boolean'
+    if pa.types.is_integer(data_type):
+        return 'integer'
+    if pa.types.is_floating(data_type) or pa.types.is_decimal(data_type):
+        return 'float'
+    return 'string'
+
+
+def _preview_parquet(file):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise UnsupportedFile('Parquet previews need pyarrow')
+
+    parquet = pq.ParquetFile(file)
+    schema = parquet.schema_arrow
+    columns = [ColumnStats(field.name, _arrow_kind(field.type)) for field in schema]
+    sample_rows = settings.ATTACHMENTS_PREVIEW_SAMPLE_ROWS
+    max_rows = settings.ATTACHMENTS_PREVIEW_MAX_ROWS
+    sample = []
+    rows_read = 0
+    for batch in parquet.iter_batches(batch_size=settings.ATTACHMENTS_PREVIEW_CHUNK_ROWS):
+        if rows_read >= max_rows:
+            break
+        batch = batch.slice(0, max_rows - rows_read)
+        for stats, column in zip(columns, batch.columns):
+            stats.add_arrow(column)
+        if len(sample) < sample_rows:
+            for row in batch.slice(0, sample_rows - len(sample)).to_pylist():
+                sample.append([_sample_cell(row[field.name]) for field in schema])
+        rows_read += batch.num_rows
+
+    row_count = parquet.metadata.num_rows
+    return {
+        'format': 'parquet',
+        'row_count': row_count,
+        'rows_scanned': rows_read,
+        'complete': rows_read >= row_count,
+        'columns': [
+            {**stats.as_dict(), 'arrow_type': str(field.type)}
+            for stats, field in zip(columns, schema)
+        ],
+        'sample': sample,
+    }
+
+
+def build_preview(stored, filename, content_type):
+    with attachment_storage.open(stored.storage_path, 'rb') as file:
+        head = file.read(len(PARQUET_MAGIC))
+        file.seek(0)
+        file_format = detect_format(filename, content_type, head)
+        if file_format == 'parquet':
+            return _preview_parquet(file)
+        return _preview_text(file, file_format)
+
+
+def generate(stored_file_id, filename, content_type):
+    """
+    Compute and store the preview unless another worker already is.
+    Returns the resulting status.
+    """
+    if not _claim(stored_file_id):
+        return _status(stored_file_id)
+    return _compute(stored_file_id, filename, content_type)
+
+
+def request(stored_file_id, filename, content_type):
+    """
+    Queue the preview for a worker unless another one holds it or a retry
+    is not due yet. Returns the status to report.
+    """
+    if not _claim(stored_file_id):
+        return _status(stored_file_id)
+    _executor.submit(_compute_in_worker, stored_file_id, filename, content_type)
+    return 'processing'
+
+
+def _claim(stored_file_id):
+    timeout = timedelta(seconds=settings.ATTACHMENTS_PREVIEW_TIMEOUT)
+    return StoredFile.objects.claim(stored_file_id, 'preview', timeout)
+
+
+def _status(stored_file_id):
+    return StoredFile.objects.filter(id=stored_file_id).values_list('preview_status', flat=True).first()
+
+
+def _compute(stored_file_id, filename, content_type):
+    """Build and store the preview of a claimed stored file."""
+    preview = None
+    try:
+        stored = StoredFile.objects.get(id=stored_file_id)
+        preview = build_preview(stored, filename, content_type)
+    except UnsupportedFile as exc:
+        logger.info('No preview for stored file %s: %s', stored_file_id, exc)
+        status = 'unsupported'
+    except Exception:
+        logger.exception('Preview generation failed for stored file %s', stored_file_id)
+        status = 'failed'
+    else:
+        status = 'ready'
+    StoredFile.objects.finish(stored_file_id, 'preview', status, preview=preview)
+    return status
+
+
+def _generate_in_worker(stored_file_id, filename, content_type):
+    try:
+        generate(stored_file_id, filename, content_type)
+    finally:
+        close_old_connections()
+
+
+def _compute_in_worker(stored_file_id, filename, content_type):
+    try:
+        _compute(stored_file_id, filename, content_type)
+    finally:
+        close_old_connections()
+
+
+def schedule(attachment):
+    """Queue the preview of ``attachment`` once the transaction commits."""
+    if attachment.file_type not in PREVIEW_FILE_TYPES or not attachment.stored_file_id:
+        return
+    args = (attachment.stored_file_id, attachment.filename, attachment.content_type)
+    transaction.on_commit(lambda: _executor.submit(_generate_in_worker, *args))
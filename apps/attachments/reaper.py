@@ -0,0 +1,245 @@
+"""
+Storage maintenance for attachments, run by ``manage.py reap_attachments``.
+
+Each run does the following:
+
+* Aborts upload sessions past their expiry and deletes their chunks. A
+  session being assembled is left until its assembly has timed out.
+* Purges attachments soft-deleted more than ``ATTACHMENTS_PURGE_AFTER_DAYS``
+  ago. Deleting the row releases its stored file, and the blob is removed
+  once no attachment refers to it.
+* Walks the storage listing under ``STORAGE_PREFIXES``, listing
+  directories in parallel. It looks names up in batches against
+  ``StoredFile``, ``UploadChunk`` and ``Attachment`` (``storage_path``,
+  or ``file_url`` for files uploaded before storage paths were recorded).
+  Unreferenced files older than ``ATTACHMENTS_ORPHAN_GRACE_HOURS`` are
+  deleted. The grace period covers uploads written to storage whose row
+  has not been committed yet.
+* With ``verify``, re-hashes every stored file and reports missing or
+  corrupt ones. Thumbnails that went missing are queued to be rendered
+  again.
+"""
+import hashlib
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import storage, uploads
+from .models import Attachment, StoredFile, UploadChunk, UploadSession
+from .storage import attachment_storage
+
+
+STORAGE_PREFIXES = ('blobs', 'uploads', 'attachments')
+LEGACY_PREFIX = 'attachments/'
+REFERENCE_BATCH_SIZE = 1000
+PURGE_BATCH_SIZE = 500
+HASH_BUFFER_SIZE = 1024 * 1024
+THUMBNAIL_RE = re.compile(r'^(?P<blob>.+)_\d+\.webp$')
+
+
+class ReapReport:
+    def __init__(self):
+        self.expired_sessions = 0
+        self.purged_attachments = 0
+        self.scanned_files = 0
+        self.orphans = []
+        self.reclaimed_bytes = 0
+        self.verified = 0
+        self.problems = []
+
+    def as_dict(self):
+        return {
+            'expired_sessions': self.expired_sessions,
+            'purged_attachments': self.purged_attachments,
+            'scanned_files': self.scanned_files,
+            'orphans': len(self.orphans),
+            'reclaimed_bytes': self.reclaimed_bytes,
+            'verified': self.verified,
+            'problems': len(self.problems),
+        }
+
+
+def expire_upload_sessions(report, dry_run=False):
+    now = timezone.now()
+    # Sessions being assembled only once uploads.complete would also take them as dead.
+    stale = now - timedelta(seconds=settings.ATTACHMENTS_UPLOAD_ASSEMBLY_TIMEOUT)
+    sessions = UploadSession.objects.filter(
+        Q(status='active') | Q(status='assembling', updated_at__lt=stale), expires_at__lte=now
+    )
+    for session in sessions.iterator(chunk_size=PURGE_BATCH_SIZE):
+        report.expired_sessions += 1
+        report.reclaimed_bytes += sum(session.chunks.values_list('size', flat=True))
+        if not dry_run:
+            uploads.abort(session)
+
+
+def purge_soft_deleted(report, purge_after_days, dry_run=False):
+    cutoff = timezone.now() - timedelta(days=purge_after_days)
+    queryset = Attachment.objects.filter(is_active=False, deleted_at__lt=cutoff)
+    ids = list(queryset.values_list('id', flat=True))
+    for start in range(0, len(ids), PURGE_BATCH_SIZE):
+        batch = ids[start:start + PURGE_BATCH_SIZE]
+        sizes = dict(
+            StoredFile.objects.filter(attachments__id__in=batch).distinct().values_list('id', 'size')
+        )
+        report.purged_attachments += len(batch)
+        if dry_run:
+            # Blobs used only by this batch would be freed.
+            still_used = set(
+                Attachment.objects.filter(stored_file_id__in=sizes).exclude(id__in=ids)
+                .values_list('stored_file_id', flat=True)
+            )
+            report.reclaimed_bytes += sum(size for stored_id, size in sizes.items() if stored_id not in still_used)
+            continue
+        with transaction.atomic():
+            # One at a time so the post_delete signal releases each file.
+            for attachment in Attachment.objects.filter(id__in=batch):
+                attachment.delete()
+        remaining = set(StoredFile.objects.filter(id__in=sizes).values_list('id', flat=True))
+        report.reclaimed_bytes += sum(size for stored_id, size in sizes.items() if stored_id not in remaining)
+
+
+def walk(prefixes, workers):
+    """Yield every file name under ``prefixes``, listing directories concurrently."""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reaper') as executor:
+        pending = {executor.submit(attachment_storage.listdir, prefix): prefix for prefix in prefixes}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                prefix = pending.pop(future)
+                try:
+                    directories, files = future.result()
+                except FileNotFoundError:
+                    continue
+                for directory in directories:
+                    path = f'{prefix}/{directory}'
+                    pending[executor.submit(attachment_storage.listdir, path)] = path
+                for name in files:
+                    yield f'{prefix}/{name}'
+
+
+def _batches(names, size):
+    batch = []
+    for name in names:
+        batch.append(name)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def unreferenced(names):
+    """The names in ``names`` no database row refers to."""
+    names = set(names)
+    names -= set(StoredFile.objects.filter(storage_path__in=names).values_list('storage_path', flat=True))
+    names -= set(UploadChunk.objects.filter(storage_path__in=names).values_list('storage_path', flat=True))
+    names -= set(Attachment.objects.filter(storage_path__in=names).values_list('storage_path', flat=True))
+
+    legacy = {storage.stable_url(name): name for name in names if name.startswith(LEGACY_PREFIX)}
+    if legacy:
+        linked = Attachment.objects.filter(file_url__in=legacy).values_list('file_url', flat=True)
+        names -= {legacy[url] for url in linked}
+
+    thumbnails = {}
+    for name in names:
+        match = THUMBNAIL_RE.match(name)
+        if match:
+            thumbnails.setdefault(match.group('blob'), []).append(name)
+    if thumbnails:
+        for blob in StoredFile.objects.filter(storage_path__in=thumbnails).values_list('storage_path', flat=True):
+            names -= set(thumbnails[blob])
+    return names
+
+
+def _orphan_size(name, cutoff):
+    """The size of ``name`` if it is older than ``cutoff``, else ``None``."""
+    try:
+        if attachment_storage.get_modified_time(name) >= cutoff:
+            return None
+        return attachment_storage.size(name)
+    except (FileNotFoundError, NotImplementedError):
+        return None
+
+
+def reap_orphans(report, grace_hours, dry_run=False, workers=None):
+    workers = workers or settings.ATTACHMENTS_STORAGE_WORKERS
+    cutoff = timezone.now() - timedelta(hours=grace_hours)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reaper') as executor:
+        for batch in _batches(walk(STORAGE_PREFIXES, workers), REFERENCE_BATCH_SIZE):
+            report.scanned_files += len(batch)
+            candidates = sorted(unreferenced(batch))
+            orphans = [
+                (name, size)
+                for name, size in zip(candidates, executor.map(lambda name: _orphan_size(name, cutoff), candidates))
+                if size is not None
+            ]
+            if not orphans:
+                continue
+            report.orphans.extend(name for name, _ in orphans)
+            report.reclaimed_bytes += sum(size for _, size in orphans)
+            if not dry_run:
+                storage.delete_many([name for name, _ in orphans])
+
+
+def _check_stored_file(stored):
+    """Return a problem description for ``stored``, or ``None`` if it is intact."""
+    try:
+        if attachment_storage.size(stored.storage_path) != stored.size:
+            return 'size mismatch'
+        digest = hashlib.sha256()
+        with attachment_storage.open(stored.storage_path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BUFFER_SIZE), b''):
+                digest.update(block)
+    except FileNotFoundError:
+        return 'missing'
+    if digest.hexdigest() != stored.sha256:
+        return 'checksum mismatch'
+    return None
+
+
+def _missing_thumbnails(stored):
+    return stored.thumbnail_status == 'ready' and not all(
+        attachment_storage.exists(path) for path in stored.thumbnails.values()
+    )
+
+
+def verify_stored_files(report, workers=None):
+    workers = workers or settings.ATTACHMENTS_STORAGE_WORKERS
+    stale_thumbnails = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reaper') as executor:
+        for batch in _batches(StoredFile.objects.order_by('id').iterator(chunk_size=REFERENCE_BATCH_SIZE),
+                              REFERENCE_BATCH_SIZE):
+            problems = executor.map(_check_stored_file, batch)
+            thumbnails_missing = executor.map(_missing_thumbnails, batch)
+            for stored, problem, no_thumbnails in zip(batch, problems, thumbnails_missing):
+                report.verified += 1
+                if problem:
+                    report.problems.append({'id': stored.id, 'sha256': stored.sha256, 'problem': problem})
+                if no_thumbnails:
+                    stale_thumbnails.append(stored.id)
+    if stale_thumbnails:
+        # Rendered again by the thumbnail endpoint on next request.
+        StoredFile.objects.filter(id__in=stale_thumbnails).update(thumbnail_status='none', thumbnails={})
+
+
+def reap(dry_run=False, verify=False, purge_after_days=None, grace_hours=None, workers=None):
+    report = ReapReport()
+    if purge_after_days is None:
+        purge_after_days = settings.ATTACHMENTS_PURGE_AFTER_DAYS
+    if grace_hours is None:
+        grace_hours = settings.ATTACHMENTS_ORPHAN_GRACE_HOURS
+    expire_upload_sessions(report, dry_run)
+    purge_soft_deleted(report, purge_after_days, dry_run)
+    if not dry_run:
+        # Let files released above be deleted before the listing is walked.
+        storage.wait_for_deletes()
+    reap_orphans(report, grace_hours, dry_run, workers)
+    if verify:
+        verify_stored_files(report, workers)
+    return report
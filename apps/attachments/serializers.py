@@ -1,9 +1,18 @@
+import os
+import re
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.text import get_valid_filename
 from rest_framework import serializers
-from .models import Attachment
+from .models import Attachment, UploadSession
+from .storage import attachment_storage, supports_direct_upload
 from apps.users.serializers import UserSerializer
 
 
 class AttachmentSerializer(serializers.ModelSerializer):
+    file_url = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
     finding = serializers.SerializerMethodField()
     experiment = serializers.SerializerMethodField()
     project = serializers.SerializerMethodField()
@@ -14,7 +23,7 @@ class AttachmentSerializer(serializers.ModelSerializer):
         model = Attachment
         fields = [
             'id', 'title', 'description', 'file_type', 'file_url',
-            'file_size', 'content_type', 'finding', 'experiment',
+            'file_size', 'content_type', 'thumbnails', 'finding', 'experiment',
             'project', 'downloads_count', 'is_active', 'created_at',
             'updated_at', 'created_by', 'updated_by'
         ]
@@ -23,6 +32,34 @@ class AttachmentSerializer(serializers.ModelSerializer):
             'is_active', 'created_at', 'updated_at', 'created_by', 'updated_by'
         ]
 
+    def get_file_url(self, obj):
+        """The download endpoint, which checks access and signs storage links when served."""
+        if not obj.storage_path:
+            # Uploaded before storage paths were recorded.
+            return obj.file_url
+        request = self.context.get('request')
+        url = reverse('attachment-download', kwargs={'pk': obj.pk})
+        return request.build_absolute_uri(url) if request else url
+
+    def get_thumbnails(self, obj):
+        """
+        ``{size: url}``. Ready thumbnails link to storage; others to the
+        endpoint that renders them on first request.
+        """
+        from .thumbnails import THUMBNAIL_FILE_TYPES
+
+        stored = obj.stored_file
+        if obj.file_type not in THUMBNAIL_FILE_TYPES or stored is None or stored.thumbnail_status == 'unsupported':
+            return {}
+        if stored.thumbnail_status == 'ready':
+            return {size: attachment_storage.url(path) for size, path in stored.thumbnails.items()}
+        request = self.context.get('request')
+        urls = {}
+        for size in settings.ATTACHMENTS_THUMBNAIL_SIZES:
+            url = reverse('attachment-thumbnail', kwargs={'pk': obj.pk, 'size': size})
+            urls[str(size)] = request.build_absolute_uri(url) if request else url
+        return urls
+
     def get_finding(self, obj):
         from apps.findings.serializers import FindingSerializer
         return FindingSerializer(obj.finding).data
@@ -57,3 +94,70 @@ class AttachmentUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attachment
         fields = ['title', 'description', 'file_type', 'is_active']
+
+    def validate_is_active(self, value):
+        attachment = self.instance
+        if (value and attachment is not None and not attachment.is_active and
+                attachment.storage_path.startswith('blobs/') and attachment.stored_file_id is None):
+            raise serializers.ValidationError("The file of this attachment has been deleted")
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_count = serializers.ReadOnlyField()
+    received_chunks = serializers.SerializerMethodField()
+    direct_upload = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'finding', 'experiment', 'title', 'description', 'file_type',
+            'filename', 'content_type', 'total_size', 'chunk_size', 'chunk_count',
+            'received_chunks', 'direct_upload', 'checksum', 'status', 'error', 'attachment', 'expires_at',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+    def get_received_chunks(self, obj):
+        from .uploads import received_chunks
+        return received_chunks(obj)
+
+    def get_direct_upload(self, obj):
+        """Whether chunks can be PUT straight to storage (see the presign endpoint)."""
+        return supports_direct_upload()
+
+
+class UploadSessionCreateSerializer(serializers.ModelSerializer):
+    finding_id = serializers.IntegerField()
+    experiment_id = serializers.IntegerField(required=False, allow_null=True)
+    total_size = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'title', 'description', 'file_type', 'filename', 'content_type',
+            'total_size', 'checksum', 'finding_id', 'experiment_id'
+        ]
+
+    def validate_title(self, value):
+        if len(value) < 3:
+            raise serializers.ValidationError("Title must be at least 3 characters long")
+        return value
+
+    def validate_filename(self, value):
+        filename = get_valid_filename(os.path.basename(value))
+        if not filename:
+            raise serializers.ValidationError("Invalid filename")
+        return filename
+
+    def validate_total_size(self, value):
+        if value > settings.ATTACHMENTS_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f"File size cannot exceed {settings.ATTACHMENTS_MAX_UPLOAD_SIZE} bytes"
+            )
+        return value
+
+    def validate_checksum(self, value):
+        if value and not re.fullmatch(r'[0-9a-fA-F]{64}', value):
+            raise serializers.ValidationError("Checksum must be a hex SHA-256 digest")
+        return value.lower()
@@ -0,0 +1,52 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import blobs, previews, thumbnails
+from .models import Attachment, StoredFile
+
+
+@receiver(pre_save, sender=Attachment)
+def remember_previous_state(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None:
+        return
+    if update_fields is not None and not {'is_active', 'stored_file'} & set(update_fields):
+        return
+    previous = Attachment.objects.filter(pk=instance.pk).values('is_active', 'stored_file_id').first()
+    if not previous:
+        return
+    instance._previous_stored_file_id = previous['stored_file_id']
+    if update_fields is None and previous['is_active'] != instance.is_active:
+        instance.deleted_at = None if instance.is_active else timezone.now()
+
+
+@receiver(post_save, sender=Attachment)
+def queue_derived_files(sender, instance, created, **kwargs):
+    if created:
+        thumbnails.schedule(instance)
+        previews.schedule(instance)
+
+
+@receiver(post_save, sender=Attachment)
+def update_file_reference(sender, instance, created, **kwargs):
+    """
+    An attachment holds a reference to its stored file until the row is
+    deleted; soft-deleted attachments keep theirs until they are purged.
+    """
+    if created or not hasattr(instance, '_previous_stored_file_id'):
+        return
+    before = instance.__dict__.pop('_previous_stored_file_id')
+    now = instance.stored_file_id
+    if before == now:
+        return
+    if before:
+        blobs.release(before)
+    if now:
+        StoredFile.objects.filter(id=now).update(ref_count=F('ref_count') + 1)
+
+
+@receiver(post_delete, sender=Attachment)
+def release_deleted_file(sender, instance, **kwargs):
+    if instance.stored_file_id:
+        blobs.release(instance.stored_file_id)
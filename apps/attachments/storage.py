@@ -0,0 +1,391 @@
+"""
+Storage backends for attachment files.
+
+Attachment files live in the ``attachments`` entry of ``STORAGES``. By
+default that is a ``FileSystemStorage`` under ``MEDIA_ROOT``. With
+``USE_S3=True`` it is ``S3Storage``, which talks to AWS S3 or any
+S3-compatible service such as MinIO (set ``AWS_S3_ENDPOINT_URL``). The
+``attachment_storage`` object below resolves to whichever is configured.
+
+``S3Storage`` needs boto3, imported only when the backend is first used.
+Large saves go through boto3's managed transfer, which splits files above
+``multipart_threshold`` into parts uploaded concurrently. Opened files
+stream the object; seeking starts a new ranged GET, so nothing is
+downloaded up front.
+
+Backends may also offer direct uploads. ``presigned_upload`` returns a URL
+the client PUTs bytes to, so they never pass through the app server, and
+``stored_sha256`` lets the server check the result without reading it.
+``FileSystemStorage`` has neither, so clients of local storage upload
+through the API.
+
+``url()`` of a private bucket is presigned and expires. Anything stored
+in the database uses ``stable_url()`` instead, and links are signed when a
+download is served. ``move()`` renames a file inside storage: a server-side
+copy on S3, a rename on local disk.
+
+Bulk saves and deletes run on a small thread pool (``save_many``,
+``delete_many``, ``delete_on_commit``).
+"""
+import base64
+import binascii
+import logging
+import mimetypes
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import File
+from django.core.files.storage import Storage, storages
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import LazyObject, cached_property
+
+
+logger = logging.getLogger(__name__)
+
+S3_DELETE_BATCH_SIZE = 1000
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ATTACHMENTS_STORAGE_WORKERS, thread_name_prefix='storage'
+)
+
+
+class AttachmentStorage(LazyObject):
+    def _setup(self):
+        self._wrapped = storages['attachments']
+
+
+attachment_storage = AttachmentStorage()
+_pending_deletes = set()
+
+
+class S3File(File):
+    """Read-only, seekable view of an S3 object that streams ranged GETs."""
+
+    def __init__(self, storage, name):
+        self._storage = storage
+        self.name = name
+        self.mode = 'rb'
+        self._body = None
+        self._position = 0
+        self._size = None
+        self._closed = False
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._size = self._storage.size(self.name)
+        return self._size
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += self.size
+        if offset != self._position:
+            self._release_body()
+            self._position = offset
+        return self._position
+
+    def read(self, size=-1):
+        if self._position >= self.size:
+            return b''
+        if self._body is None:
+            self._body = self._storage.get_object(self.name, Range=f'bytes={self._position}-')['Body']
+        data = self._body.read(None if size is None or size < 0 else size)
+        self._position += len(data)
+        return data
+
+    def _release_body(self):
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+
+    def close(self):
+        self._release_body()
+        self._closed = True
+
+
+@deconstructible
+class S3Storage(Storage):
+    def __init__(self, bucket_name=None, endpoint_url=None, region_name=None, access_key=None,
+                 secret_key=None, location='', addressing_style=None, public_url=None,
+                 querystring_expire=3600, multipart_threshold=64 * 1024 * 1024,
+                 multipart_chunksize=16 * 1024 * 1024, max_concurrency=8):
+        if not bucket_name:
+            raise ImproperlyConfigured('S3Storage needs a bucket_name')
+        self.bucket_name = bucket_name
+        self.endpoint_url = endpoint_url or None
+        self.region_name = region_name or None
+        self.access_key = access_key or None
+        self.secret_key = secret_key or None
+        self.location = location.strip('/')
+        self.addressing_style = addressing_style or None
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.querystring_expire = querystring_expire
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunksize = multipart_chunksize
+        self.max_concurrency = max_concurrency
+
+    @cached_property
+    def client(self):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise ImproperlyConfigured('S3Storage needs the boto3 package')
+        return boto3.client(
+            's3',
+            endpoint_url=self.endpoint_url,
+            region_name=self.region_name,
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+            config=Config(
+                signature_version='s3v4',
+                s3={'addressing_style': self.addressing_style} if self.addressing_style else None,
+                max_pool_connections=max(10, self.max_concurrency * 2),
+            ),
+        )
+
+    @cached_property
+    def transfer_config(self):
+        from boto3.s3.transfer import TransferConfig
+
+        return TransferConfig(
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.multipart_chunksize,
+            max_concurrency=self.max_concurrency,
+        )
+
+    def key(self, name):
+        name = posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+        return f'{self.location}/{name}' if self.location else name
+
+    def _call(self, method, name, **kwargs):
+        """Call a per-object client method, raising FileNotFoundError for missing keys."""
+        from botocore.exceptions import ClientError
+
+        try:
+            return getattr(self.client, method)(Bucket=self.bucket_name, Key=self.key(name), **kwargs)
+        except ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(name) from exc
+            raise
+
+    def _head(self, name, **kwargs):
+        return self._call('head_object', name, **kwargs)
+
+    def get_object(self, name, **kwargs):
+        return self._call('get_object', name, **kwargs)
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            raise ValueError('S3Storage files are read-only; use save()')
+        return S3File(self, name)
+
+    def _save(self, name, content):
+        # boto3 probes readable()/seekable(), which Django's File wrapper only
+        # forwards for real file objects; hand it the underlying one.
+        fileobj = getattr(content, 'file', None) or content
+        if getattr(fileobj, 'seekable', lambda: False)():
+            fileobj.seek(0)
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.client.upload_fileobj(
+            fileobj, self.bucket_name, self.key(name),
+            ExtraArgs={'ContentType': content_type},
+            Config=self.transfer_config,
+        )
+        return name
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket_name, Key=self.key(name))
+
+    def delete_many(self, names):
+        """Delete up to 1000 objects per request."""
+        names = list(names)
+        for start in range(0, len(names), S3_DELETE_BATCH_SIZE):
+            batch = names[start:start + S3_DELETE_BATCH_SIZE]
+            response = self.client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': self.key(name)} for name in batch], 'Quiet': True},
+            )
+            for error in response.get('Errors', []):
+                logger.warning('Could not delete %s: %s', error.get('Key'), error.get('Message'))
+
+    def exists(self, name):
+        try:
+            self._head(name)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def size(self, name):
+        return self._head(name)['ContentLength']
+
+    def get_modified_time(self, name):
+        return self._head(name)['LastModified']
+
+    def listdir(self, path):
+        prefix = self.key(path).rstrip('/') + '/' if path else (f'{self.location}/' if self.location else '')
+        directories, files = [], []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+            directories.extend(
+                entry['Prefix'][len(prefix):].rstrip('/') for entry in page.get('CommonPrefixes', [])
+            )
+            files.extend(entry['Key'][len(prefix):] for entry in page.get('Contents', []))
+        return directories, files
+
+    def object_url(self, name):
+        """The unsigned URL of ``name``; only readable directly when the bucket is public."""
+        if self.public_url:
+            return f'{self.public_url}/{self.key(name)}'
+        return f'{self.client.meta.endpoint_url}/{self.bucket_name}/{quote(self.key(name))}'
+
+    def url(self, name):
+        if self.public_url:
+            return self.object_url(name)
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket_name, 'Key': self.key(name)},
+            ExpiresIn=self.querystring_expire,
+        )
+
+    def move(self, name, target):
+        """Copy ``name`` to ``target`` inside the bucket, then delete it. Large objects are copied in parts."""
+        self.client.copy(
+            {'Bucket': self.bucket_name, 'Key': self.key(name)}, self.bucket_name, self.key(target),
+            Config=self.transfer_config,
+        )
+        self.delete(name)
+
+    def presigned_upload(self, name, size, sha256, expires_in=None):
+        """
+        A PUT request the client can send straight to the bucket. S3 rejects
+        the body unless it is ``size`` bytes with SHA-256 ``sha256`` (hex).
+        """
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': self.bucket_name,
+                'Key': self.key(name),
+                'ContentLength': size,
+                'ChecksumSHA256': checksum,
+            },
+            ExpiresIn=expires_in or self.querystring_expire,
+        )
+        return {
+            'url': url,
+            'method': 'PUT',
+            'headers': {'Content-Length': str(size), 'x-amz-checksum-sha256': checksum},
+        }
+
+    def stored_sha256(self, name):
+        """The hex SHA-256 S3 verified on upload, or ``None`` if it kept none."""
+        checksum = self._head(name, ChecksumMode='ENABLED').get('ChecksumSHA256')
+        if not checksum or '-' in checksum:
+            # Missing, or a checksum of part checksums from a multipart upload.
+            return None
+        try:
+            return base64.b64decode(checksum).hex()
+        except (binascii.Error, ValueError):
+            return None
+
+
+def supports_direct_upload(storage=attachment_storage):
+    return hasattr(storage, 'presigned_upload')
+
+
+def stable_url(name):
+    """A URL of ``name`` that does not expire, for storing in the database."""
+    if hasattr(attachment_storage, 'object_url'):
+        return attachment_storage.object_url(name)
+    return attachment_storage.url(name)
+
+
+def move(name, target):
+    """Move ``name`` to ``target``, or a free name based on it; returns the new name."""
+    target = attachment_storage.get_available_name(target)
+    if hasattr(attachment_storage, 'move'):
+        attachment_storage.move(name, target)
+        return target
+    try:
+        source, destination = attachment_storage.path(name), attachment_storage.path(target)
+    except NotImplementedError:
+        with attachment_storage.open(name, 'rb') as file:
+            target = attachment_storage.save(target, file)
+        attachment_storage.delete(name)
+        return target
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    while True:
+        try:
+            # Unlike a rename, link() fails if another writer took the name meanwhile.
+            os.link(source, destination)
+            break
+        except FileExistsError:
+            target = attachment_storage.get_available_name(target)
+            destination = attachment_storage.path(target)
+    os.remove(source)
+    return target
+
+
+def _delete_quietly(name):
+    try:
+        attachment_storage.delete(name)
+    except Exception:
+        logger.exception('Could not delete %s from attachment storage', name)
+
+
+def delete_many(names):
+    """Delete ``names`` concurrently (or in bulk requests where the backend can)."""
+    names = [name for name in names if name]
+    if not names:
+        return
+    if hasattr(attachment_storage, 'delete_many'):
+        try:
+            attachment_storage.delete_many(names)
+        except Exception:
+            logger.exception('Could not delete %d files from attachment storage', len(names))
+        return
+    list(_executor.map(_delete_quietly, names))
+
+
+def delete_on_commit(names):
+    """Delete ``names`` in the background once the current transaction commits."""
+    names = list(names)
+
+    def submit():
+        future = _executor.submit(delete_many, names)
+        _pending_deletes.add(future)
+        future.add_done_callback(_pending_deletes.discard)
+
+    transaction.on_commit(submit)
+
+
+def wait_for_deletes():
+    """Block until the deletes queued by ``delete_on_commit`` have run."""
+    wait(list(_pending_deletes))
+
+
+def save_many(files):
+    """Save ``{name: content}`` concurrently; returns ``{name: saved name}``."""
+    futures = {name: _executor.submit(attachment_storage.save, name, content) for name, content in files.items()}
+    return {name: future.result() for name, future in futures.items()}
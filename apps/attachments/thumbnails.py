@@ -0,0 +1,154 @@
+"""
+WebP thumbnails for image and document attachments.
+
+Thumbnails belong to the ``StoredFile``, so attachments with identical
+content share them. They are stored next to the blob as
+``<blob path>_<size>.webp``, one per ``ATTACHMENTS_THUMBNAIL_SIZES`` entry
+(the longest edge in pixels).
+
+New attachments are queued on a small thread pool after commit. The
+thumbnail endpoint generates them inline if they are still missing when a
+client asks. Whoever claims ``thumbnail_status`` (see
+``StoredFileQuerySet.claim``) does the work, so a file is never rendered
+twice at once. Runs that fail, or die while processing, are retried with
+backoff a few times and then stay ``failed``.
+
+Documents get a preview of their first page. Multi-page TIFFs work with
+Pillow alone; PDFs need the optional PyMuPDF package and are marked
+``unsupported`` without it.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import storage
+from .models import StoredFile
+
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_FILE_TYPES = ('image', 'document')
+WEBP_QUALITY = 80
+PDF_RENDER_DPI = 110
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ATTACHMENTS_THUMBNAIL_WORKERS, thread_name_prefix='thumbnails'
+)
+
+
+class UnsupportedFile(Exception):
+    pass
+
+
+def thumbnail_path(stored, size):
+    return f'{stored.storage_path}_{size}.webp'
+
+
+def _render_pdf(stored):
+    try:
+        import fitz
+    except ImportError:
+        raise UnsupportedFile('PDF previews need PyMuPDF')
+    with storage.attachment_storage.open(stored.storage_path, 'rb') as file:
+        document = fitz.open(stream=file.read(), filetype='pdf')
+    try:
+        page = document.load_page(0)
+        pixmap = page.get_pixmap(dpi=PDF_RENDER_DPI)
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+    finally:
+        document.close()
+
+
+def _open_first_page(stored, content_type):
+    if content_type == 'application/pdf':
+        return _render_pdf(stored)
+    with storage.attachment_storage.open(stored.storage_path, 'rb') as file:
+        try:
+            image = Image.open(file)
+            # JPEG can decode at 1/2, 1/4 or 1/8 scale directly, which is far
+            # cheaper than decoding full size and shrinking.
+            largest = max(settings.ATTACHMENTS_THUMBNAIL_SIZES)
+            image.draft('RGB', (largest, largest))
+            image.seek(0)
+            # Read EXIF before decoding: the TIFF loader drops its file
+            # handle once the pixels are loaded.
+            image.getexif()
+            image.load()
+        except (UnidentifiedImageError, OSError):
+            raise UnsupportedFile('Not an image Pillow can read')
+        return ImageOps.exif_transpose(image)
+
+
+def _encode(image):
+    buffer = io.BytesIO()
+    image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def render(stored, content_type):
+    """Write every thumbnail size for ``stored``; returns ``{size: path}``."""
+    image = _open_first_page(stored, content_type)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    files = {}
+    sizes = {}
+    # Largest first: each smaller size is reduced from the previous one.
+    for size in sorted(settings.ATTACHMENTS_THUMBNAIL_SIZES, reverse=True):
+        image.thumbnail((size, size), Image.LANCZOS)
+        path = thumbnail_path(stored, size)
+        files[path] = ContentFile(_encode(image))
+        sizes[path] = str(size)
+    # Replace leftovers of an earlier attempt, then upload all sizes at once.
+    storage.delete_many(list(files))
+    saved = storage.save_many(files)
+    return {sizes[path]: name for path, name in saved.items()}
+
+
+def generate(stored_file_id, content_type):
+    """
+    Render the thumbnails unless another worker already is. Returns the
+    resulting status.
+    """
+    timeout = timedelta(seconds=settings.ATTACHMENTS_THUMBNAIL_TIMEOUT)
+    if not StoredFile.objects.claim(stored_file_id, 'thumbnail', timeout):
+        return StoredFile.objects.filter(id=stored_file_id).values_list('thumbnail_status', flat=True).first()
+
+    paths = {}
+    try:
+        stored = StoredFile.objects.get(id=stored_file_id)
+        previous = set(stored.thumbnails.values())
+        paths = render(stored, content_type)
+    except UnsupportedFile as exc:
+        logger.info('No thumbnails for stored file %s: %s', stored_file_id, exc)
+        status = 'unsupported'
+    except Exception:
+        logger.exception('Thumbnail generation failed for stored file %s', stored_file_id)
+        status = 'failed'
+    else:
+        status = 'ready'
+        # Sizes that are no longer configured.
+        storage.delete_many(list(previous - set(paths.values())))
+    StoredFile.objects.finish(stored_file_id, 'thumbnail', status, thumbnails=paths)
+    return status
+
+
+def _generate_in_worker(stored_file_id, content_type):
+    try:
+        generate(stored_file_id, content_type)
+    finally:
+        close_old_connections()
+
+
+def schedule(attachment):
+    """Queue thumbnail generation for ``attachment`` once the transaction commits."""
+    if attachment.file_type not in THUMBNAIL_FILE_TYPES or not attachment.stored_file_id:
+        return
+    stored_file_id, content_type = attachment.stored_file_id, attachment.content_type
+    transaction.on_commit(lambda: _executor.submit(_generate_in_worker, stored_file_id, content_type))
@@ -0,0 +1,329 @@
+"""
+Resumable chunked uploads, modelled on the tus protocol.
+
+A client opens an ``UploadSession`` with the total size and gets the chunk
+size back. Each chunk is PUT to its index, in any order and as often as
+needed, with an ``Upload-Checksum: sha256 <base64 digest>`` header. The
+request body is hashed while it is copied 64KB at a time to a temporary
+file on disk and then saved to attachment storage, so memory use does not
+depend on the chunk or file size.
+
+With object storage, a client can instead ask for a presigned request
+(``presign_chunk``), PUT the chunk straight to the bucket, and then
+``confirm_chunk``. The storage verifies the size and checksum on upload,
+and the app server never handles the chunk's bytes.
+
+Completing the session marks it ``assembling`` and hands it to a
+background worker, so the request returns at once; clients poll the
+session until it is ``completed`` (with its attachment) or back to
+``active`` or ``aborted`` with an ``error``. The worker reads the chunks
+once, in index order, writing them to one staged file (a multipart upload
+on S3) while computing the whole-file SHA-256, which is checked against
+the client's if one was given. The staged file is then moved into
+content-addressed storage (see ``blobs``) with a server-side copy, or
+dropped if a file with that digest is already stored, and the
+``Attachment`` is created.
+"""
+import base64
+import binascii
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import File
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from . import blobs, storage
+from .models import Attachment, UploadChunk, UploadSession
+
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ATTACHMENTS_UPLOAD_WORKERS, thread_name_prefix='uploads'
+)
+
+
+class UploadError(Exception):
+    """A chunk or session the server cannot accept; ``status_code`` is the HTTP status."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def parse_checksum_header(value):
+    """Return the hex SHA-256 from an ``Upload-Checksum: sha256 <base64>`` header."""
+    algorithm, _, digest = (value or '').strip().partition(' ')
+    if algorithm.lower() != 'sha256' or not digest:
+        raise UploadError('Upload-Checksum must be "sha256 <base64 digest>"')
+    try:
+        raw = base64.b64decode(digest.strip(), validate=True)
+    except (binascii.Error, ValueError):
+        raise UploadError('Upload-Checksum digest is not valid base64')
+    if len(raw) != hashlib.sha256().digest_size:
+        raise UploadError('Upload-Checksum digest has the wrong length')
+    return raw.hex()
+
+
+def open_session(**fields):
+    return UploadSession.objects.create(
+        chunk_size=settings.ATTACHMENTS_UPLOAD_CHUNK_SIZE,
+        expires_at=timezone.now() + timedelta(hours=settings.ATTACHMENTS_UPLOAD_EXPIRY_HOURS),
+        **fields
+    )
+
+
+def received_chunks(session):
+    return list(session.chunks.order_by('index').values_list('index', flat=True))
+
+
+def _chunk_path(session, index):
+    return f'uploads/{session.id}/{index:06d}'
+
+
+def _check_chunk(session, index):
+    """Validate that chunk ``index`` may be stored now; returns its expected size."""
+    if session.status != 'active':
+        raise UploadError(f'Upload is {session.status}', status_code=409)
+    if session.expires_at <= timezone.now():
+        raise UploadError('Upload session has expired', status_code=410)
+    if not 0 <= index < session.chunk_count:
+        raise UploadError(f'Chunk index must be between 0 and {session.chunk_count - 1}')
+    return session.expected_chunk_size(index)
+
+
+def _record_chunk(session, index, size, checksum, path):
+    previous = stale_path = None
+    try:
+        with transaction.atomic():
+            previous = UploadChunk.objects.select_for_update().filter(session=session, index=index).first()
+            if previous is None:
+                chunk = UploadChunk.objects.create(
+                    session=session, index=index, size=size, checksum=checksum, storage_path=path
+                )
+            else:
+                stale_path = previous.storage_path
+                previous.size, previous.checksum, previous.storage_path = size, checksum, path
+                previous.save(update_fields=['size', 'checksum', 'storage_path'])
+                chunk = previous
+    except IntegrityError:
+        # Another request stored the same index first; keep that copy.
+        if not UploadChunk.objects.filter(session=session, storage_path=path).exists():
+            storage.delete_many([path])
+        raise UploadError(f'Chunk {index} was uploaded concurrently', status_code=409)
+    if previous is not None and stale_path != path:
+        storage.delete_many([stale_path])
+    UploadSession.objects.filter(id=session.id).update(updated_at=timezone.now())
+    return chunk
+
+
+def store_chunk(session, index, stream, content_length, checksum):
+    """
+    Copy ``content_length`` bytes from ``stream`` into storage as chunk
+    ``index``. Storing an index again replaces the earlier copy.
+    """
+    expected = _check_chunk(session, index)
+    if content_length != expected:
+        raise UploadError(f'Chunk {index} must be {expected} bytes, got Content-Length {content_length}')
+
+    digest = hashlib.sha256()
+    received = 0
+    with tempfile.TemporaryFile() as buffer:
+        while received < expected:
+            block = stream.read(min(COPY_BUFFER_SIZE, expected - received))
+            if not block:
+                break
+            digest.update(block)
+            buffer.write(block)
+            received += len(block)
+        if received != expected:
+            raise UploadError(f'Chunk {index} ended after {received} of {expected} bytes')
+        if digest.hexdigest() != checksum:
+            # 460 is the tus "Checksum Mismatch" status.
+            raise UploadError(f'Checksum mismatch for chunk {index}', status_code=460)
+
+        buffer.seek(0)
+        path = storage.attachment_storage.save(_chunk_path(session, index), File(buffer))
+
+    return _record_chunk(session, index, received, checksum, path)
+
+
+def _direct_chunk_path(session, index):
+    return f'{_chunk_path(session, index)}.direct'
+
+
+def presign_chunk(session, index, checksum):
+    """
+    A request the client sends to put chunk ``index`` straight into
+    storage. The storage rejects bodies of the wrong size or checksum.
+    """
+    expected = _check_chunk(session, index)
+    if not storage.supports_direct_upload():
+        raise UploadError('Direct uploads need object storage; PUT the chunk to this API instead', 501)
+    expires_in = int((session.expires_at - timezone.now()).total_seconds())
+    request = storage.attachment_storage.presigned_upload(
+        _direct_chunk_path(session, index), expected, checksum, expires_in=expires_in
+    )
+    return {**request, 'index': index, 'expires_at': session.expires_at}
+
+
+def _hash_stored(path):
+    digest = hashlib.sha256()
+    with storage.attachment_storage.open(path, 'rb') as file:
+        for block in iter(lambda: file.read(COPY_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def confirm_chunk(session, index, checksum):
+    """Record a chunk the client uploaded with ``presign_chunk``."""
+    expected = _check_chunk(session, index)
+    if not storage.supports_direct_upload():
+        raise UploadError('Direct uploads need object storage', 501)
+    path = _direct_chunk_path(session, index)
+    if not storage.attachment_storage.exists(path):
+        raise UploadError(f'Chunk {index} has not been uploaded to storage', status_code=409)
+    size = storage.attachment_storage.size(path)
+    # Servers that do not keep checksums are checked by reading the chunk back.
+    stored_checksum = storage.attachment_storage.stored_sha256(path) or _hash_stored(path)
+    if size != expected or stored_checksum != checksum:
+        storage.delete_many([path])
+        raise UploadError(f'Checksum mismatch for chunk {index}', status_code=460)
+    return _record_chunk(session, index, size, checksum, path)
+
+
+class ChunkReader:
+    """Read-only file object over the stored chunks of a session, in index order."""
+
+    def __init__(self, chunks, size):
+        self._paths = [chunk.storage_path for chunk in chunks]
+        self._current = None
+        self.size = size
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        parts = []
+        wanted = COPY_BUFFER_SIZE if size is None or size < 0 else size
+        while wanted > 0:
+            if self._current is None:
+                if not self._paths:
+                    break
+                self._current = storage.attachment_storage.open(self._paths.pop(0), 'rb')
+            block = self._current.read(wanted)
+            if not block:
+                self._current.close()
+                self._current = None
+                continue
+            parts.append(block)
+            wanted -= len(block)
+        data = b''.join(parts)
+        self.sha256.update(data)
+        self.bytes_read += len(data)
+        return data
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+
+def _delete_chunks(session):
+    storage.delete_many(session.chunks.values_list('storage_path', flat=True))
+    session.chunks.all().delete()
+
+
+def _assembled_path(session):
+    return f'uploads/{session.id}/assembled'
+
+
+def complete(session):
+    """Check that every chunk arrived and queue the session for assembly."""
+    stale = timezone.now() - timedelta(seconds=settings.ATTACHMENTS_UPLOAD_ASSEMBLY_TIMEOUT)
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(id=session.id)
+        # An assembly that has not finished in time is assumed dead.
+        if session.status != 'active' and not (session.status == 'assembling' and session.updated_at < stale):
+            raise UploadError(f'Upload is {session.status}', status_code=409)
+        indexes = set(session.chunks.values_list('index', flat=True))
+        missing = sorted(set(range(session.chunk_count)) - indexes)
+        if missing:
+            raise UploadError(f'Missing chunks: {missing[:50]}', status_code=409)
+        # Marked before the slow copy so a concurrent completion is rejected.
+        session.status = 'assembling'
+        session.error = ''
+        session.save(update_fields=['status', 'error', 'updated_at'])
+        session_id = session.id
+        transaction.on_commit(lambda: _executor.submit(_assemble_in_worker, session_id))
+    return session
+
+
+def assemble(session_id):
+    """Build the attachment of a session that ``complete`` queued."""
+    session = UploadSession.objects.get(id=session_id)
+    chunks = list(session.chunks.order_by('index'))
+    reader = ChunkReader(chunks, session.total_size)
+    # Left over by an attempt that died.
+    storage.delete_many([_assembled_path(session)])
+    try:
+        staged = storage.attachment_storage.save(_assembled_path(session), File(reader, name=session.filename))
+    finally:
+        reader.close()
+    sha256 = reader.sha256.hexdigest()
+    if reader.bytes_read != session.total_size or (session.checksum and sha256 != session.checksum.lower()):
+        storage.delete_many([staged])
+        _delete_chunks(session)
+        UploadSession.objects.filter(id=session.id).update(
+            status='aborted', error='Assembled file does not match the declared size or checksum; upload again'
+        )
+        return None
+
+    with transaction.atomic():
+        stored = blobs.adopt(sha256, session.total_size, staged)
+        attachment = Attachment.objects.create(
+            title=session.title,
+            description=session.description,
+            file_type=session.file_type,
+            file_url=storage.stable_url(stored.storage_path),
+            storage_path=stored.storage_path,
+            stored_file=stored,
+            filename=session.filename,
+            file_size=session.total_size,
+            content_type=session.content_type,
+            finding=session.finding,
+            experiment=session.experiment,
+            created_by=session.created_by,
+            updated_by=session.created_by
+        )
+        UploadSession.objects.filter(id=session.id).update(
+            status='completed', attachment=attachment, updated_at=timezone.now()
+        )
+    _delete_chunks(session)
+    return attachment
+
+
+def _assemble_in_worker(session_id):
+    try:
+        assemble(session_id)
+    except Exception:
+        logger.exception('Assembling upload %s failed', session_id)
+        storage.delete_many([f'uploads/{session_id}/assembled'])
+        # Back to active so the client can complete it again.
+        UploadSession.objects.filter(id=session_id, status='assembling').update(
+            status='active', error='Assembling the upload failed; complete it again', updated_at=timezone.now()
+        )
+    finally:
+        close_old_connections()
+
+
+def abort(session):
+    _delete_chunks(session)
+    UploadSession.objects.filter(id=session.id).update(status='aborted', updated_at=timezone.now())
@@ -4,5 +4,15 @@ from . import views
 
 urlpatterns = [
     path('<int:pk>/', views.AttachmentDetailView.as_view(), name='attachment-detail'),
+    path('<int:pk>/download/', views.download_attachment, name='attachment-download'),
+    path('<int:pk>/thumbnails/<int:size>/', views.attachment_thumbnail, name='attachment-thumbnail'),
+    path('<int:pk>/preview/', views.attachment_preview, name='attachment-preview'),
+    path('storage-stats/', views.storage_stats, name='attachment-storage-stats'),
+    path('uploads/', views.UploadSessionCreateView.as_view(), name='upload-session-create'),
+    path('uploads/<uuid:pk>/', views.UploadSessionDetailView.as_view(), name='upload-session-detail'),
+    path('uploads/<uuid:pk>/chunks/<int:index>/', views.upload_chunk, name='upload-chunk'),
+    path('uploads/<uuid:pk>/chunks/<int:index>/presign/', views.presign_chunk, name='upload-chunk-presign'),
+    path('uploads/<uuid:pk>/chunks/<int:index>/confirm/', views.confirm_chunk, name='upload-chunk-confirm'),
+    path('uploads/<uuid:pk>/complete/', views.complete_upload, name='upload-complete'),
     path('findings/<int:finding_id>/', views.AttachmentListCreateView.as_view(), name='finding-attachment-list-create'),
 ]
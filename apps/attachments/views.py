@@ -1,13 +1,22 @@
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
-from django.core.files.storage import default_storage
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
-from .models import Attachment
-from .serializers import AttachmentSerializer, AttachmentCreateSerializer, AttachmentUpdateSerializer
+from .models import Attachment, StoredFile, UploadSession
+from .serializers import (
+    AttachmentSerializer, AttachmentCreateSerializer, AttachmentUpdateSerializer,
+    UploadSessionSerializer, UploadSessionCreateSerializer
+)
+from . import blobs, downloads, previews, thumbnails, uploads
+from .storage import attachment_storage, stable_url
 from apps.findings.models import Finding
 from apps.experiments.models import Experiment
 
@@ -37,7 +46,7 @@ class AttachmentListCreateView(generics.ListCreateAPIView):
         return Attachment.objects.filter(
             finding_id=finding_id,
             is_active=True
-        )
+        ).select_related('stored_file')
 
     def perform_create(self, serializer):
         finding_id = self.kwargs['finding_id']
@@ -53,18 +62,21 @@ class AttachmentListCreateView(generics.ListCreateAPIView):
         if experiment_id:
             experiment = get_object_or_404(Experiment, id=experiment_id, is_active=True)
 
-        file_path = default_storage.save(f'attachments/{file.name}', file)
-        file_url = default_storage.url(file_path)
-
-        attachment = serializer.save(
-            finding=finding,
-            experiment=experiment,
-            file_url=file_url,
-            file_size=file.size,
-            content_type=file.content_type,
-            created_by=self.request.user,
-            updated_by=self.request.user
-        )
+        sha256, size = blobs.hash_file(file)
+        with transaction.atomic():
+            stored = blobs.acquire(sha256, size, lambda: file)
+            serializer.save(
+                finding=finding,
+                experiment=experiment,
+                file_url=stable_url(stored.storage_path),
+                storage_path=stored.storage_path,
+                stored_file=stored,
+                filename=file.name,
+                file_size=size,
+                content_type=file.content_type,
+                created_by=self.request.user,
+                updated_by=self.request.user
+            )
 
 
 class AttachmentDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -81,12 +93,6 @@ class AttachmentDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [AllowAny()]
         return [IsAuthenticated()]
 
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        instance.downloads_count += 1
-        instance.save(update_fields=['downloads_count'])
-        return super().retrieve(request, *args, **kwargs)
-
     def perform_update(self, serializer):
         attachment = self.get_object()
 
@@ -101,3 +107,203 @@ class AttachmentDetailView(generics.RetrieveUpdateDestroyAPIView):
             raise PermissionError("Only attachment uploader or admin can delete attachment")
         instance.is_active = False
         instance.save()
+
+
+class UploadSessionCreateView(generics.CreateAPIView):
+    """Start a resumable chunked upload"""
+    serializer_class = UploadSessionCreateSerializer
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        finding = get_object_or_404(Finding, id=serializer.validated_data.pop('finding_id'), is_active=True)
+        if not finding.experiment.project.members.filter(user=request.user, is_active=True).exists():
+            return Response(
+                {'detail': 'Only project members can upload attachments'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        experiment_id = serializer.validated_data.pop('experiment_id', None)
+        experiment = None
+        if experiment_id:
+            experiment = get_object_or_404(Experiment, id=experiment_id, is_active=True)
+
+        session = uploads.open_session(
+            finding=finding, experiment=experiment, created_by=request.user, **serializer.validated_data
+        )
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionDetailView(generics.RetrieveDestroyAPIView):
+    """Get the state of an upload (which chunks arrived) or abort it"""
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(created_by=self.request.user)
+
+    def perform_destroy(self, instance):
+        uploads.abort(instance)
+
+
+def _upload_error(exc):
+    return Response({'detail': exc.message}, status=exc.status_code)
+
+
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+def upload_chunk(request, pk, index):
+    """Store one chunk; the body is the raw bytes, with an Upload-Checksum header"""
+    session = get_object_or_404(UploadSession, id=pk, created_by=request.user)
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return Response({'detail': 'Invalid Content-Length'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        checksum = uploads.parse_checksum_header(request.headers.get('Upload-Checksum'))
+        uploads.store_chunk(session, index, request.stream, content_length, checksum)
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    received = uploads.received_chunks(session)
+    return Response({
+        'index': index,
+        'received': len(received),
+        'chunk_count': session.chunk_count,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def presign_chunk(request, pk, index):
+    """Get a presigned request for uploading a chunk straight to object storage"""
+    session = get_object_or_404(UploadSession, id=pk, created_by=request.user)
+    try:
+        checksum = uploads.parse_checksum_header(request.headers.get('Upload-Checksum'))
+        upload_request = uploads.presign_chunk(session, index, checksum)
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    return Response(upload_request)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def confirm_chunk(request, pk, index):
+    """Record a chunk uploaded with a presigned request"""
+    session = get_object_or_404(UploadSession, id=pk, created_by=request.user)
+    try:
+        checksum = uploads.parse_checksum_header(request.headers.get('Upload-Checksum'))
+        uploads.confirm_chunk(session, index, checksum)
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    received = uploads.received_chunks(session)
+    return Response({
+        'index': index,
+        'received': len(received),
+        'chunk_count': session.chunk_count,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_upload(request, pk):
+    """Queue the uploaded chunks to be assembled into an attachment; poll the session for the result"""
+    session = get_object_or_404(UploadSession, id=pk, created_by=request.user)
+    try:
+        session = uploads.complete(session)
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    return Response(UploadSessionSerializer(session).data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def storage_stats(request):
+    """Report how much space content-addressed storage saves"""
+    return Response(blobs.storage_stats())
+
+
+def _can_read_file(user, attachment):
+    finding = attachment.finding
+    return finding.visibility == 'public' or (
+        user.is_authenticated and (
+            user.is_staff or
+            finding.experiment.project.members.filter(user=user, is_active=True).exists()
+        )
+    )
+
+
+def _get_readable_attachment(request, pk):
+    attachment = get_object_or_404(
+        Attachment.objects.select_related('finding__experiment__project', 'stored_file'),
+        id=pk, is_active=True
+    )
+    if not _can_read_file(request.user, attachment):
+        raise PermissionDenied('Only project members can download attachments of non-public findings')
+    return attachment
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def download_attachment(request, pk):
+    """Download the attachment file (supports Range requests)"""
+    attachment = _get_readable_attachment(request, pk)
+    return downloads.serve(request, attachment)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def attachment_thumbnail(request, pk, size):
+    """Redirect to a WebP thumbnail, rendering it first if needed"""
+    attachment = _get_readable_attachment(request, pk)
+    stored = attachment.stored_file
+    if (size not in settings.ATTACHMENTS_THUMBNAIL_SIZES or stored is None or
+            attachment.file_type not in thumbnails.THUMBNAIL_FILE_TYPES):
+        return Response({'detail': 'No thumbnail for this attachment'}, status=status.HTTP_404_NOT_FOUND)
+
+    thumbnail_status = stored.thumbnail_status
+    if thumbnail_status == 'ready' and str(size) not in stored.thumbnails:
+        # Rendered before this size was configured.
+        StoredFile.objects.filter(id=stored.id, thumbnail_status='ready').update(thumbnail_status='none')
+        thumbnail_status = 'none'
+    if thumbnail_status in ('none', 'processing', 'failed'):
+        # Renders unless another worker holds the claim or a retry is not due yet.
+        thumbnail_status = thumbnails.generate(stored.id, attachment.content_type)
+    if thumbnail_status == 'processing':
+        response = Response({'detail': 'Thumbnail is being generated'}, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = '2'
+        return response
+    if thumbnail_status == 'failed':
+        return Response({'detail': 'Thumbnail generation failed'}, status=status.HTTP_404_NOT_FOUND)
+    if thumbnail_status != 'ready':
+        return Response({'detail': 'No thumbnail for this attachment'}, status=status.HTTP_404_NOT_FOUND)
+
+    stored.refresh_from_db(fields=['thumbnails'])
+    path = stored.thumbnails.get(str(size))
+    if path is None:
+        return Response({'detail': 'No thumbnail for this attachment'}, status=status.HTTP_404_NOT_FOUND)
+    return HttpResponseRedirect(attachment_storage.url(path))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def attachment_preview(request, pk):
+    """Schema, column statistics and sample rows of a dataset attachment"""
+    attachment = _get_readable_attachment(request, pk)
+    stored = attachment.stored_file
+    if stored is None or attachment.file_type not in previews.PREVIEW_FILE_TYPES:
+        return Response({'detail': 'Previews are only available for datasets'}, status=status.HTTP_404_NOT_FOUND)
+
+    preview_status = stored.preview_status
+    if preview_status in ('none', 'processing', 'failed'):
+        preview_status = previews.request(stored.id, attachment.filename, attachment.content_type)
+    if preview_status == 'processing':
+        response = Response({'detail': 'Preview is being generated'}, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = '5'
+        return response
+    if preview_status == 'failed':
+        return Response({'detail': 'Preview generation failed'}, status=status.HTTP_404_NOT_FOUND)
+    if preview_status != 'ready':
+        return Response({'detail': 'No preview for this file format'}, status=status.HTTP_404_NOT_FOUND)
+
+    stored.refresh_from_db(fields=['preview'])
+    return Response(stored.preview)
@@ -1,11 +1,13 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from apps.common.models import RollupTrackedMixin
+
 
 User = get_user_model()
 
 
-class Comment(models.Model):
+class Comment(RollupTrackedMixin, models.Model):
     content = models.TextField()
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     finding = models.ForeignKey('findings.Finding', on_delete=models.CASCADE, null=True, blank=True,
@@ -8,6 +8,7 @@ from .models import Comment
 from .serializers import CommentSerializer, CommentCreateSerializer, CommentUpdateSerializer
 from apps.findings.models import Finding
 from apps.publications.models import Publication
+from apps.analytics import trending
 
 
 User = get_user_model()
@@ -51,6 +52,7 @@ class FindingCommentListCreateView(generics.ListCreateAPIView):
             parent=parent,
             author=self.request.user
         )
+        trending.record(finding, 'comment')
 
 
 class PublicationCommentListCreateView(generics.ListCreateAPIView):
@@ -91,6 +93,7 @@ class PublicationCommentListCreateView(generics.ListCreateAPIView):
             parent=parent,
             author=self.request.user
         )
+        trending.record(publication, 'comment')
 
 
 class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.common'
\ No newline at end of file
+    name = 'apps.common'
+
+    def ready(self):
+        from . import signals  # noqa: F401
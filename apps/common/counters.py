@@ -0,0 +1,88 @@
+"""
+Buffered counter increments.
+
+Hot counters such as ``downloads_count`` are bumped on every request, and
+writing the row each time makes concurrent requests queue on the same row
+lock. ``increment`` only adds to an in-process tally. A daemon thread
+writes the tallies every ``COUNTERS_FLUSH_INTERVAL`` seconds (or sooner
+once ``COUNTERS_MAX_PENDING`` keys are waiting), issuing one
+``UPDATE ... SET field = field + n`` per model, field and amount.
+
+Increments still buffered when the process is killed are lost, which is
+acceptable for popularity counters.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    def __init__(self, flush_interval, max_pending):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def increment(self, model, pk, field, amount=1):
+        with self._lock:
+            self.pending[(model, field, pk)] += amount
+            size = len(self.pending)
+
+        if self._thread is None:
+            self.start()
+        if size >= self.max_pending:
+            self._wakeup.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='counter-flusher', daemon=True)
+            self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self.pending = self.pending, defaultdict(int)
+        if not pending:
+            return
+
+        grouped = defaultdict(list)
+        for (model, field, pk), amount in pending.items():
+            grouped[(model, field, amount)].append(pk)
+        for (model, field, amount), pks in grouped.items():
+            try:
+                model.objects.filter(pk__in=pks).update(**{field: F(field) + amount})
+            except Exception:
+                logger.exception('Failed to flush %s.%s for %d rows', model.__name__, field, len(pks))
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+_buffer = CounterBuffer(settings.COUNTERS_FLUSH_INTERVAL, settings.COUNTERS_MAX_PENDING)
+atexit.register(_buffer.flush)
+
+
+def increment(instance, field, amount=1):
+    """Add ``amount`` to ``instance.<field>`` in the database, eventually."""
+    _buffer.increment(type(instance), instance.pk, field, amount)
+
+
+def flush():
+    _buffer.flush()
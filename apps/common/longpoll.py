@@ -0,0 +1,97 @@
+"""
+Long-poll support for "changes since" list endpoints.
+
+Waiters park on a shared condition and wake up when a new row for their
+channel/user is committed in this process. Rows committed by other worker
+processes are picked up by a cheap re-check every few seconds, so clients
+never miss a change, they just get it slightly later.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+MAX_WAIT = 30
+RECHECK_INTERVAL = 2
+
+_condition = threading.Condition()
+_versions = defaultdict(int)
+
+
+def notify(channel, user_id):
+    """
+    Wake up every request waiting on ``channel`` for ``user_id``.
+    """
+    with _condition:
+        _versions[(channel, user_id)] += 1
+        _condition.notify_all()
+
+
+def wait_for_changes(channel, user_id, timeout, has_changes):
+    """
+    Block until ``has_changes()`` is true or ``timeout`` seconds pass.
+    """
+    key = (channel, user_id)
+    deadline = time.monotonic() + min(timeout, MAX_WAIT)
+
+    while True:
+        with _condition:
+            version = _versions[key]
+        if has_changes():
+            return True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+
+        with _condition:
+            _condition.wait_for(
+                lambda: _versions[key] != version,
+                timeout=min(remaining, RECHECK_INTERVAL)
+            )
+
+
+class LongPollListMixin:
+    """
+    Adds a ``?since=<cursor>&wait=<seconds>`` mode to list views.
+
+    The cursor is the highest row ID the client has seen. When no newer rows
+    exist the request is held for up to ``wait`` seconds (capped at
+    ``MAX_WAIT``) and returns as soon as a new row for the user is committed.
+    """
+    longpoll_channel = None
+
+    def list(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        if since is None:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            since = int(since)
+            wait = int(request.query_params.get('wait', 0))
+        except ValueError:
+            return Response(
+                {'detail': 'since and wait must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        changes = queryset.filter(id__gt=since)
+
+        if wait > 0:
+            wait_for_changes(
+                self.longpoll_channel,
+                request.user.id,
+                wait,
+                changes.exists
+            )
+
+        page_size = self.paginator.get_page_size(request) if self.paginator else None
+        rows = list(changes.order_by('id')[:page_size])
+        cursor = rows[-1].id if rows else since
+
+        serializer = self.get_serializer(rows, many=True)
+        return Response({'cursor': cursor, 'results': serializer.data})
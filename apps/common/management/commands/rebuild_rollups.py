@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.common.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the research hierarchy rollups (counts, attachment bytes, last activity) from scratch'
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(f'Rebuilt {rows} rollups')
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('group', 'Research group'), ('project', 'Project'), ('experiment', 'Experiment'), ('finding', 'Finding')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('members_count', models.IntegerField(default=0, help_text='Direct members of a project or group')),
+                ('projects_count', models.IntegerField(default=0)),
+                ('experiments_count', models.IntegerField(default=0)),
+                ('findings_count', models.IntegerField(default=0)),
+                ('publications_count', models.IntegerField(default=0)),
+                ('attachments_count', models.IntegerField(default=0)),
+                ('comments_count', models.IntegerField(default=0)),
+                ('attachment_bytes', models.BigIntegerField(default=0)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'rollups',
+                'ordering': ['level', 'object_id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rollup',
+            constraint=models.UniqueConstraint(fields=('level', 'object_id'), name='rollup_level_object_uniq'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+LEVELS = ['group', 'project', 'experiment', 'finding']
+BATCH_SIZE = 1000
+
+
+def backfill_rollups(apps, schema_editor):
+    """A frozen copy of ``apps.common.rollups.rebuild``, so later changes there do not alter this migration."""
+    def model(label):
+        return apps.get_model(label)
+
+    parents = {
+        'finding': ('experiment', dict(model('findings.Finding').objects.values_list('id', 'experiment_id'))),
+        'experiment': ('project', dict(model('experiments.Experiment').objects.values_list('id', 'project_id'))),
+        'project': ('group', dict(model('projects.Project').objects.values_list('id', 'research_group_id'))),
+        'group': (None, {}),
+    }
+    counts = defaultdict(lambda: defaultdict(int))
+    activity = {}
+
+    def chain(level, object_id, propagate=True):
+        while level and object_id is not None:
+            yield level, object_id
+            if not propagate:
+                return
+            level, ids = parents[level]
+            object_id = ids.get(object_id)
+
+    def touch(node, at):
+        if at and (node not in activity or at > activity[node]):
+            activity[node] = at
+
+    for label, level in (('research_groups.ResearchGroup', 'group'), ('projects.Project', 'project'),
+                         ('experiments.Experiment', 'experiment'), ('findings.Finding', 'finding')):
+        for object_id, updated_at in model(label).objects.values_list('id', 'updated_at'):
+            touch((level, object_id), updated_at)
+
+    active = Q(is_active=True)
+    one = Count('id', filter=active)
+    sources = [
+        ('findings.Finding', 'experiment', 'experiment_id', {'findings_count': one}, True, Q()),
+        ('experiments.Experiment', 'project', 'project_id', {'experiments_count': one}, True, Q()),
+        ('projects.Project', 'group', 'research_group_id', {'projects_count': one}, True, Q()),
+        ('publications.Publication', 'project', 'project_id', {'publications_count': one}, True, Q()),
+        ('attachments.Attachment', 'finding', 'finding_id', {
+            'attachments_count': one,
+            'attachment_bytes': Coalesce(Sum('file_size', filter=active), 0),
+        }, True, Q()),
+        ('comments.Comment', 'finding', 'finding_id', {'comments_count': one}, True, Q(finding__isnull=False)),
+        ('comments.Comment', 'project', 'publication__project_id', {'comments_count': one}, True,
+         Q(finding__isnull=True, publication__isnull=False)),
+        ('projects.ProjectMember', 'project', 'project_id', {'members_count': one}, False, Q()),
+        ('research_groups.ResearchGroupMember', 'group', 'group_id', {'members_count': one}, False, Q()),
+    ]
+    for label, level, parent_field, aggregates, propagate, condition in sources:
+        rows = model(label).objects.filter(condition).order_by().values(parent_field).annotate(
+            latest=Max('updated_at'), **aggregates
+        )
+        for row in rows:
+            for node in chain(level, row[parent_field], propagate):
+                for field in aggregates:
+                    counts[node][field] += row[field]
+                touch(node, row['latest'])
+
+    Rollup = model('common.Rollup')
+    nodes = sorted(set(counts) | set(activity), key=lambda node: (LEVELS.index(node[0]), node[1]))
+    Rollup.objects.all().delete()
+    Rollup.objects.bulk_create(
+        [
+            Rollup(level=level, object_id=object_id, last_activity_at=activity.get((level, object_id)),
+                   **counts[(level, object_id)])
+            for level, object_id in nodes
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+        ('attachments', '0007_soft_delete_retention'),
+        ('comments', '0002_initial'),
+        ('experiments', '0002_initial'),
+        ('findings', '0002_initial'),
+        ('projects', '0002_initial'),
+        ('publications', '0006_citation_text'),
+        ('research_groups', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,9 @@
 """
 Common models and abstract base classes.
 """
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
 
 
 User = get_user_model()
@@ -61,3 +62,64 @@ class SoftDeleteModel(models.Model):
         self.is_active = True
         self.deleted_at = None
         self.save()
+
+
+class Rollup(models.Model):
+    """
+    Precomputed totals for one node of the research hierarchy; see
+    ``apps.common.rollups``.
+    """
+    LEVEL_CHOICES = [
+        ('group', 'Research group'),
+        ('project', 'Project'),
+        ('experiment', 'Experiment'),
+        ('finding', 'Finding'),
+    ]
+
+    level = models.CharField(max_length=20, choices=LEVEL_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    members_count = models.IntegerField(default=0, help_text="Direct members of a project or group")
+    projects_count = models.IntegerField(default=0)
+    experiments_count = models.IntegerField(default=0)
+    findings_count = models.IntegerField(default=0)
+    publications_count = models.IntegerField(default=0)
+    attachments_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+    attachment_bytes = models.BigIntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'rollups'
+        ordering = ['level', 'object_id']
+        constraints = [
+            models.UniqueConstraint(fields=['level', 'object_id'], name='rollup_level_object_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.level} {self.object_id}"
+
+
+class RollupMixin:
+    """
+    Gives a model a ``rollup`` attribute: its ``Rollup`` row, or an empty
+    unsaved one if nothing has been recorded for it yet.
+    """
+    rollup_level = None
+
+    @cached_property
+    def rollup(self):
+        return (
+            Rollup.objects.filter(level=self.rollup_level, object_id=self.pk).first()
+            or Rollup(level=self.rollup_level, object_id=self.pk)
+        )
+
+
+class RollupTrackedMixin:
+    """
+    Saves in one transaction, so the rollup signals can lock the row before
+    the save and keep it locked until the change commits.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
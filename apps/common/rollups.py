@@ -0,0 +1,362 @@
+"""
+Incremental rollups of the research hierarchy.
+
+Research groups, projects, experiments and findings each have a row in
+the ``rollups`` table. The row holds counts of everything beneath the
+node, the total size of its attachments and the time of its latest
+activity. Serializers read that row instead of counting.
+
+Each tracked model adds a *contribution* to its parent's row and every
+row above it. Only active rows contribute:
+
+* findings, experiments, projects and publications count themselves;
+* attachments count themselves and add their ``file_size``;
+* comments count on their finding, or on their publication's project;
+* project and research group members count only on that project or
+  group (``members_count`` does not roll up).
+
+The signals in ``signals.py`` compare a row's contribution before and
+after each save and add the difference to every ancestor with
+``UPDATE ... SET field = field + delta``. That happens inside the
+writing transaction, so rollups commit and roll back with the data. The
+previous state is read with ``SELECT ... FOR UPDATE`` (tracked models
+save atomically, see ``RollupTrackedMixin``), so concurrent saves of one
+row each see the state the other left behind. Rows are always updated
+top-down, so concurrent writers lock them in the same order. When a node moves to a new parent, its whole subtree moves with
+it. ``last_activity_at`` is bumped on every save and never moves back.
+
+``bulk_create`` and ``QuerySet.update`` skip signals, so code using them
+calls ``record`` itself, as the publication importer does.
+``manage.py rebuild_rollups`` recomputes every row from scratch. Use it
+for the initial backfill or after changing data behind the ORM's back.
+"""
+import threading
+from collections import defaultdict
+
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from apps.research_groups import stats as group_stats
+
+from .models import Rollup
+
+
+LEVELS = [level for level, _ in Rollup.LEVEL_CHOICES]
+ROLLED_UP_FIELDS = (
+    'projects_count', 'experiments_count', 'findings_count', 'publications_count',
+    'attachments_count', 'comments_count', 'attachment_bytes',
+)
+# Saves that only touch these neither change a contribution nor count as activity.
+COUNTER_FIELDS = {'views_count', 'downloads_count', 'citations_count'}
+REBUILD_BATCH_SIZE = 1000
+
+# For each level: the model, then the level and lookup of every ancestor.
+ANCESTORS = {
+    'finding': ('findings.Finding', [
+        ('experiment', 'experiment_id'),
+        ('project', 'experiment__project_id'),
+        ('group', 'experiment__project__research_group_id'),
+    ]),
+    'experiment': ('experiments.Experiment', [
+        ('project', 'project_id'),
+        ('group', 'project__research_group_id'),
+    ]),
+    'project': ('projects.Project', [
+        ('group', 'research_group_id'),
+    ]),
+    'group': (None, []),
+}
+
+_local = threading.local()
+
+
+class Tracked:
+    """How one model contributes to the rollups."""
+
+    def __init__(self, level, parent_level, parent_field, counts, fields=(), propagate=True):
+        self.level = level
+        self.parent_level = parent_level
+        self.parent_field = parent_field
+        self.counts = counts
+        self.fields = ('is_active', parent_field, *fields)
+        self.propagate = propagate
+
+    def parent(self, instance):
+        object_id = getattr(instance, self.parent_field)
+        return (self.parent_level, object_id) if object_id is not None else None
+
+    def contribution(self, instance):
+        return self.counts(instance) if instance.is_active else {}
+
+    def chain(self, parent):
+        if parent is None:
+            return []
+        return ancestors(*parent) if self.propagate else [parent]
+
+
+class TrackedComment(Tracked):
+    def parent(self, instance):
+        if instance.finding_id is not None:
+            return ('finding', instance.finding_id)
+        Publication = django_apps.get_model('publications', 'Publication')
+        project_id = Publication.objects.filter(id=instance.publication_id).values_list('project_id', flat=True).first()
+        return ('project', project_id) if project_id is not None else None
+
+
+def _one(field):
+    return lambda instance: {field: 1}
+
+
+TRACKED = {
+    'findings.Finding': Tracked('finding', 'experiment', 'experiment_id', _one('findings_count')),
+    'experiments.Experiment': Tracked('experiment', 'project', 'project_id', _one('experiments_count')),
+    'projects.Project': Tracked('project', 'group', 'research_group_id', _one('projects_count')),
+    'publications.Publication': Tracked(None, 'project', 'project_id', _one('publications_count')),
+    'attachments.Attachment': Tracked(
+        None, 'finding', 'finding_id',
+        lambda attachment: {'attachments_count': 1, 'attachment_bytes': attachment.file_size},
+        fields=('file_size',),
+    ),
+    'comments.Comment': TrackedComment(
+        None, 'finding', 'finding_id', _one('comments_count'), fields=('publication_id',)
+    ),
+    'projects.ProjectMember': Tracked(None, 'project', 'project_id', _one('members_count'), propagate=False),
+    'research_groups.ResearchGroupMember': Tracked(
+        None, 'group', 'group_id', _one('members_count'), propagate=False
+    ),
+}
+
+
+def ancestors(level, object_id):
+    """``[(level, id), ...]`` for the node and everything above it, nearest first."""
+    chain = [(level, object_id)]
+    model, lookups = ANCESTORS[level]
+    if lookups:
+        ids = django_apps.get_model(model).objects.filter(pk=object_id).values_list(
+            *[lookup for _, lookup in lookups]
+        ).first() or ()
+        for (parent_level, _), parent_id in zip(lookups, ids):
+            if parent_id is None:
+                break
+            chain.append((parent_level, parent_id))
+    return chain
+
+
+def subtree(node):
+    """The rolled-up totals stored for ``node``, which move with it to a new parent."""
+    if node is None:
+        return {}
+    return Rollup.objects.filter(level=node[0], object_id=node[1]).values(*ROLLED_UP_FIELDS).first() or {}
+
+
+def _sorted(nodes):
+    return sorted(nodes, key=lambda node: (LEVELS.index(node[0]), node[1]))
+
+
+def apply(deltas, touched=(), at=None):
+    """
+    Add ``deltas`` (``{(level, id): {field: amount}}``) to the rollup rows,
+    and move ``last_activity_at`` of the ``touched`` nodes up to ``at``.
+    """
+    touched = set(touched) if at else set()
+    nodes = {node for node, changes in deltas.items() if any(changes.values())} | touched
+    for level, object_id in _sorted(nodes):
+        changes = {field: F(field) + amount for field, amount in deltas.get((level, object_id), {}).items() if amount}
+        if (level, object_id) in touched:
+            changes['last_activity_at'] = Greatest(Coalesce('last_activity_at', Value(at)), Value(at))
+        rows = Rollup.objects.filter(level=level, object_id=object_id)
+        if not rows.update(**changes):
+            Rollup.objects.bulk_create([Rollup(level=level, object_id=object_id)], ignore_conflicts=True)
+            rows.update(**changes)
+    # Group stats are read from the group's row and cached.
+    group_stats.invalidate_on_commit(*[object_id for level, object_id in nodes if level == 'group'])
+
+
+def _add(deltas, chain, counts, sign=1):
+    for node in chain:
+        for field, amount in counts.items():
+            deltas[node][field] += sign * amount
+
+
+def _merged(*counts):
+    total = defaultdict(int)
+    for part in counts:
+        for field, amount in part.items():
+            total[field] += amount
+    return total
+
+
+def record(level, object_id, counts, at=None):
+    """Add ``counts`` to ``(level, object_id)`` and every node above it."""
+    chain = ancestors(level, object_id)
+    deltas = defaultdict(lambda: defaultdict(int))
+    _add(deltas, chain, counts)
+    apply(deltas, chain, at)
+
+
+def _deleting_nodes():
+    """
+    Nodes whose deletion is under way in the current ``delete()``. Django
+    runs each delete in its own atomic block, so the nodes are kept per
+    block and forgotten once it exits, whether it commits or rolls back.
+    """
+    blocks = transaction.get_connection().atomic_blocks
+    _local.deleting = {
+        block: nodes for block, nodes in getattr(_local, 'deleting', {}).items()
+        if any(block is open_block for open_block in blocks)
+    }
+    if not blocks:
+        return set()
+    return _local.deleting.setdefault(blocks[-1], set())
+
+
+def remember(spec, instance):
+    """Note the parent and contribution ``instance`` had before this save."""
+    previous = type(instance)._base_manager.filter(pk=instance.pk)
+    if transaction.get_connection().in_atomic_block:
+        previous = previous.select_for_update()
+    previous = previous.only(*spec.fields).first()
+    if previous is not None:
+        instance._rollup_previous = (spec.parent(previous), spec.contribution(previous))
+
+
+def saved(spec, instance, created):
+    old_parent, old_counts = instance.__dict__.pop('_rollup_previous', (None, {}))
+    new_parent, new_counts = spec.parent(instance), spec.contribution(instance)
+    node = (spec.level, instance.pk) if spec.level else None
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    if created or old_parent == new_parent:
+        _add(deltas, spec.chain(new_parent), new_counts)
+        _add(deltas, spec.chain(new_parent), old_counts, -1)
+    else:
+        moved = subtree(node)
+        _add(deltas, spec.chain(old_parent), _merged(old_counts, moved), -1)
+        _add(deltas, spec.chain(new_parent), _merged(new_counts, moved))
+    touched = spec.chain(new_parent) + ([node] if node else [])
+    apply(deltas, touched, timezone.now())
+
+
+def deleting(spec, instance):
+    """
+    Work out, before anything is deleted, what removing ``instance`` takes
+    off its ancestors. Cascades may delete rows in any order, so the
+    parents might already be gone by ``post_delete``.
+    """
+    node = (spec.level, instance.pk) if spec.level else None
+    instance._rollup_deleted = (
+        spec.chain(spec.parent(instance)),
+        _merged(spec.contribution(instance), subtree(node)),
+    )
+    if node:
+        _deleting_nodes().add(node)
+
+
+def deleted(spec, instance):
+    chain, counts = instance.__dict__.pop('_rollup_deleted', ([], {}))
+    # Rows deleted along with an ancestor were counted in its subtree.
+    if not _deleting_nodes() & set(chain):
+        deltas = defaultdict(lambda: defaultdict(int))
+        _add(deltas, chain, counts, -1)
+        apply(deltas)
+    if spec.level:
+        Rollup.objects.filter(level=spec.level, object_id=instance.pk).delete()
+
+
+def rebuild():
+    """
+    Recompute every rollup row from the tables. Writes made while this
+    runs may be lost, so run it when the site is quiet. Returns the number
+    of rows.
+    """
+    def model(label):
+        return django_apps.get_model(label)
+
+    parents = {
+        'finding': ('experiment', dict(model('findings.Finding').objects.values_list('id', 'experiment_id'))),
+        'experiment': ('project', dict(model('experiments.Experiment').objects.values_list('id', 'project_id'))),
+        'project': ('group', dict(model('projects.Project').objects.values_list('id', 'research_group_id'))),
+        'group': (None, {}),
+    }
+    counts = defaultdict(lambda: defaultdict(int))
+    activity = {}
+
+    def chain(level, object_id, propagate=True):
+        while level and object_id is not None:
+            yield level, object_id
+            if not propagate:
+                return
+            level, ids = parents[level]
+            object_id = ids.get(object_id)
+
+    def touch(node, at):
+        if at and (node not in activity or at > activity[node]):
+            activity[node] = at
+
+    # Each node's own edits.
+    for label, level in (('research_groups.ResearchGroup', 'group'), ('projects.Project', 'project'),
+                         ('experiments.Experiment', 'experiment'), ('findings.Finding', 'finding')):
+        for object_id, updated_at in model(label).objects.values_list('id', 'updated_at'):
+            touch((level, object_id), updated_at)
+
+    active = Q(is_active=True)
+    one = Count('id', filter=active)
+    sources = [
+        ('findings.Finding', 'experiment', 'experiment_id', {'findings_count': one}, True, Q()),
+        ('experiments.Experiment', 'project', 'project_id', {'experiments_count': one}, True, Q()),
+        ('projects.Project', 'group', 'research_group_id', {'projects_count': one}, True, Q()),
+        ('publications.Publication', 'project', 'project_id', {'publications_count': one}, True, Q()),
+        ('attachments.Attachment', 'finding', 'finding_id', {
+            'attachments_count': one,
+            'attachment_bytes': Coalesce(Sum('file_size', filter=active), 0),
+        }, True, Q()),
+        ('comments.Comment', 'finding', 'finding_id', {'comments_count': one}, True, Q(finding__isnull=False)),
+        ('comments.Comment', 'project', 'publication__project_id', {'comments_count': one}, True,
+         Q(finding__isnull=True, publication__isnull=False)),
+        ('projects.ProjectMember', 'project', 'project_id', {'members_count': one}, False, Q()),
+        ('research_groups.ResearchGroupMember', 'group', 'group_id', {'members_count': one}, False, Q()),
+    ]
+    for label, level, parent_field, aggregates, propagate, condition in sources:
+        rows = model(label).objects.filter(condition).order_by().values(parent_field).annotate(
+            latest=Max('updated_at'), **aggregates
+        )
+        for row in rows:
+            for node in chain(level, row[parent_field], propagate):
+                for field in aggregates:
+                    counts[node][field] += row[field]
+                touch(node, row['latest'])
+
+    rollup_model = model('common.Rollup')
+    nodes = _sorted(set(counts) | set(activity))
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        rollup_model.objects.bulk_create(
+            [
+                rollup_model(level=level, object_id=object_id, last_activity_at=activity.get((level, object_id)),
+                             **counts[(level, object_id)])
+                for level, object_id in nodes
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+    return len(nodes)
+
+
+def attach(objects):
+    """Load the ``rollup`` of every object in ``objects`` with one query."""
+    objects = [obj for obj in objects if obj is not None and 'rollup' not in obj.__dict__]
+    ids = defaultdict(set)
+    for obj in objects:
+        ids[obj.rollup_level].add(obj.pk)
+    if not ids:
+        return
+    condition = Q()
+    for level, object_ids in ids.items():
+        condition |= Q(level=level, object_id__in=object_ids)
+    rows = {(row.level, row.object_id): row for row in Rollup.objects.filter(condition)}
+    for obj in objects:
+        obj.__dict__['rollup'] = rows.get((obj.rollup_level, obj.pk)) or Rollup(
+            level=obj.rollup_level, object_id=obj.pk
+        )
@@ -0,0 +1,13 @@
+from django.db import models
+from rest_framework import serializers
+
+from . import rollups
+
+
+class RollupListSerializer(serializers.ListSerializer):
+    """Loads the rollups of every object on the page with one query."""
+
+    def to_representation(self, data):
+        objects = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        rollups.attach(objects)
+        return super().to_representation(objects)
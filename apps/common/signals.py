@@ -0,0 +1,34 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from . import rollups
+
+
+def _counter_only(update_fields):
+    return update_fields is not None and set(update_fields) <= rollups.COUNTER_FIELDS
+
+
+def remember_rollup_state(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is not None and not _counter_only(update_fields):
+        rollups.remember(rollups.TRACKED[sender._meta.label], instance)
+
+
+def update_rollups_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if not _counter_only(update_fields):
+        rollups.saved(rollups.TRACKED[sender._meta.label], instance, created)
+
+
+def prepare_rollups_for_delete(sender, instance, **kwargs):
+    rollups.deleting(rollups.TRACKED[sender._meta.label], instance)
+
+
+def update_rollups_on_delete(sender, instance, **kwargs):
+    rollups.deleted(rollups.TRACKED[sender._meta.label], instance)
+
+
+for label in rollups.TRACKED:
+    model = apps.get_model(label)
+    pre_save.connect(remember_rollup_state, sender=model, dispatch_uid=f'rollups-pre-save-{label}')
+    post_save.connect(update_rollups_on_save, sender=model, dispatch_uid=f'rollups-post-save-{label}')
+    pre_delete.connect(prepare_rollups_for_delete, sender=model, dispatch_uid=f'rollups-pre-delete-{label}')
+    post_delete.connect(update_rollups_on_delete, sender=model, dispatch_uid=f'rollups-post-delete-{label}')
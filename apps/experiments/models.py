@@ -1,11 +1,13 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from apps.common.models import RollupMixin, RollupTrackedMixin
+
 
 User = get_user_model()
 
 
-class Experiment(models.Model):
+class Experiment(RollupMixin, RollupTrackedMixin, models.Model):
     STATUS_CHOICES = [
         ('planned', 'Planned'),
         ('in_progress', 'In Progress'),
@@ -35,9 +37,11 @@ class Experiment(models.Model):
         db_table = 'experiments'
         ordering = ['-created_at']
 
+    rollup_level = 'experiment'
+
     @property
     def findings_count(self):
-        return self.findings.filter(is_active=True).count()
+        return self.rollup.findings_count
 
     def __str__(self):
         return self.title
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Experiment
+from apps.common.serializers import RollupListSerializer
 from apps.users.serializers import UserSerializer
 from apps.projects.serializers import ProjectSerializer
 
@@ -9,6 +10,8 @@ class ExperimentSerializer(serializers.ModelSerializer):
     lead_researcher = UserSerializer(read_only=True)
     collaborators = UserSerializer(many=True, read_only=True)
     findings_count = serializers.ReadOnlyField()
+    attachment_bytes = serializers.IntegerField(source='rollup.attachment_bytes', read_only=True)
+    last_activity_at = serializers.DateTimeField(source='rollup.last_activity_at', read_only=True)
     tags = serializers.SerializerMethodField()
     created_by = UserSerializer(read_only=True)
     updated_by = UserSerializer(read_only=True)
@@ -18,13 +21,15 @@ class ExperimentSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'hypothesis', 'methodology',
             'start_date', 'end_date', 'status', 'project', 'lead_researcher',
-            'collaborators', 'findings_count', 'tags', 'is_active',
-            'created_at', 'updated_at', 'created_by', 'updated_by'
+            'collaborators', 'findings_count', 'attachment_bytes',
+            'last_activity_at', 'tags', 'is_active', 'created_at',
+            'updated_at', 'created_by', 'updated_by'
         ]
         read_only_fields = [
             'id', 'project', 'lead_researcher', 'is_active',
             'created_at', 'updated_at', 'created_by', 'updated_by'
         ]
+        list_serializer_class = RollupListSerializer
 
     def get_tags(self, obj):
         return [tag.name for tag in obj.tags.all()]
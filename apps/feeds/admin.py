@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import FeedEvent
+
+
+@admin.register(FeedEvent)
+class FeedEventAdmin(admin.ModelAdmin):
+    list_display = ['actor', 'verb', 'target_content_type', 'target_object_id', 'fanned_out', 'created_at']
+    list_filter = ['verb', 'fanned_out', 'created_at']
+    search_fields = ['actor__email']
+    readonly_fields = ['created_at']
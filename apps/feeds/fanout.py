@@ -0,0 +1,110 @@
+"""
+Fan-out-on-write home timelines.
+
+``publish()`` stores an event in the actor's outbox and copies it into the
+inbox of every follower, so reading a feed is a single indexed range scan.
+Actors with more than ``FEEDS_FANOUT_THRESHOLD`` followers are not copied
+on write, which keeps the cost of one post bounded. Instead each reader
+pulls their new events into its own inbox when it opens the feed
+(``FeedCursor`` remembers how far it got). The feed itself is always just
+the inbox.
+
+Events whose target is hidden (made private, deactivated) are retracted,
+which removes them from every inbox.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import FeedCursor, FeedEntry, FeedEvent
+from apps.profiles.models import Follow
+
+
+BATCH_SIZE = 1000
+# Most events of not-fanned-out actors pulled into one inbox per read.
+PULL_LIMIT = 500
+# Events are pulled again for this long, so ones that committed late are not missed.
+PULL_OVERLAP = timedelta(minutes=1)
+
+
+def _threshold():
+    return getattr(settings, 'FEEDS_FANOUT_THRESHOLD', 1000)
+
+
+def _copy_to_inboxes(event, follower_ids):
+    batch = []
+    for follower_id in follower_ids:
+        batch.append(FeedEntry(owner_id=follower_id, event=event))
+        if len(batch) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def publish(actor, verb, target):
+    """Record ``verb`` on ``target`` by ``actor`` and fan it out to followers."""
+    followers = Follow.objects.filter(following=actor).values_list('follower_id', flat=True)
+    fan_out = followers.count() <= _threshold()
+
+    event = FeedEvent.objects.create(
+        actor=actor,
+        verb=verb,
+        target_content_type=ContentType.objects.get_for_model(target),
+        target_object_id=target.pk,
+        fanned_out=fan_out,
+    )
+    if fan_out:
+        _copy_to_inboxes(event, followers.iterator(chunk_size=BATCH_SIZE))
+    return event
+
+
+def backfill(follower, following, limit=None):
+    """Copy the most recent events of ``following`` into a new follower's inbox."""
+    limit = limit or getattr(settings, 'FEEDS_BACKFILL_SIZE', 20)
+    events = FeedEvent.objects.filter(actor=following).order_by('-id')[:limit]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(owner=follower, event=event) for event in events],
+        ignore_conflicts=True
+    )
+
+
+def remove(follower_id, following_id):
+    """Drop the events of user ``following_id`` from the inbox of ``follower_id``."""
+    FeedEntry.objects.filter(owner_id=follower_id, event__actor_id=following_id).delete()
+
+
+def retract(target):
+    """Remove every event about ``target`` from outboxes and inboxes."""
+    FeedEvent.objects.filter(
+        target_content_type=ContentType.objects.get_for_model(target),
+        target_object_id=target.pk,
+    ).delete()
+
+
+def pull(user):
+    """Copy new events of followed actors that were not fanned out into ``user``'s inbox."""
+    now = timezone.now()
+    cursor, _ = FeedCursor.objects.get_or_create(owner=user)
+    followed = Follow.objects.filter(follower=user).values('following_id')
+    events = FeedEvent.objects.filter(fanned_out=False, actor_id__in=followed)
+    if cursor.pulled_at:
+        events = events.filter(created_at__gte=cursor.pulled_at - PULL_OVERLAP)
+    event_ids = list(events.order_by('-id').values_list('id', flat=True)[:PULL_LIMIT])
+    if event_ids:
+        FeedEntry.objects.bulk_create(
+            [FeedEntry(owner=user, event_id=event_id) for event_id in event_ids],
+            ignore_conflicts=True
+        )
+    FeedCursor.objects.filter(pk=cursor.pk).filter(
+        Q(pulled_at__isnull=True) | Q(pulled_at__lt=now)
+    ).update(pulled_at=now)
+
+
+def timeline(user):
+    """Events in ``user``'s home feed, i.e. their inbox."""
+    pull(user)
+    return FeedEvent.objects.filter(id__in=FeedEntry.objects.filter(owner=user).values('event_id'))
@@ -0,0 +1,130 @@
+import random
+import time
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.experiments.models import Experiment
+from apps.feeds import fanout
+from apps.feeds.models import FeedEntry
+from apps.findings.models import Finding
+from apps.profiles.models import Follow
+from apps.projects.models import Project
+
+
+User = get_user_model()
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _ms(seconds):
+    return f'{seconds * 1000:.2f}ms'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark feed fan-out and reads on a synthetic power-law follow graph (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--readers', type=int, default=200)
+        parser.add_argument('--alpha', type=float, default=1.2, help='Pareto shape of user popularity')
+        parser.add_argument('--threshold', type=int, default=None, help='Override FEEDS_FANOUT_THRESHOLD')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['threshold'] is not None:
+            settings.FEEDS_FANOUT_THRESHOLD = options['threshold']
+        rng = random.Random(options['seed'])
+
+        with transaction.atomic():
+            self._run(rng, options)
+            transaction.set_rollback(True)
+
+    def _run(self, rng, options):
+        users = User.objects.bulk_create([
+            User(
+                email=f'feed-bench-{i}@example.invalid', username=f'feed-bench-{i}@example.invalid',
+                first_name='Bench', last_name=str(i)
+            )
+            for i in range(options['users'])
+        ])
+        weights = [rng.paretovariate(options['alpha']) for _ in users]
+
+        follows = set()
+        for follower in users:
+            # Out-degree is heavy-tailed too; targets are picked by popularity.
+            wanted = min(len(users) - 1, int(rng.paretovariate(options['alpha']) * 5))
+            for followed in rng.choices(users, weights=weights, k=wanted):
+                if followed.pk != follower.pk:
+                    follows.add((follower.pk, followed.pk))
+        Follow.objects.bulk_create(
+            [Follow(follower_id=a, following_id=b) for a, b in follows], batch_size=5000
+        )
+
+        in_degree = {}
+        for _, followed_id in follows:
+            in_degree[followed_id] = in_degree.get(followed_id, 0) + 1
+        degrees = sorted(in_degree.values()) or [0]
+        threshold = settings.FEEDS_FANOUT_THRESHOLD
+        self.stdout.write(
+            f'Graph: {len(users)} users, {len(follows)} follows, followers p50={_percentile(degrees, 0.5)} '
+            f'p99={_percentile(degrees, 0.99)} max={degrees[-1]}, '
+            f'{sum(1 for d in degrees if d > threshold)} accounts above threshold {threshold}'
+        )
+
+        owner = users[0]
+        project = Project.objects.create(
+            title='Feed benchmark', description='-', short_description='-', start_date=date.today(),
+            status='active', visibility='private', principal_investigator=owner,
+            created_by=owner, updated_by=owner
+        )
+        experiment = Experiment.objects.create(
+            title='Feed benchmark', description='-', hypothesis='-', methodology='-',
+            start_date=date.today(), status='planned', project=project, lead_researcher=owner,
+            created_by=owner, updated_by=owner
+        )
+        authors = rng.choices(users, weights=weights, k=options['posts'])
+        # Private findings do not trigger the publish signal; fan-out is timed explicitly.
+        findings = Finding.objects.bulk_create([
+            Finding(
+                title=f'Finding {i}', description='-', data_summary='-', conclusion='-',
+                significance='minor', experiment=experiment, visibility='private',
+                created_by=author, updated_by=author
+            )
+            for i, author in enumerate(authors)
+        ])
+
+        write_times = []
+        for finding, author in zip(findings, authors):
+            started = time.perf_counter()
+            fanout.publish(author, 'created_finding', finding)
+            write_times.append(time.perf_counter() - started)
+        self.stdout.write(
+            f'Fan-out: {len(findings)} posts, {FeedEntry.objects.count()} inbox rows, '
+            f'p50={_ms(_percentile(write_times, 0.5))} p99={_ms(_percentile(write_times, 0.99))} '
+            f'max={_ms(max(write_times))}'
+        )
+
+        readers = rng.sample(users, min(options['readers'], len(users)))
+        feed_times, naive_times = [], []
+        for reader in readers:
+            started = time.perf_counter()
+            list(fanout.timeline(reader).order_by('-id')[:20])
+            feed_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            list(Finding.objects.filter(created_by__followers__follower=reader).order_by('-id')[:20])
+            naive_times.append(time.perf_counter() - started)
+
+        self.stdout.write(
+            f'Reads ({len(readers)} users, first page): timeline p50={_ms(_percentile(feed_times, 0.5))} '
+            f'p99={_ms(_percentile(feed_times, 0.99))}; naive join p50={_ms(_percentile(naive_times, 0.5))} '
+            f'p99={_ms(_percentile(naive_times, 0.99))}'
+        )
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('feeds', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pulled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'feed_cursors',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedevent',
+            index=models.Index(fields=['target_content_type', 'target_object_id'], name='feed_event_target_idx'),
+        ),
+        migrations.AddField(
+            model_name='feedcursor',
+            name='owner',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='feed_cursor', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,70 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.fields import GenericForeignKey
+
+User = get_user_model()
+
+
+class FeedEvent(models.Model):
+    """Something a user did, kept in the actor's outbox."""
+    VERB_CHOICES = [
+        ('created_finding', 'Created finding'),
+        ('created_publication', 'Created publication'),
+        ('updated_project', 'Updated project'),
+    ]
+
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_events')
+    verb = models.CharField(max_length=30, choices=VERB_CHOICES)
+    target_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    target_object_id = models.PositiveIntegerField()
+    target = GenericForeignKey('target_content_type', 'target_object_id')
+    # False when the actor had too many followers to copy the event into
+    # every inbox; such events are merged into timelines at read time.
+    fanned_out = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'feed_events'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['actor', 'fanned_out'], name='feed_event_actor_idx'),
+            models.Index(fields=['target_content_type', 'target_object_id'], name='feed_event_target_idx'),
+        ]
+
+    @property
+    def target_type(self):
+        return self.target_content_type.model
+
+    @property
+    def target_id(self):
+        return self.target_object_id
+
+    def __str__(self):
+        return f"{self.actor.full_name} {self.verb} {self.target_type} {self.target_object_id}"
+
+
+class FeedEntry(models.Model):
+    """A FeedEvent copied into a follower's inbox."""
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    event = models.ForeignKey(FeedEvent, on_delete=models.CASCADE, related_name='entries')
+
+    class Meta:
+        db_table = 'feed_entries'
+        ordering = ['-event']
+        unique_together = ['owner', 'event']
+
+    def __str__(self):
+        return f"{self.event} in feed of {self.owner.full_name}"
+
+
+class FeedCursor(models.Model):
+    """How far events that were not fanned out have been pulled into a user's inbox."""
+    owner = models.OneToOneField(User, on_delete=models.CASCADE, related_name='feed_cursor')
+    pulled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'feed_cursors'
+
+    def __str__(self):
+        return f"Feed of {self.owner.full_name} pulled at {self.pulled_at}"
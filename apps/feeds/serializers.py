@@ -0,0 +1,21 @@
+from rest_framework import serializers
+from .models import FeedEvent
+from apps.users.serializers import UserSerializer
+
+
+class FeedEventSerializer(serializers.ModelSerializer):
+    actor = UserSerializer(read_only=True)
+    target_type = serializers.ReadOnlyField()
+    target_id = serializers.ReadOnlyField()
+    target = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FeedEvent
+        fields = ['id', 'actor', 'verb', 'target_type', 'target_id', 'target', 'created_at']
+        read_only_fields = ['id', 'actor', 'verb', 'target_type', 'target_id', 'target', 'created_at']
+
+    def get_target(self, obj):
+        target = obj.target
+        if target is None or not getattr(target, 'is_active', True):
+            return None
+        return {'id': target.pk, 'title': target.title}
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import fanout
+from .models import FeedEvent
+from apps.findings.models import Finding
+from apps.profiles.models import Follow
+from apps.projects.models import Project
+from apps.publications.models import Publication
+
+
+def _retract_on_commit(instance):
+    transaction.on_commit(lambda: fanout.retract(instance))
+
+
+@receiver(post_save, sender=Finding)
+def publish_finding(sender, instance, created, **kwargs):
+    """Fan new public findings out to the author's followers, retract hidden ones"""
+    if instance.visibility != 'public' or not instance.is_active:
+        if not created:
+            _retract_on_commit(instance)
+    elif created:
+        transaction.on_commit(lambda: fanout.publish(instance.created_by, 'created_finding', instance))
+
+
+@receiver(post_save, sender=Publication)
+def publish_publication(sender, instance, created, **kwargs):
+    """Fan new publications out to the creator's followers, retract deactivated ones"""
+    if not instance.is_active:
+        if not created:
+            _retract_on_commit(instance)
+    elif created:
+        transaction.on_commit(lambda: fanout.publish(instance.created_by, 'created_publication', instance))
+
+
+@receiver(post_save, sender=Project)
+def publish_project_update(sender, instance, created, **kwargs):
+    """Fan public project updates out, at most once per project per window"""
+    if created:
+        return
+    if instance.visibility != 'public' or not instance.is_active:
+        _retract_on_commit(instance)
+        return
+
+    window = timedelta(minutes=getattr(settings, 'FEEDS_PROJECT_UPDATE_WINDOW', 60))
+    recent = FeedEvent.objects.filter(
+        verb='updated_project',
+        target_object_id=instance.pk,
+        target_content_type__model='project',
+        created_at__gte=timezone.now() - window
+    )
+    if not recent.exists():
+        transaction.on_commit(lambda: fanout.publish(instance.updated_by, 'updated_project', instance))
+
+
+@receiver(post_delete, sender=Finding)
+@receiver(post_delete, sender=Publication)
+@receiver(post_delete, sender=Project)
+def retract_deleted(sender, instance, **kwargs):
+    """Drop events about deleted objects"""
+    _retract_on_commit(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    """Give a new follower the recent events of the followed user"""
+    if created:
+        transaction.on_commit(lambda: fanout.backfill(instance.follower, instance.following))
+
+
+@receiver(post_delete, sender=Follow)
+def clean_feed(sender, instance, **kwargs):
+    """Remove the unfollowed user's events from the follower's feed"""
+    # Use IDs: on a cascading user delete the related rows are already gone.
+    transaction.on_commit(lambda: fanout.remove(instance.follower_id, instance.following_id))
@@ -0,0 +1,22 @@
+from rest_framework import generics
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import IsAuthenticated
+from .serializers import FeedEventSerializer
+from . import fanout
+
+
+class FeedPagination(CursorPagination):
+    page_size = 20
+    ordering = '-id'
+
+
+class FeedView(generics.ListAPIView):
+    """Home feed of findings, publications and project updates by followed users"""
+    serializer_class = FeedEventSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = FeedPagination
+
+    def get_queryset(self):
+        return fanout.timeline(self.request.user).select_related(
+            'actor', 'target_content_type'
+        ).prefetch_related('target')
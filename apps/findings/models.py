@@ -1,11 +1,13 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from apps.common.models import RollupMixin, RollupTrackedMixin
+
 
 User = get_user_model()
 
 
-class Finding(models.Model):
+class Finding(RollupMixin, RollupTrackedMixin, models.Model):
     SIGNIFICANCE_CHOICES = [
         ('breakthrough', 'Breakthrough'),
         ('significant', 'Significant'),
@@ -40,17 +42,19 @@ class Finding(models.Model):
         db_table = 'findings'
         ordering = ['-created_at']
 
+    rollup_level = 'finding'
+
     @property
     def project(self):
         return self.experiment.project
 
     @property
     def attachments_count(self):
-        return self.attachments.filter(is_active=True).count()
+        return self.rollup.attachments_count
 
     @property
     def comments_count(self):
-        return self.comments.filter(is_active=True).count()
+        return self.rollup.comments_count
 
     def __str__(self):
         return self.title
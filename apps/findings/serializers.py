@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Finding
+from apps.common.serializers import RollupListSerializer
 from apps.users.serializers import UserSerializer
 from apps.experiments.serializers import ExperimentSerializer
 
@@ -9,6 +10,8 @@ class FindingSerializer(serializers.ModelSerializer):
     project = serializers.SerializerMethodField()
     attachments_count = serializers.ReadOnlyField()
     comments_count = serializers.ReadOnlyField()
+    attachment_bytes = serializers.IntegerField(source='rollup.attachment_bytes', read_only=True)
+    last_activity_at = serializers.DateTimeField(source='rollup.last_activity_at', read_only=True)
     tags = serializers.SerializerMethodField()
     created_by = UserSerializer(read_only=True)
     updated_by = UserSerializer(read_only=True)
@@ -18,14 +21,15 @@ class FindingSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'data_summary', 'conclusion',
             'significance', 'experiment', 'project', 'visibility',
-            'attachments_count', 'comments_count', 'views_count',
-            'citations_count', 'tags', 'is_active', 'created_at',
-            'updated_at', 'created_by', 'updated_by'
+            'attachments_count', 'comments_count', 'attachment_bytes',
+            'last_activity_at', 'views_count', 'citations_count', 'tags',
+            'is_active', 'created_at', 'updated_at', 'created_by', 'updated_by'
         ]
         read_only_fields = [
             'id', 'experiment', 'views_count', 'citations_count',
             'is_active', 'created_at', 'updated_at', 'created_by', 'updated_by'
         ]
+        list_serializer_class = RollupListSerializer
 
     def get_project(self, obj):
         from apps.projects.serializers import ProjectSerializer
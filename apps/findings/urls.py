@@ -5,4 +5,5 @@ from . import views
 urlpatterns = [
     path('', views.FindingListCreateView.as_view(), name='finding-list-create'),
     path('<int:pk>/', views.FindingDetailView.as_view(), name='finding-detail'),
+    path('<int:pk>/related/', views.related_findings, name='finding-related'),
 ]
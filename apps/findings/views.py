@@ -1,5 +1,6 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
@@ -9,6 +10,8 @@ from .models import Finding
 from .serializers import FindingSerializer, FindingCreateSerializer, FindingUpdateSerializer
 from apps.experiments.models import Experiment
 from apps.tags.models import Tag
+from apps.analytics import trending
+from apps.tags.related import related_items
 
 
 User = get_user_model()
@@ -77,6 +80,7 @@ class FindingDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance = self.get_object()
         instance.views_count += 1
         instance.save(update_fields=['views_count'])
+        trending.record(instance, 'view')
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -112,3 +116,18 @@ class FindingDetailView(generics.RetrieveUpdateDestroyAPIView):
             raise PermissionDenied("Only finding creator or admin can delete finding")
         instance.is_active = False
         instance.save()
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def related_findings(request, pk):
+    """List findings and publications related to a finding"""
+    finding = get_object_or_404(Finding, id=pk, is_active=True, visibility='public')
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+    except ValueError:
+        return Response(
+            {'detail': 'limit must be an integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response({'results': related_items(finding, limit)})
@@ -8,6 +8,7 @@ from .serializers import LikeSerializer
 from apps.findings.models import Finding
 from apps.publications.models import Publication
 from apps.comments.models import Comment
+from apps.analytics import trending
 
 
 @api_view(['POST'])
@@ -27,6 +28,7 @@ def like_finding(request, pk):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    trending.record(finding, 'like')
     return Response(LikeSerializer(like).data, status=status.HTTP_201_CREATED)
 
 
@@ -64,6 +66,7 @@ def like_publication(request, pk):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    trending.record(publication, 'like')
     return Response(LikeSerializer(like).data, status=status.HTTP_201_CREATED)
 
 
@@ -5,3 +5,6 @@ class MessagesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.messages'
     label = 'custom_messages'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Message
+from apps.common.longpoll import notify
+
+
+@receiver(post_save, sender=Message)
+def wake_message_pollers(sender, instance, created, **kwargs):
+    """Release long-poll requests of both participants once the row is committed"""
+    if created:
+        def wake():
+            notify('messages', instance.recipient_id)
+            notify('messages', instance.sender_id)
+
+        transaction.on_commit(wake)
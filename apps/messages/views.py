@@ -11,12 +11,14 @@ from rest_framework.filters import OrderingFilter
 
 from .models import Message
 from .serializers import MessageSerializer, MessageCreateSerializer
+from apps.common.longpoll import LongPollListMixin
 
 User = get_user_model()
 
 
-class MessageListCreateView(generics.ListCreateAPIView):
+class MessageListCreateView(LongPollListMixin, generics.ListCreateAPIView):
     """List messages for current user or send a new message"""
+    longpoll_channel = 'messages'
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['is_read']
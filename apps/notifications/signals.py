@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Notification
+from apps.common.longpoll import notify
+
+
+@receiver(post_save, sender=Notification)
+def wake_notification_pollers(sender, instance, created, **kwargs):
+    """Release long-poll requests of the recipient once the row is committed"""
+    if created:
+        transaction.on_commit(lambda: notify('notifications', instance.recipient_id))
@@ -8,10 +8,12 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 from .models import Notification
 from .serializers import NotificationSerializer
+from apps.common.longpoll import LongPollListMixin
 
 
-class NotificationListView(generics.ListAPIView):
-    """List notifications for current user"""
+class NotificationListView(LongPollListMixin, generics.ListAPIView):
+    """List notifications for current user, or long-poll with ?since=&wait="""
+    longpoll_channel = 'notifications'
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
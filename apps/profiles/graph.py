@@ -0,0 +1,81 @@
+"""
+Follow-graph queries.
+
+Follower and following counts are denormalized onto Profile and kept in
+step by the Follow signals, so rendering a profile never counts rows.
+Relationship checks take a whole page of user IDs and answer with one query
+per direction instead of one per user.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Follow, Profile
+
+
+def adjust_counts(follower_id, following_id, delta):
+    """Add ``delta`` to the follow counters of both users."""
+    for user_id, field in ((follower_id, 'following_count'), (following_id, 'followers_count')):
+        updated = Profile.objects.filter(user_id=user_id).update(**{field: F(field) + delta})
+        if not updated and delta > 0:
+            # No profile yet; create it with counts taken from the table.
+            # Decrements are skipped so that a user being deleted does not
+            # get a fresh profile from the cascading Follow deletes.
+            Profile.objects.get_or_create(user_id=user_id, defaults=live_counts(user_id))
+
+
+def live_counts(user_id):
+    return {
+        'followers_count': Follow.objects.filter(following_id=user_id).count(),
+        'following_count': Follow.objects.filter(follower_id=user_id).count(),
+    }
+
+
+def recount(queryset=None):
+    """Recompute the denormalized counts of ``queryset`` (all profiles by default)."""
+    queryset = Profile.objects.all() if queryset is None else queryset
+    followers = Follow.objects.filter(following_id=OuterRef('user_id')).order_by().values(
+        'following_id'
+    ).annotate(n=Count('id')).values('n')
+    following = Follow.objects.filter(follower_id=OuterRef('user_id')).order_by().values(
+        'follower_id'
+    ).annotate(n=Count('id')).values('n')
+    return queryset.update(
+        followers_count=Coalesce(Subquery(followers), 0),
+        following_count=Coalesce(Subquery(following), 0),
+    )
+
+
+def following_ids(viewer, user_ids):
+    """IDs among ``user_ids`` that ``viewer`` follows."""
+    if not viewer or not viewer.is_authenticated:
+        return set()
+    return set(
+        Follow.objects.filter(follower=viewer, following_id__in=user_ids).values_list('following_id', flat=True)
+    )
+
+
+def follower_ids(viewer, user_ids):
+    """IDs among ``user_ids`` that follow ``viewer``."""
+    if not viewer or not viewer.is_authenticated:
+        return set()
+    return set(
+        Follow.objects.filter(following=viewer, follower_id__in=user_ids).values_list('follower_id', flat=True)
+    )
+
+
+def relationships(viewer, user_ids):
+    """
+    Return ``{user_id: {'is_following', 'follows_you', 'is_mutual'}}`` for
+    ``user_ids`` as seen by ``viewer``, using two queries.
+    """
+    user_ids = list(user_ids)
+    outgoing = following_ids(viewer, user_ids)
+    incoming = follower_ids(viewer, user_ids)
+    return {
+        user_id: {
+            'is_following': user_id in outgoing,
+            'follows_you': user_id in incoming,
+            'is_mutual': user_id in outgoing and user_id in incoming,
+        }
+        for user_id in user_ids
+    }
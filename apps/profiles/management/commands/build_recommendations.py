@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.profiles.recommendations import build
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed "who to follow" recommendations (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only rebuild for this user ID')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = build(
+            top_n=options['top_n'],
+            batch_size=options['batch_size'],
+            user_ids=options['user_ids'],
+        )
+        self.stdout.write(f'Wrote {written} recommendations in {time.monotonic() - started:.1f}s')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.profiles.graph import recount
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized follower/following counts on profiles'
+
+    def handle(self, *args, **options):
+        updated = recount()
+        self.stdout.write(f'Recounted follows for {updated} profiles')
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:52
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_follow_counts(apps, schema_editor):
+    Profile = apps.get_model('profiles', 'Profile')
+    Follow = apps.get_model('profiles', 'Follow')
+
+    followers = Follow.objects.filter(following_id=OuterRef('user_id')).order_by().values(
+        'following_id'
+    ).annotate(n=Count('id')).values('n')
+    following = Follow.objects.filter(follower_id=OuterRef('user_id')).order_by().values(
+        'follower_id'
+    ).annotate(n=Count('id')).values('n')
+    Profile.objects.update(
+        followers_count=Coalesce(Subquery(followers), 0),
+        following_count=Coalesce(Subquery(following), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
@@ -14,20 +14,15 @@ class Profile(models.Model):
     researchgate = models.URLField(blank=True, null=True)
     linkedin = models.URLField(blank=True, null=True)
     twitter = models.URLField(blank=True, null=True)
+    # Maintained by apps.profiles.signals on follow/unfollow
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'profiles'
 
-    @property
-    def followers_count(self):
-        return self.user.followers.count()
-
-    @property
-    def following_count(self):
-        return self.user.following.count()
-
     @property
     def projects_count(self):
         return self.user.projects.count()
@@ -51,3 +46,20 @@ class Follow(models.Model):
 
     def __str__(self):
         return f"{self.follower.full_name} follows {self.following.full_name}"
+
+
+class UserRecommendation(models.Model):
+    """Precomputed "who to follow" suggestion, rebuilt by build_recommendations."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommended_to')
+    score = models.FloatField()
+    reasons = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'user_recommendations'
+        ordering = ['-score']
+        unique_together = ['user', 'recommended']
+
+    def __str__(self):
+        return f"Recommend {self.recommended.full_name} to {self.user.full_name}"
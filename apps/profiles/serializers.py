@@ -1,8 +1,12 @@
 from rest_framework import serializers
-from .models import Profile, Follow
+from django.contrib.auth import get_user_model
+from .models import Profile, Follow, UserRecommendation
 from apps.users.serializers import UserSerializer
 
 
+User = get_user_model()
+
+
 class ProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     followers_count = serializers.ReadOnlyField()
@@ -28,3 +32,37 @@ class ProfileUpdateSerializer(serializers.ModelSerializer):
             'bio', 'research_interests', 'avatar', 'website',
             'google_scholar', 'researchgate', 'linkedin', 'twitter'
         ]
+
+
+class FollowUserSerializer(serializers.ModelSerializer):
+    """
+    Compact user row for follower/following lists. Relationship flags come
+    from ``following_ids``/``follower_ids`` sets in the serializer context.
+    """
+    full_name = serializers.ReadOnlyField()
+    profile_url = serializers.ReadOnlyField()
+    is_following = serializers.SerializerMethodField()
+    follows_you = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'first_name', 'last_name', 'full_name', 'institution',
+            'position', 'profile_url', 'is_following', 'follows_you'
+        ]
+        read_only_fields = fields
+
+    def get_is_following(self, obj):
+        return obj.id in self.context.get('following_ids', ())
+
+    def get_follows_you(self, obj):
+        return obj.id in self.context.get('follower_ids', ())
+
+
+class UserRecommendationSerializer(serializers.ModelSerializer):
+    user = FollowUserSerializer(source='recommended', read_only=True)
+
+    class Meta:
+        model = UserRecommendation
+        fields = ['user', 'score', 'reasons', 'created_at']
+        read_only_fields = fields
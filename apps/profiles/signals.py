@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .graph import adjust_counts
+from .models import Follow
+
+
+@receiver(post_save, sender=Follow)
+def increment_follow_counts(sender, instance, created, **kwargs):
+    """Keep Profile.followers_count/following_count in step with new follows"""
+    if created:
+        adjust_counts(instance.follower_id, instance.following_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_follow_counts(sender, instance, **kwargs):
+    """Keep Profile.followers_count/following_count in step with unfollows"""
+    adjust_counts(instance.follower_id, instance.following_id, -1)
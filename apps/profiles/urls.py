@@ -4,8 +4,11 @@ from . import views
 urlpatterns = [
     path('<int:user_id>/', views.ProfileDetailView.as_view(), name='profile-detail'),
     path('me/', views.CurrentProfileView.as_view(), name='current-profile'),
+    path('me/recommendations/', views.UserRecommendationListView.as_view(), name='user-recommendations'),
+    path('relationships/', views.user_relationships, name='user-relationships'),
     path('<int:user_id>/follow/', views.follow_user, name='follow-user'),
     path('<int:user_id>/unfollow/', views.unfollow_user, name='unfollow-user'),
     path('<int:user_id>/followers/', views.UserFollowersView.as_view(), name='user-followers'),
     path('<int:user_id>/following/', views.UserFollowingView.as_view(), name='user-following'),
+    path('<int:user_id>/relationship/', views.user_relationship, name='user-relationship'),
 ]
@@ -5,9 +5,11 @@ from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 
-from .models import Profile, Follow
-from .serializers import ProfileSerializer, ProfileUpdateSerializer
-from apps.users.serializers import UserSerializer
+from .models import Profile, Follow, UserRecommendation
+from .serializers import (
+    ProfileSerializer, ProfileUpdateSerializer, FollowUserSerializer, UserRecommendationSerializer
+)
+from . import graph
 
 User = get_user_model()
 
@@ -39,6 +41,13 @@ class CurrentProfileView(generics.RetrieveUpdateAPIView):
         return ProfileSerializer
 
 
+def _follow_state(viewer, user):
+    followers_count = Profile.objects.filter(user=user).values_list('followers_count', flat=True).first()
+    data = graph.relationships(viewer, [user.id])[user.id]
+    data.update({'user_id': user.id, 'followers_count': followers_count or 0})
+    return data
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def follow_user(request, user_id):
@@ -61,8 +70,7 @@ def follow_user(request, user_id):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    profile, _ = Profile.objects.get_or_create(user=user_to_follow)
-    return Response(ProfileSerializer(profile).data)
+    return Response(_follow_state(request.user, user_to_follow))
 
 
 @api_view(['POST'])
@@ -82,9 +90,7 @@ def unfollow_user(request, user_id):
             following=user_to_unfollow
         )
         follow.delete()
-
-        profile, _ = Profile.objects.get_or_create(user=user_to_unfollow)
-        return Response(ProfileSerializer(profile).data)
+        return Response(_follow_state(request.user, user_to_unfollow))
     except Follow.DoesNotExist:
         return Response(
             {'detail': 'Not following this user'},
@@ -92,23 +98,101 @@ def unfollow_user(request, user_id):
         )
 
 
-class UserFollowersView(generics.ListAPIView):
-    """Get user's followers"""
-    serializer_class = UserSerializer
+class FollowListView(generics.ListAPIView):
+    """Base view for follower/following lists with relationship flags"""
+    serializer_class = FollowUserSerializer
     permission_classes = [AllowAny]
+    user_field = None
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        follows = page if page is not None else self.get_queryset()
+        users = [getattr(follow, self.user_field) for follow in follows]
+
+        # Two queries for the whole page instead of two per row
+        user_ids = [user.id for user in users]
+        context = self.get_serializer_context()
+        context['following_ids'] = graph.following_ids(request.user, user_ids)
+        context['follower_ids'] = graph.follower_ids(request.user, user_ids)
+
+        serializer = self.get_serializer(users, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+class UserFollowersView(FollowListView):
+    """Get user's followers"""
+    user_field = 'follower'
 
     def get_queryset(self):
         user_id = self.kwargs['user_id']
         user = get_object_or_404(User, id=user_id)
-        return User.objects.filter(following__following=user)
+        return Follow.objects.filter(following=user).select_related('follower').order_by('-created_at')
 
 
-class UserFollowingView(generics.ListAPIView):
+class UserFollowingView(FollowListView):
     """Get users followed by user"""
-    serializer_class = UserSerializer
-    permission_classes = [AllowAny]
+    user_field = 'following'
 
     def get_queryset(self):
         user_id = self.kwargs['user_id']
         user = get_object_or_404(User, id=user_id)
-        return User.objects.filter(followers__follower=user)
+        return Follow.objects.filter(follower=user).select_related('following').order_by('-created_at')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_relationship(request, user_id):
+    """Get whether the current user and a user follow each other"""
+    user = get_object_or_404(User, id=user_id)
+    data = graph.relationships(request.user, [user.id])[user.id]
+    data['user_id'] = user.id
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_relationships(request):
+    """Get follow relationships with up to 100 users (?ids=1,2,3)"""
+    try:
+        user_ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value]
+    except ValueError:
+        return Response(
+            {'detail': 'ids must be a comma-separated list of integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(user_ids) > 100:
+        return Response(
+            {'detail': 'At most 100 ids can be checked at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response(graph.relationships(request.user, user_ids))
+
+
+class UserRecommendationListView(generics.ListAPIView):
+    """List suggested users to follow for the current user"""
+    serializer_class = UserRecommendationSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # Recommendations are rebuilt offline; hide anyone followed since.
+        return UserRecommendation.objects.filter(
+            user=self.request.user,
+            recommended__is_active=True
+        ).exclude(
+            recommended__followers__follower=self.request.user
+        ).select_related('recommended')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        rows = page if page is not None else self.get_queryset()
+
+        context = self.get_serializer_context()
+        context['follower_ids'] = graph.follower_ids(request.user, [row.recommended_id for row in rows])
+
+        serializer = self.get_serializer(rows, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
@@ -0,0 +1,180 @@
+"""
+Project dashboard: everything a project page shows, in one payload.
+
+Each section is one grouped query:
+
+* experiments by status, findings by significance, publications by status
+  and members by role (``GROUP BY`` on the child table);
+* attachment count and total size (one aggregate);
+* recent activity (a ``UNION ALL`` of the latest experiments, findings,
+  publications, attachments and comments, then one query for the users);
+* top tags (a ``UNION ALL`` of the four tag link tables, counted in Python,
+  then one query for the tag names).
+
+Results are cached per project and audience for
+``PROJECTS_DASHBOARD_CACHE_TIMEOUT`` seconds. Members and staff see
+everything. Everyone else sees public findings only, and the attachments
+and comments that belong to them. ``signals.py`` drops both cached copies
+when anything in the project changes.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import CharField, Count, F, Q, Sum, Value
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from apps.attachments.models import Attachment
+from apps.comments.models import Comment
+from apps.experiments.models import Experiment
+from apps.findings.models import Finding
+from apps.publications.models import Publication
+from apps.tags.models import Tag
+
+from .models import Project, ProjectMember
+
+
+User = get_user_model()
+
+AUDIENCES = ('members', 'public')
+RECENT_ACTIVITY_LIMIT = 10
+TOP_TAGS_LIMIT = 10
+
+
+def cache_key(project_id, audience):
+    return f'projects:dashboard:{project_id}:{audience}'
+
+
+def invalidate(*project_ids):
+    keys = [cache_key(project_id, audience) for project_id in set(project_ids) if project_id for audience in AUDIENCES]
+    if keys:
+        cache.delete_many(keys)
+
+
+def audience_for(user, project):
+    if user.is_authenticated and (
+        user.is_staff or project.members.filter(user=user, is_active=True).exists()
+    ):
+        return 'members'
+    return 'public'
+
+
+def _grouped(queryset, field, choices):
+    counts = dict(queryset.order_by().values_list(field).annotate(total=Count('id')))
+    return {
+        'total': sum(counts.values()),
+        f'by_{field}': {key: counts.get(key, 0) for key, _ in choices},
+    }
+
+
+def _activity(queryset, kind, label, user_field, at_field):
+    return queryset.order_by().annotate(
+        kind=Value(kind, output_field=CharField()),
+        label=label,
+        actor=F(user_field),
+        at=F(at_field),
+    ).values_list('kind', 'id', 'label', 'actor', 'at')
+
+
+def _recent_activity(project, findings, attachments, comments):
+    parts = [
+        _activity(Experiment.objects.filter(project=project, is_active=True),
+                  'experiment', F('title'), 'updated_by_id', 'updated_at'),
+        _activity(findings, 'finding', F('title'), 'updated_by_id', 'updated_at'),
+        _activity(Publication.objects.filter(project=project, is_active=True),
+                  'publication', F('title'), 'updated_by_id', 'updated_at'),
+        _activity(attachments, 'attachment', F('title'), 'updated_by_id', 'updated_at'),
+        _activity(comments, 'comment', Substr('content', 1, 100), 'author_id', 'created_at'),
+    ]
+    rows = list(parts[0].union(*parts[1:], all=True).order_by('-at')[:RECENT_ACTIVITY_LIMIT])
+    users = {
+        user.id: user
+        for user in User.objects.filter(id__in={row[3] for row in rows}).only('id', 'first_name', 'last_name')
+    }
+    return [
+        {
+            'type': kind,
+            'id': object_id,
+            'title': label,
+            'user': {'id': actor, 'full_name': users[actor].full_name} if actor in users else None,
+            'at': at,
+        }
+        for kind, object_id, label, actor, at in rows
+    ]
+
+
+def _top_tags(project, findings):
+    links = [
+        Project.tags.through.objects.filter(project=project).values_list('tag_id'),
+        Experiment.tags.through.objects.filter(
+            experiment__project=project, experiment__is_active=True
+        ).values_list('tag_id'),
+        Finding.tags.through.objects.filter(finding__in=findings.values('id')).values_list('tag_id'),
+        Publication.tags.through.objects.filter(
+            publication__project=project, publication__is_active=True
+        ).values_list('tag_id'),
+    ]
+    counts = Counter(tag_id for (tag_id,) in links[0].union(*links[1:], all=True))
+    top = counts.most_common(TOP_TAGS_LIMIT)
+    tags = {tag['id']: tag for tag in Tag.objects.filter(id__in=[tag_id for tag_id, _ in top]).values('id', 'name', 'slug')}
+    return [{**tags[tag_id], 'count': count} for tag_id, count in top if tag_id in tags]
+
+
+def build(project, audience):
+    findings = Finding.objects.filter(experiment__project=project, experiment__is_active=True, is_active=True)
+    if audience == 'public':
+        findings = findings.filter(visibility='public')
+    attachments = Attachment.objects.filter(finding__in=findings.values('id'), is_active=True)
+    comments = Comment.objects.filter(
+        Q(finding__in=findings.values('id')) | Q(publication__project=project, publication__is_active=True),
+        is_active=True
+    )
+    attachment_totals = attachments.order_by().aggregate(total=Count('id'), total_bytes=Sum('file_size'))
+
+    return {
+        'project': {
+            'id': project.id,
+            'title': project.title,
+            'short_description': project.short_description,
+            'status': project.status,
+            'visibility': project.visibility,
+            'start_date': project.start_date,
+            'end_date': project.end_date,
+            'principal_investigator': {
+                'id': project.principal_investigator_id,
+                'full_name': project.principal_investigator.full_name,
+            },
+            'research_group': {
+                'id': project.research_group_id,
+                'name': project.research_group.name,
+            } if project.research_group_id else None,
+        },
+        'experiments': _grouped(
+            Experiment.objects.filter(project=project, is_active=True), 'status', Experiment.STATUS_CHOICES
+        ),
+        'findings': _grouped(findings, 'significance', Finding.SIGNIFICANCE_CHOICES),
+        'publications': _grouped(
+            Publication.objects.filter(project=project, is_active=True), 'status', Publication.STATUS_CHOICES
+        ),
+        'members': _grouped(
+            ProjectMember.objects.filter(project=project, is_active=True), 'role', ProjectMember.ROLE_CHOICES
+        ),
+        'attachments': {
+            'total': attachment_totals['total'],
+            'total_bytes': attachment_totals['total_bytes'] or 0,
+        },
+        'recent_activity': _recent_activity(project, findings, attachments, comments),
+        'top_tags': _top_tags(project, findings),
+        'generated_at': timezone.now(),
+    }
+
+
+def get_dashboard(project, audience):
+    key = cache_key(project.id, audience)
+    data = cache.get(key)
+    if data is None:
+        data = build(project, audience)
+        cache.set(key, data, settings.PROJECTS_DASHBOARD_CACHE_TIMEOUT)
+    return data
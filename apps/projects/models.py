@@ -1,11 +1,13 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from apps.common.models import RollupMixin, RollupTrackedMixin
+
 
 User = get_user_model()
 
 
-class Project(models.Model):
+class Project(RollupMixin, RollupTrackedMixin, models.Model):
     STATUS_CHOICES = [
         ('planning', 'Planning'),
         ('active', 'Active'),
@@ -53,27 +55,29 @@ class Project(models.Model):
         db_table = 'projects'
         ordering = ['-created_at']
 
+    rollup_level = 'project'
+
     @property
     def members_count(self):
-        return self.members.filter(is_active=True).count()
+        return self.rollup.members_count
 
     @property
     def experiments_count(self):
-        return self.experiments.filter(is_active=True).count()
+        return self.rollup.experiments_count
 
     @property
     def findings_count(self):
-        return sum(exp.findings.filter(is_active=True).count() for exp in self.experiments.all())
+        return self.rollup.findings_count
 
     @property
     def publications_count(self):
-        return self.publications.filter(is_active=True).count()
+        return self.rollup.publications_count
 
     def __str__(self):
         return self.title
 
 
-class ProjectMember(models.Model):
+class ProjectMember(RollupTrackedMixin, models.Model):
     ROLE_CHOICES = [
         ('principal_investigator', 'Principal Investigator'),
         ('co_investigator', 'Co-Investigator'),
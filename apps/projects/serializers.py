@@ -1,9 +1,20 @@
+from django.db import models
 from rest_framework import serializers
 from .models import Project, ProjectMember
+from apps.common.serializers import RollupListSerializer
 from apps.users.serializers import UserSerializer
+from apps.research_groups import stats as research_group_stats
 from apps.research_groups.serializers import ResearchGroupSerializer
 
 
+class ProjectListSerializer(RollupListSerializer):
+    def to_representation(self, data):
+        projects = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        # Fetch the stats of every nested research group at once.
+        research_group_stats.attach(project.research_group for project in projects)
+        return super().to_representation(projects)
+
+
 class ProjectSerializer(serializers.ModelSerializer):
     principal_investigator = UserSerializer(read_only=True)
     research_group = ResearchGroupSerializer(read_only=True)
@@ -11,6 +22,8 @@ class ProjectSerializer(serializers.ModelSerializer):
     experiments_count = serializers.ReadOnlyField()
     findings_count = serializers.ReadOnlyField()
     publications_count = serializers.ReadOnlyField()
+    attachment_bytes = serializers.IntegerField(source='rollup.attachment_bytes', read_only=True)
+    last_activity_at = serializers.DateTimeField(source='rollup.last_activity_at', read_only=True)
     tags = serializers.SerializerMethodField()
     created_by = UserSerializer(read_only=True)
     updated_by = UserSerializer(read_only=True)
@@ -22,13 +35,15 @@ class ProjectSerializer(serializers.ModelSerializer):
             'end_date', 'status', 'visibility', 'funding_source', 'funding_amount',
             'funding_currency', 'research_group', 'principal_investigator',
             'members_count', 'experiments_count', 'findings_count',
-            'publications_count', 'tags', 'is_active', 'created_at',
+            'publications_count', 'attachment_bytes', 'last_activity_at',
+            'tags', 'is_active', 'created_at',
             'updated_at', 'created_by', 'updated_by'
         ]
         read_only_fields = [
             'id', 'principal_investigator', 'is_active', 'created_at',
             'updated_at', 'created_by', 'updated_by'
         ]
+        list_serializer_class = ProjectListSerializer
 
     def get_tags(self, obj):
         return [tag.name for tag in obj.tags.all()]
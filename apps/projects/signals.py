@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from apps.attachments.models import Attachment
+from apps.comments.models import Comment
+from apps.experiments.models import Experiment
+from apps.findings.models import Finding
+from apps.publications.models import Publication
+from apps.research_groups.models import ResearchGroup
+from apps.tags.models import Tag
+
+from . import dashboard
+from .models import Project, ProjectMember
+
+
+User = get_user_model()
+
+# Saves that only bump these do not change anything the dashboard shows.
+COUNTER_FIELDS = {'views_count', 'downloads_count', 'citations_count'}
+
+
+def _saves_any(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+def _invalidate_on_commit(*project_ids):
+    transaction.on_commit(lambda: dashboard.invalidate(*project_ids))
+
+
+def _project_ids(instance):
+    if isinstance(instance, Project):
+        return [instance.pk]
+    if isinstance(instance, (ProjectMember, Experiment, Publication)):
+        return [instance.project_id]
+    if isinstance(instance, Finding):
+        return list(Experiment.objects.filter(id=instance.experiment_id).values_list('project_id', flat=True))
+    if isinstance(instance, Attachment):
+        return list(Finding.objects.filter(id=instance.finding_id).values_list('experiment__project_id', flat=True))
+    if isinstance(instance, Comment):
+        if instance.finding_id:
+            return list(Finding.objects.filter(id=instance.finding_id).values_list('experiment__project_id', flat=True))
+        if instance.publication_id:
+            return list(Publication.objects.filter(id=instance.publication_id).values_list('project_id', flat=True))
+    return []
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_save, sender=Experiment)
+@receiver(post_save, sender=Finding)
+@receiver(post_save, sender=Publication)
+@receiver(post_save, sender=Attachment)
+@receiver(post_save, sender=Comment)
+def invalidate_dashboard_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= COUNTER_FIELDS:
+        return
+    _invalidate_on_commit(*_project_ids(instance))
+
+
+@receiver(post_delete, sender=ProjectMember)
+@receiver(post_delete, sender=Experiment)
+@receiver(post_delete, sender=Finding)
+@receiver(post_delete, sender=Publication)
+@receiver(post_delete, sender=Attachment)
+@receiver(post_delete, sender=Comment)
+def invalidate_dashboard_on_delete(sender, instance, **kwargs):
+    project_ids = _project_ids(instance)
+    if project_ids:
+        _invalidate_on_commit(*project_ids)
+
+
+@receiver(m2m_changed, sender=Project.tags.through)
+@receiver(m2m_changed, sender=Experiment.tags.through)
+@receiver(m2m_changed, sender=Finding.tags.through)
+@receiver(m2m_changed, sender=Publication.tags.through)
+def invalidate_dashboard_on_tags(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _invalidate_on_commit(*_project_ids(instance))
+    elif pk_set:
+        # Tag-side change: ``pk_set`` holds the tagged objects.
+        project_ids = []
+        for obj in model.objects.filter(pk__in=pk_set):
+            project_ids.extend(_project_ids(obj))
+        _invalidate_on_commit(*project_ids)
+
+
+@receiver(post_save, sender=User)
+def invalidate_dashboard_on_user_name(sender, instance, created, update_fields=None, **kwargs):
+    """Dashboards show the PI's name and the names of members in recent activity"""
+    if created or not _saves_any(update_fields, {'first_name', 'last_name'}):
+        return
+    project_ids = Project.objects.filter(
+        Q(principal_investigator=instance) | Q(members__user=instance)
+    ).values_list('id', flat=True).distinct()
+    _invalidate_on_commit(*project_ids)
+
+
+@receiver(post_save, sender=ResearchGroup)
+def invalidate_dashboard_on_group_name(sender, instance, created, update_fields=None, **kwargs):
+    if created or not _saves_any(update_fields, {'name'}):
+        return
+    _invalidate_on_commit(*Project.objects.filter(research_group=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_dashboard_on_tag_name(sender, instance, created, update_fields=None, **kwargs):
+    """Top tags show the tag's name and slug"""
+    if created or not _saves_any(update_fields, {'name', 'slug'}):
+        return
+    # The same four link tables dashboard._top_tags counts
+    links = [
+        Project.tags.through.objects.filter(tag=instance).values_list('project_id'),
+        Experiment.tags.through.objects.filter(tag=instance).values_list('experiment__project_id'),
+        Finding.tags.through.objects.filter(tag=instance).values_list('finding__experiment__project_id'),
+        Publication.tags.through.objects.filter(tag=instance).values_list('publication__project_id'),
+    ]
+    _invalidate_on_commit(*{project_id for (project_id,) in links[0].union(*links[1:])})
@@ -1,11 +1,13 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
+from . import dashboard
 from .models import Project, ProjectMember
 from .serializers import (
     ProjectSerializer, ProjectCreateSerializer, ProjectUpdateSerializer,
@@ -19,7 +21,7 @@ User = get_user_model()
 
 class ProjectListCreateView(generics.ListCreateAPIView):
     """List all projects or create a new one"""
-    queryset = Project.objects.filter(is_active=True)
+    queryset = Project.objects.filter(is_active=True).select_related('research_group')
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['status', 'visibility', 'research_group', 'principal_investigator']
     search_fields = ['title', 'description', 'short_description']
@@ -78,7 +80,7 @@ class ProjectListCreateView(generics.ListCreateAPIView):
 
 class ProjectDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a project"""
-    queryset = Project.objects.filter(is_active=True)
+    queryset = Project.objects.filter(is_active=True).select_related('research_group')
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -207,3 +209,13 @@ class ProjectMemberDetailView(generics.RetrieveUpdateDestroyAPIView):
             raise PermissionError("Only project PI or admin can remove members")
         instance.is_active = False
         instance.save()
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def project_dashboard(request, pk):
+    """Counts, recent activity and top tags of a project in one response"""
+    project = get_object_or_404(
+        Project.objects.select_related('principal_investigator', 'research_group'), id=pk, is_active=True
+    )
+    return Response(dashboard.get_dashboard(project, dashboard.audience_for(request.user, project)))
@@ -0,0 +1,167 @@
+"""
+Citation counts and author metrics.
+
+``Publication.citations_count`` is the number of active publications that
+cite it, and ``Finding.citations_count`` the number of active publications
+that reference the finding. Adding or removing a single citation moves the
+cited count by one; signals recount from the relations whenever a DOI or an
+``is_active`` flag changes. DOI-only citations point at
+the active publication that carries the DOI, if there is one.
+
+Author metrics (``User.citation_count`` and ``User.h_index``) depend on every
+publication an author has, so they are not updated inline. Anything that can
+change them marks the authors in ``pending_author_metrics``, and
+``recompute_author_metrics`` later processes only those authors.
+"""
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.research_groups import stats as group_stats
+
+from .models import Citation, PendingAuthorMetrics, Publication
+
+
+User = get_user_model()
+
+
+def mark_authors_dirty(user_ids):
+    """Queue ``user_ids`` for the next author metrics run."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    now = timezone.now()
+    PendingAuthorMetrics.objects.bulk_create(
+        [PendingAuthorMetrics(user_id=user_id, marked_at=now) for user_id in user_ids],
+        update_conflicts=True, unique_fields=['user'], update_fields=['marked_at']
+    )
+
+
+def mark_publication_authors_dirty(publication_ids):
+    mark_authors_dirty(
+        Publication.authors.through.objects.filter(
+            publication_id__in=publication_ids
+        ).values_list('user_id', flat=True)
+    )
+
+
+def resolve_external_citations(publications):
+    """
+    Point DOI-only citations at the active ``publications`` that carry those
+    DOIs and count them.
+    """
+    by_doi = {
+        publication.doi_normalized: publication
+        for publication in publications if publication.doi_normalized and publication.is_active
+    }
+    if not by_doi:
+        return
+    resolved = []
+    for doi, publication in by_doi.items():
+        # A publication that already cites this one directly keeps that reference.
+        already_citing = Citation.objects.filter(cited=publication).values('citing_id')
+        if Citation.objects.filter(cited__isnull=True, cited_doi=doi).exclude(
+            citing_id__in=already_citing
+        ).update(cited=publication):
+            resolved.append(publication.id)
+    recount_publications(resolved)
+
+
+def sync_external_citations(publication):
+    """
+    Re-point DOI citations after ``publication``'s DOI or ``is_active``
+    changed: detach those that no longer match, attach the new ones.
+    """
+    doi = publication.doi_normalized if publication.is_active else None
+    stale = Citation.objects.filter(cited=publication).exclude(cited_doi='')
+    if doi:
+        stale = stale.exclude(cited_doi=doi)
+    stale.update(cited=None)
+    resolve_external_citations([publication])
+    recount_publications([publication.id])
+
+
+def add_citations(publication_id, delta):
+    """Add ``delta`` to ``citations_count`` of one publication, for a single citation added or removed."""
+    publications = Publication.objects.filter(id=publication_id)
+    publications.update(citations_count=F('citations_count') + delta)
+    mark_publication_authors_dirty([publication_id])
+    group_stats.invalidate_on_commit(*publications.values_list('project__research_group_id', flat=True))
+
+
+def recount_publications(publication_ids):
+    """Set ``citations_count`` of the given publications from their active citing publications."""
+    publication_ids = set(publication_ids)
+    if not publication_ids:
+        return
+    citing = Citation.objects.filter(
+        cited_id=OuterRef('pk'), citing__is_active=True
+    ).order_by().values('cited_id').annotate(n=Count('id')).values('n')
+    publications = Publication.objects.filter(id__in=publication_ids)
+    publications.update(citations_count=Coalesce(Subquery(citing), Value(0)))
+    group_stats.invalidate_on_commit(*publications.values_list('project__research_group_id', flat=True))
+    mark_publication_authors_dirty(publication_ids)
+
+
+def recount_findings(finding_ids):
+    """Set ``citations_count`` of the given findings from their active publications."""
+    from apps.findings.models import Finding
+
+    linked = Publication.findings.through.objects.filter(
+        finding_id=OuterRef('pk'), publication__is_active=True
+    ).order_by().values('finding_id').annotate(n=Count('id')).values('n')
+    findings = Finding.objects.filter(id__in=finding_ids)
+    findings.update(citations_count=Coalesce(Subquery(linked), Value(0)))
+    group_stats.invalidate_on_commit(*findings.values_list('experiment__project__research_group_id', flat=True))
+
+
+def h_index(counts):
+    """
+    Largest ``h`` such that ``h`` of the ``counts`` are at least ``h``.
+    After sorting in descending order, position ``i`` (1-based) qualifies
+    exactly when ``counts[i - 1] >= i``, and those positions form a prefix.
+    """
+    counts = np.sort(np.asarray(counts, dtype=np.int64))[::-1]
+    return int(np.count_nonzero(counts >= np.arange(1, len(counts) + 1)))
+
+
+def _author_counts(user_ids):
+    """Return ``{user_id: [citations_count, ...]}`` over active authored publications."""
+    counts = {user_id: [] for user_id in user_ids}
+    rows = Publication.authors.through.objects.filter(
+        user_id__in=user_ids, publication__is_active=True
+    ).values_list('user_id', 'publication__citations_count')
+    for user_id, citations in rows.iterator(chunk_size=5000):
+        counts[user_id].append(citations)
+    return counts
+
+
+def recompute_author_metrics(batch_size=1000, all_authors=False):
+    """
+    Recompute ``citation_count`` and ``h_index`` for queued authors, or for
+    every user with ``all_authors``. Returns the number of users updated.
+    """
+    snapshot = timezone.now()
+    if all_authors:
+        user_ids = User.objects.order_by('id').values_list('id', flat=True)
+    else:
+        user_ids = PendingAuthorMetrics.objects.filter(
+            marked_at__lte=snapshot
+        ).order_by('user_id').values_list('user_id', flat=True)
+    user_ids = list(user_ids)
+
+    updated = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        users = []
+        for user_id, counts in _author_counts(batch).items():
+            users.append(User(id=user_id, citation_count=sum(counts), h_index=h_index(counts)))
+        with transaction.atomic():
+            User.objects.bulk_update(users, ['citation_count', 'h_index'])
+            # Authors marked again while this run was going stay queued.
+            PendingAuthorMetrics.objects.filter(user_id__in=batch, marked_at__lte=snapshot).delete()
+        updated += len(users)
+    return updated
@@ -0,0 +1,199 @@
+"""
+Near-duplicate detection for publications.
+
+The title and abstract are reduced to a set of character 5-gram shingles
+and summarized by a 64-value MinHash signature. The share of equal
+positions in two signatures estimates the Jaccard similarity of their
+shingle sets. For lookup the signature is cut into 16 bands of 4 values.
+Each band is hashed to a 63-bit key stored in ``publication_bands``, so
+finding candidates is a single indexed ``key IN (...)`` query. Pairs with
+similarity around 0.5 and above collide in at least one band with high
+probability.
+"""
+import hashlib
+import re
+import zlib
+
+import numpy as np
+from django.db import transaction
+
+from .models import Publication, PublicationBand, PublicationFingerprint, normalize_doi
+
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+THRESHOLD = 0.6
+MERSENNE_PRIME = (1 << 31) - 1
+MAX_BUCKET_PAIRS = 200
+
+_rng = np.random.default_rng(1729)
+_A = _rng.integers(1, MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def _shingles(title, abstract):
+    text = ' '.join(WORD_RE.findall(f'{title or ""} {abstract or ""}'.lower()))
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(title, abstract):
+    """Return the MinHash signature as a ``uint32`` array."""
+    shingles = _shingles(title, abstract)
+    if not shingles:
+        return np.full(NUM_PERM, MERSENNE_PRIME, dtype=np.uint32)
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode()) & MERSENNE_PRIME for shingle in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    # (a * x + b) mod p for every permutation and shingle; fits in uint64
+    # because a, b, x are all below 2**31.
+    permuted = (np.outer(hashes, _A) + _B) % MERSENNE_PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def band_keys(sig):
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(
+            bytes([band]) + sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8
+        ).digest()
+        keys.append(int.from_bytes(digest, 'big') >> 1)
+    return keys
+
+
+def similarity(sig_a, sig_b):
+    return float(np.mean(sig_a == sig_b))
+
+
+def index_publication(publication):
+    """Store the fingerprint and band keys of ``publication``."""
+    sig = signature(publication.title, publication.abstract)
+    with transaction.atomic():
+        PublicationFingerprint.objects.update_or_create(
+            publication=publication, defaults={'signature': sig.tobytes()}
+        )
+        PublicationBand.objects.filter(publication=publication).delete()
+        PublicationBand.objects.bulk_create(
+            [PublicationBand(publication=publication, key=key) for key in band_keys(sig)]
+        )
+
+
+def index_publications(publications):
+    """Fingerprint newly created ``publications`` with two bulk inserts."""
+    fingerprints, bands = [], []
+    for publication in publications:
+        sig = signature(publication.title, publication.abstract)
+        fingerprints.append(PublicationFingerprint(publication=publication, signature=sig.tobytes()))
+        bands.extend(PublicationBand(publication=publication, key=key) for key in band_keys(sig))
+    PublicationFingerprint.objects.bulk_create(fingerprints)
+    PublicationBand.objects.bulk_create(bands)
+
+
+def find_similar(title, abstract, exclude_id=None, threshold=THRESHOLD, limit=5):
+    """
+    Return up to ``limit`` active publications whose title and abstract look
+    like the given ones, as ``[(publication_id, similarity)]``.
+    """
+    sig = signature(title, abstract)
+    candidates = PublicationBand.objects.filter(
+        key__in=band_keys(sig), publication__is_active=True
+    ).values_list('publication_id', flat=True).distinct()
+    if exclude_id is not None:
+        candidates = candidates.exclude(publication_id=exclude_id)
+
+    fingerprints = PublicationFingerprint.objects.filter(
+        publication_id__in=list(candidates[:200])
+    ).values_list('publication_id', 'signature')
+
+    matches = []
+    for publication_id, stored in fingerprints:
+        score = similarity(sig, np.frombuffer(bytes(stored), dtype=np.uint32))
+        if score >= threshold:
+            matches.append((publication_id, score))
+    matches.sort(key=lambda match: match[1], reverse=True)
+    return matches[:limit]
+
+
+def possible_duplicates(title, abstract, exclude_id=None):
+    """``find_similar`` results as dicts for API responses."""
+    matches = find_similar(title, abstract, exclude_id=exclude_id)
+    titles = dict(
+        Publication.objects.filter(id__in=[pk for pk, _ in matches]).values_list('id', 'title')
+    )
+    return [
+        {'id': pk, 'title': titles[pk], 'similarity': round(score, 3)}
+        for pk, score in matches if pk in titles
+    ]
+
+
+def index_missing(batch_size=1000):
+    """Fingerprint publications that have no fingerprint yet. Returns the count."""
+    missing = Publication.objects.filter(fingerprint__isnull=True).only('id', 'title', 'abstract')
+    count = 0
+    for publication in missing.iterator(chunk_size=batch_size):
+        index_publication(publication)
+        count += 1
+    return count
+
+
+def find_clusters(threshold=THRESHOLD):
+    """
+    Group active publications that share a DOI or whose fingerprints are at
+    least ``threshold`` similar. Returns lists of IDs, oldest first.
+    """
+    parent = {}
+
+    def find(item):
+        parent.setdefault(item, item)
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    active = Publication.objects.filter(is_active=True)
+
+    by_doi = {}
+    for publication_id, doi in active.exclude(doi__isnull=True).exclude(doi='').values_list('id', 'doi'):
+        key = normalize_doi(doi)
+        if key:
+            key = key.lower()
+            if key in by_doi:
+                union(by_doi[key], publication_id)
+            else:
+                by_doi[key] = publication_id
+
+    signatures = {
+        publication_id: np.frombuffer(bytes(stored), dtype=np.uint32)
+        for publication_id, stored in PublicationFingerprint.objects.filter(
+            publication__is_active=True
+        ).values_list('publication_id', 'signature').iterator(chunk_size=2000)
+    }
+    buckets = {}
+    rows = PublicationBand.objects.filter(publication__is_active=True).values_list('key', 'publication_id')
+    for key, publication_id in rows.iterator(chunk_size=5000):
+        buckets.setdefault(key, []).append(publication_id)
+
+    for members in buckets.values():
+        # Very large buckets come from boilerplate text; comparing every
+        # pair there is quadratic and rarely useful.
+        members = members[:MAX_BUCKET_PAIRS]
+        for i, current in enumerate(members):
+            for other in members[:i]:
+                if find(current) != find(other) and similarity(signatures[current], signatures[other]) >= threshold:
+                    union(current, other)
+
+    clusters = {}
+    for item in parent:
+        clusters.setdefault(find(item), []).append(item)
+    return [sorted(members) for members in clusters.values() if len(members) > 1]
@@ -0,0 +1,165 @@
+"""
+Formatted references and BibTeX/CSL-JSON export.
+
+``Publication.citation_text`` holds the short reference shown in the API.
+It is rebuilt by ``refresh_citation_text`` whenever the title, venue, date or
+authors change, so serializing a list of publications no longer runs two
+author queries per row.
+
+Exports walk the publication set in primary-key order, one batch at a time.
+Each batch costs three queries (publications, authors, tags), and only one
+batch is held in memory.
+"""
+import json
+import re
+from collections import defaultdict
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Publication, format_citation
+
+
+EXPORT_FORMATS = {
+    'bibtex': ('application/x-bibtex', 'bib'),
+    'csl_json': ('application/vnd.citationstyles.csl+json', 'json'),
+}
+BATCH_SIZE = 500
+
+BIBTEX_SPECIAL_RE = re.compile(r'([&%$#_{}])')
+BIBTEX_KEY_RE = re.compile(r'[^A-Za-z0-9]')
+
+PUBLICATION_FIELDS = [
+    'id', 'title', 'abstract', 'journal', 'conference', 'publication_date', 'doi', 'url'
+]
+
+
+def _authors_by_publication(publication_ids):
+    """Return ``{publication_id: [(first_name, last_name), ...]}`` in the order authors were added."""
+    authors = defaultdict(list)
+    rows = Publication.authors.through.objects.filter(
+        publication_id__in=publication_ids
+    ).order_by('id').values_list('publication_id', 'user__first_name', 'user__last_name')
+    for publication_id, first_name, last_name in rows:
+        authors[publication_id].append((first_name, last_name))
+    return authors
+
+
+def refresh_citation_text(publication_ids):
+    """Rebuild ``citation_text`` for ``publication_ids`` in batches."""
+    publication_ids = sorted(set(publication_ids))
+    for start in range(0, len(publication_ids), BATCH_SIZE):
+        batch = publication_ids[start:start + BATCH_SIZE]
+        authors = _authors_by_publication(batch)
+        publications = []
+        for row in Publication.objects.filter(id__in=batch).values(
+            'id', 'title', 'journal', 'conference', 'publication_date'
+        ):
+            names = [f'{first} {last}' for first, last in authors[row['id']]]
+            publications.append(Publication(id=row['id'], citation_text=format_citation(
+                names, len(names), row['title'], row['journal'], row['conference'], row['publication_date']
+            )))
+        Publication.objects.bulk_update(publications, ['citation_text'])
+
+
+def _bibtex_escape(value):
+    return BIBTEX_SPECIAL_RE.sub(r'\\\1', value)
+
+
+def to_bibtex(row, authors, tags):
+    year = row['publication_date'].year if row['publication_date'] else None
+    first_author = BIBTEX_KEY_RE.sub('', authors[0][1]) if authors else ''
+    key = f"{first_author or 'pub'}{year or ''}_{row['id']}"
+    if row['journal']:
+        entry_type, venue = 'article', ('journal', row['journal'])
+    elif row['conference']:
+        entry_type, venue = 'inproceedings', ('booktitle', row['conference'])
+    else:
+        entry_type, venue = 'misc', None
+
+    fields = [
+        ('title', row['title']),
+        ('author', ' and '.join(f'{last}, {first}' for first, last in authors)),
+    ]
+    if venue:
+        fields.append(venue)
+    if year:
+        fields.append(('year', str(year)))
+        fields.append(('month', str(row['publication_date'].month)))
+    fields += [
+        ('doi', row['doi']),
+        ('url', row['url']),
+        ('keywords', ', '.join(tags)),
+        ('abstract', row['abstract']),
+    ]
+    lines = [
+        f'  {name} = {{{_bibtex_escape(value)}}}'
+        for name, value in fields if value
+    ]
+    return f'@{entry_type}{{{key},\n' + ',\n'.join(lines) + '\n}\n\n'
+
+
+def to_csl(row, authors, tags):
+    item = {
+        'id': f"pub{row['id']}",
+        'type': 'article-journal' if row['journal'] else 'paper-conference' if row['conference'] else 'article',
+        'title': row['title'],
+        'author': [{'given': first, 'family': last} for first, last in authors],
+    }
+    if row['journal'] or row['conference']:
+        item['container-title'] = row['journal'] or row['conference']
+    if row['publication_date']:
+        published = row['publication_date']
+        item['issued'] = {'date-parts': [[published.year, published.month, published.day]]}
+    if row['doi']:
+        item['DOI'] = row['doi']
+    if row['url']:
+        item['URL'] = row['url']
+    if row['abstract']:
+        item['abstract'] = row['abstract']
+    if tags:
+        item['keyword'] = ', '.join(tags)
+    return item
+
+
+def _batches(queryset):
+    """Yield ``(rows, authors, tags)`` for consecutive primary-key batches of ``queryset``."""
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).order_by('id').values(*PUBLICATION_FIELDS)[:BATCH_SIZE])
+        if not rows:
+            return
+        ids = [row['id'] for row in rows]
+        tags = defaultdict(list)
+        for publication_id, name in Publication.tags.through.objects.filter(
+            publication_id__in=ids
+        ).values_list('publication_id', 'tag__name'):
+            tags[publication_id].append(name)
+        yield rows, _authors_by_publication(ids), tags
+        last_id = ids[-1]
+
+
+def _bibtex_lines(queryset):
+    for rows, authors, tags in _batches(queryset):
+        for row in rows:
+            yield to_bibtex(row, authors[row['id']], tags[row['id']])
+
+
+def _csl_lines(queryset):
+    yield '['
+    separator = '\n'
+    for rows, authors, tags in _batches(queryset):
+        for row in rows:
+            yield separator + json.dumps(to_csl(row, authors[row['id']], tags[row['id']]))
+            separator = ',\n'
+    yield '\n]\n'
+
+
+def stream_export(queryset, file_format, filename='publications'):
+    """Stream ``queryset`` as a BibTeX or CSL-JSON attachment."""
+    lines = _bibtex_lines(queryset) if file_format == 'bibtex' else _csl_lines(queryset)
+    content_type, extension = EXPORT_FORMATS[file_format]
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+    response['Content-Disposition'] = f'attachment; filename="{filename}-{stamp}.{extension}"'
+    return response
@@ -0,0 +1,672 @@
+"""
+Bulk import of BibTeX, RIS and CSL-JSON files.
+
+Each parser reads a text stream incrementally and yields one normalized
+record at a time, so the size of the file does not matter. Records are
+grouped into chunks. Each chunk costs a fixed number of queries: one for
+existing DOIs, one for authors (matched by ORCID or e-mail), a few for
+tags, then ``bulk_create`` for the publications and their author and tag
+links, all inside one transaction.
+
+Records are normalized to dicts with the keys ``title``, ``abstract``,
+``authors`` (dicts with ``name``, ``orcid`` and ``email``), ``journal``,
+``conference``, ``publication_date``, ``doi``, ``url`` and ``keywords``.
+
+Jobs run on a thread of the web worker that accepted the file. A job still
+pending or running ``PUBLICATIONS_IMPORT_JOB_TIMEOUT`` seconds after it was
+created or started is taken to have lost its worker and is marked failed
+(``fail_stale_jobs``); its thread, if still alive, stops at the next chunk.
+"""
+import io
+import json
+import logging
+import re
+import threading
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.text import slugify
+
+from apps.comments.validators import validate_doi
+from apps.common import rollups
+from apps.projects import dashboard
+from apps.tags.models import Tag
+
+from . import citations, dedup, formatting
+from .models import Publication, PublicationImportJob, normalize_doi
+
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+READ_SIZE = 64 * 1024
+
+ORCID_RE = re.compile(r'\b(\d{4}-\d{4}-\d{4}-\d{3}[\dX])\b')
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+LATEX_ACCENT_RE = re.compile(r'\\[`\'^"~=.uvHckr]\s*\{?\s*([A-Za-z])\s*\}?')
+LATEX_COMMAND_RE = re.compile(r'\\[A-Za-z]+\s*')
+WHITESPACE_RE = re.compile(r'\s+')
+
+MONTHS = {
+    name: number for number, name in enumerate(
+        ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1
+    )
+}
+
+
+def _author(text, orcid=None, email=None):
+    """Build an author dict, picking an ORCID or e-mail out of the name if present."""
+    text = text or ''
+    # ORCIDs are often given as https://orcid.org/... URLs.
+    match = ORCID_RE.search(orcid or text)
+    orcid = match.group(1) if match else None
+    if not email:
+        match = EMAIL_RE.search(text)
+        email = match.group(0) if match else None
+    name = ORCID_RE.sub('', EMAIL_RE.sub('', text)).strip(' <>()[],')
+    return {'name': name, 'orcid': orcid, 'email': email.lower() if email else None}
+
+
+def _make_date(year, month=None, day=None):
+    try:
+        return date(int(year), int(month or 1), int(day or 1))
+    except (TypeError, ValueError):
+        try:
+            return date(int(year), 1, 1)
+        except (TypeError, ValueError):
+            return None
+
+
+def _keywords(value, separator=r'[;,]'):
+    return [keyword.strip() for keyword in re.split(separator, value or '') if keyword.strip()]
+
+
+# BibTeX
+
+ENTRY_RE = re.compile(r'@\s*(\w+)\s*([{(])')
+FIELD_RE = re.compile(r'\s*([\w:+.-]+)\s*=')
+BARE_VALUE_RE = re.compile(r'[^\s,#}]+')
+
+
+def _clean_latex(value):
+    value = LATEX_ACCENT_RE.sub(r'\1', value)
+    value = value.replace('\\&', '&').replace('\\%', '%').replace('\\_', '_').replace('--', '-')
+    value = LATEX_COMMAND_RE.sub('', value)
+    return WHITESPACE_RE.sub(' ', value.replace('{', '').replace('}', '')).strip()
+
+
+def _bibtex_chunks(stream):
+    """
+    Yield ``(entry_type, body)`` for every ``@type{...}`` or ``@type(...)``
+    entry, reading ``stream`` a block at a time.
+    """
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        start = buffer.find('@', position)
+        opening = -1
+        if start != -1:
+            match = ENTRY_RE.match(buffer, start)
+            if match:
+                entry_type, delimiter, opening = match.group(1).lower(), match.group(2), match.end()
+            elif len(buffer) - start > 64 or eof:
+                # An "@" in free text between entries.
+                position = start + 1
+                continue
+
+        end = -1
+        if opening != -1:
+            closing = '}' if delimiter == '{' else ')'
+            depth, index = 0, opening
+            while index < len(buffer):
+                char = buffer[index]
+                if char == '{':
+                    depth += 1
+                elif char == '}' and depth:
+                    depth -= 1
+                elif char == closing and depth == 0:
+                    end = index
+                    break
+                index += 1
+
+        if end != -1:
+            yield entry_type, buffer[opening:end]
+            buffer, position = buffer[end + 1:], 0
+            continue
+        if eof:
+            return
+        block = stream.read(READ_SIZE)
+        if not block:
+            eof = True
+        # Drop text that cannot belong to an entry before appending.
+        if start == -1:
+            buffer, position = buffer[-64:], 0
+        elif start > 0:
+            buffer, position = buffer[start:], 0
+        buffer += block
+
+
+def _bibtex_value(body, index, macros):
+    """Parse one field value starting at ``index``; returns ``(value, next_index)``."""
+    parts = []
+    while True:
+        while index < len(body) and body[index].isspace():
+            index += 1
+        if index >= len(body):
+            break
+        char = body[index]
+        if char in '{"':
+            # Braces nest inside both forms; a quote only ends a "..." value
+            # outside braces.
+            depth = 1 if char == '{' else 0
+            index += 1
+            start = index
+            while index < len(body):
+                current = body[index]
+                if current == '{':
+                    depth += 1
+                elif current == '}':
+                    depth -= 1
+                    if depth == 0 and char == '{':
+                        break
+                elif current == '"' and depth == 0:
+                    break
+                index += 1
+            parts.append(body[start:index])
+            index += 1
+        else:
+            match = BARE_VALUE_RE.match(body, index)
+            if not match:
+                break
+            word = match.group(0)
+            parts.append(macros.get(word.lower(), word))
+            index = match.end()
+        while index < len(body) and body[index].isspace():
+            index += 1
+        if index < len(body) and body[index] == '#':
+            index += 1
+            continue
+        break
+    return ''.join(parts), index
+
+
+def _bibtex_fields(body, macros, with_key=True):
+    fields = {}
+    index = 0
+    if with_key:
+        comma = body.find(',')
+        if comma == -1:
+            return fields
+        index = comma + 1
+    while index < len(body):
+        match = FIELD_RE.match(body, index)
+        if not match:
+            break
+        value, index = _bibtex_value(body, match.end(), macros)
+        fields[match.group(1).lower()] = value
+        while index < len(body) and body[index] in ', \t\r\n':
+            index += 1
+    return fields
+
+
+def _bibtex_author(name):
+    author = _author(_clean_latex(name))
+    if ',' in author['name']:
+        last, first = author['name'].split(',', 1)
+        author['name'] = f'{first.strip()} {last.strip()}'.strip()
+    return author
+
+
+def parse_bibtex(stream):
+    macros = {name: str(number) for name, number in MONTHS.items()}
+    for entry_type, body in _bibtex_chunks(stream):
+        if entry_type in ('comment', 'preamble'):
+            continue
+        if entry_type == 'string':
+            for name, value in _bibtex_fields(body, macros, with_key=False).items():
+                macros[name] = value
+            continue
+
+        fields = _bibtex_fields(body, macros)
+        month = fields.get('month', '').strip().lower()[:3]
+        conference = None
+        journal = fields.get('journal')
+        if entry_type in ('inproceedings', 'conference', 'proceedings'):
+            conference = fields.get('booktitle')
+        elif not journal:
+            journal = fields.get('booktitle')
+        yield {
+            'title': _clean_latex(fields.get('title', '')),
+            'abstract': _clean_latex(fields.get('abstract', '')),
+            'authors': [
+                _bibtex_author(name)
+                for name in re.split(r'\s+and\s+', fields.get('author', ''), flags=re.IGNORECASE)
+                if name.strip()
+            ],
+            'journal': _clean_latex(journal) if journal else None,
+            'conference': _clean_latex(conference) if conference else None,
+            'publication_date': _make_date(
+                fields.get('year', '').strip()[:4], MONTHS.get(month, month if month.isdigit() else None)
+            ),
+            'doi': fields.get('doi', '').strip() or None,
+            'url': fields.get('url', '').strip() or None,
+            'keywords': _keywords(_clean_latex(fields.get('keywords', ''))),
+        }
+
+
+# RIS
+
+RIS_LINE_RE = re.compile(r'^([A-Z][A-Z0-9])  -\s?(.*)$')
+
+
+def _ris_record(tags):
+    def first(*names):
+        for name in names:
+            if tags.get(name):
+                return tags[name][0]
+        return None
+
+    date_parts = re.split(r'[/-]', first('DA', 'PY', 'Y1') or '')
+    record_type = first('TY') or ''
+    container = first('T2', 'JO', 'JF', 'JA', 'BT')
+    is_conference = record_type in ('CONF', 'CPAPER')
+    return {
+        'title': first('TI', 'T1') or '',
+        'abstract': first('AB', 'N2') or '',
+        'authors': [_ris_author(name) for name in tags.get('AU', []) + tags.get('A1', [])],
+        'journal': None if is_conference else container,
+        'conference': container if is_conference else None,
+        'publication_date': _make_date(*(date_parts + [None, None, None])[:3]),
+        'doi': first('DO'),
+        'url': first('UR'),
+        'keywords': [keyword for value in tags.get('KW', []) for keyword in _keywords(value, r';')],
+    }
+
+
+def _ris_author(name):
+    author = _author(name)
+    if ',' in author['name']:
+        last, first = author['name'].split(',', 1)
+        author['name'] = f'{first.strip()} {last.strip()}'.strip()
+    return author
+
+
+def parse_ris(stream):
+    tags = {}
+    last_tag = None
+    for line in stream:
+        line = line.rstrip('\r\n')
+        match = RIS_LINE_RE.match(line)
+        if not match:
+            # Continuation of a long value such as an abstract.
+            if last_tag and line.strip() and tags.get(last_tag):
+                tags[last_tag][-1] += ' ' + line.strip()
+            continue
+        tag, value = match.group(1), match.group(2).strip()
+        if tag == 'TY':
+            tags = {}
+        if tag == 'ER':
+            if tags:
+                yield _ris_record(tags)
+            tags, last_tag = {}, None
+            continue
+        tags.setdefault(tag, []).append(value)
+        last_tag = tag
+
+
+# CSL-JSON
+
+def _csl_objects(stream):
+    """Yield the objects of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    index = 0
+    started = False
+    eof = False
+    while True:
+        while index < len(buffer) and (buffer[index].isspace() or buffer[index] == ','):
+            index += 1
+        if not started and index < len(buffer):
+            if buffer[index] == '[':
+                started = True
+                index += 1
+                continue
+            # A single object rather than a list.
+            started = True
+        if started and index < len(buffer):
+            if buffer[index] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, index)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield value
+                buffer, index = buffer[end:], 0
+                continue
+        if eof:
+            return
+        block = stream.read(READ_SIZE)
+        if not block:
+            eof = True
+        buffer = buffer[index:] + block
+        index = 0
+
+
+def _csl_author(author):
+    name = author.get('literal') or ' '.join(
+        part for part in (author.get('given'), author.get('family')) if part
+    )
+    return _author(name, orcid=author.get('ORCID') or author.get('orcid'), email=author.get('email'))
+
+
+def parse_csl_json(stream):
+    for item in _csl_objects(stream):
+        if not isinstance(item, dict):
+            continue
+        date_parts = ((item.get('issued') or {}).get('date-parts') or [[None]])[0] + [None, None, None]
+        container = item.get('container-title')
+        if isinstance(container, list):
+            container = container[0] if container else None
+        is_conference = item.get('type') == 'paper-conference'
+        keywords = item.get('keyword') or ''
+        yield {
+            'title': item.get('title') or '',
+            'abstract': item.get('abstract') or '',
+            'authors': [_csl_author(author) for author in item.get('author') or [] if isinstance(author, dict)],
+            'journal': None if is_conference else container,
+            'conference': container if is_conference else None,
+            'publication_date': _make_date(*date_parts[:3]),
+            'doi': item.get('DOI'),
+            'url': item.get('URL'),
+            'keywords': _keywords(keywords) if isinstance(keywords, str) else list(keywords),
+        }
+
+
+PARSERS = {
+    'bibtex': parse_bibtex,
+    'ris': parse_ris,
+    'csl_json': parse_csl_json,
+}
+EXTENSIONS = {
+    '.bib': 'bibtex',
+    '.bibtex': 'bibtex',
+    '.ris': 'ris',
+    '.json': 'csl_json',
+}
+
+
+def detect_format(filename):
+    for extension, file_format in EXTENSIONS.items():
+        if filename.lower().endswith(extension):
+            return file_format
+    return None
+
+
+# Import
+
+class JobAbandoned(Exception):
+    """The job was marked failed while its thread was still importing."""
+
+
+class ImportStats:
+    def __init__(self, max_errors):
+        self.processed = self.created = self.skipped = self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def error(self, record_number, message):
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'record': record_number, 'error': message})
+
+
+def _truncate(value, length):
+    return value.strip()[:length] if value else None
+
+
+def _prepare(record, number, seen_dois, stats):
+    """Validate a parsed record; returns the cleaned record or ``None`` to skip it."""
+    title = _truncate(record.get('title'), 300)
+    if not title:
+        stats.failed += 1
+        stats.error(number, 'Missing title')
+        return None
+
+    doi = normalize_doi(record.get('doi'))
+    if doi:
+        try:
+            validate_doi(doi)
+        except ValidationError:
+            stats.error(number, f'Ignored invalid DOI {doi!r}')
+            doi = None
+    if doi:
+        if doi.lower() in seen_dois:
+            stats.skipped += 1
+            return None
+        seen_dois.add(doi.lower())
+
+    url = _truncate(record.get('url'), 200)
+    return dict(
+        record, title=title, doi=doi,
+        journal=_truncate(record.get('journal'), 255),
+        conference=_truncate(record.get('conference'), 255),
+        url=url if url and url.startswith(('http://', 'https://')) else None,
+        keywords=[keyword[:100] for keyword in record.get('keywords', [])],
+        number=number,
+    )
+
+
+def _resolve_authors(records):
+    """Return ``(by_orcid, by_email)`` maps to user IDs for the authors in ``records``."""
+    orcids, emails = set(), set()
+    for record in records:
+        for author in record['authors']:
+            if author['orcid']:
+                orcids.add(author['orcid'])
+            if author['email']:
+                emails.add(author['email'])
+    by_orcid, by_email = {}, {}
+    if orcids or emails:
+        users = User.objects.annotate(email_lower=Lower('email')).filter(
+            Q(orcid_id__in=orcids) | Q(email_lower__in=emails)
+        ).values_list('id', 'orcid_id', 'email_lower')
+        for user_id, orcid, email in users:
+            if orcid:
+                by_orcid[orcid] = user_id
+            by_email[email] = user_id
+    return by_orcid, by_email
+
+
+def _resolve_tags(records):
+    """Return ``{name: tag_id}`` for every keyword, creating missing tags."""
+    names = {keyword for record in records for keyword in record['keywords']}
+    if not names:
+        return {}
+    tags = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = {name: slugify(name)[:100] for name in names - tags.keys()}
+    missing = {name: slug for name, slug in missing.items() if slug}
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(name=name, slug=slug) for name, slug in missing.items()], ignore_conflicts=True
+        )
+        tags.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+        # A different spelling may already own the slug; reuse that tag.
+        by_slug = dict(Tag.objects.filter(
+            slug__in=[slug for name, slug in missing.items() if name not in tags]
+        ).values_list('slug', 'id'))
+        for name, slug in missing.items():
+            if name not in tags and slug in by_slug:
+                tags[name] = by_slug[slug]
+    return tags
+
+
+def import_chunk(records, project, user, publication_status, seen_dois, stats):
+    """Insert one chunk of parsed records. ``records`` is a list of ``(number, record)``."""
+    prepared = [
+        cleaned for cleaned in (_prepare(record, number, seen_dois, stats) for number, record in records)
+        if cleaned is not None
+    ]
+    stats.processed += len(records)
+
+    dois = [record['doi'].lower() for record in prepared if record['doi']]
+    existing = set(
+        Publication.objects.filter(is_active=True, doi_normalized__in=dois).values_list('doi_normalized', flat=True)
+    ) if dois else set()
+    fresh = [record for record in prepared if not record['doi'] or record['doi'].lower() not in existing]
+    stats.skipped += len(prepared) - len(fresh)
+    if not fresh:
+        return []
+
+    by_orcid, by_email = _resolve_authors(fresh)
+    tags = _resolve_tags(fresh)
+
+    publications = [
+        Publication(
+            title=record['title'],
+            abstract=record['abstract'] or '',
+            journal=record['journal'],
+            conference=record['conference'],
+            publication_date=record['publication_date'],
+            doi=record['doi'],
+            doi_normalized=record['doi'].lower() if record['doi'] else None,
+            url=record['url'],
+            status=publication_status,
+            project=project,
+            created_by=user,
+            updated_by=user,
+        )
+        for record in fresh
+    ]
+    with transaction.atomic():
+        publications = Publication.objects.bulk_create(publications)
+        author_links, tag_links = [], []
+        for publication, record in zip(publications, fresh):
+            author_ids = []
+            for author in record['authors']:
+                author_id = by_orcid.get(author['orcid']) or by_email.get(author['email'])
+                if author_id and author_id not in author_ids:
+                    author_ids.append(author_id)
+            # Authors without an account are not linked; the importer can
+            # still edit the publication as its creator.
+            for author_id in author_ids:
+                author_links.append(Publication.authors.through(publication_id=publication.id, user_id=author_id))
+            for tag_id in {tags[keyword] for keyword in record['keywords'] if keyword in tags}:
+                tag_links.append(Publication.tags.through(publication_id=publication.id, tag_id=tag_id))
+        Publication.authors.through.objects.bulk_create(author_links)
+        Publication.tags.through.objects.bulk_create(tag_links)
+
+        # bulk_create skips the post_save/m2m_changed handlers, so do their work here.
+        dedup.index_publications(publications)
+        formatting.refresh_citation_text(publication.id for publication in publications)
+        citations.resolve_external_citations(publications)
+        citations.mark_authors_dirty(link.user_id for link in author_links)
+        rollups.record('project', project.id, {'publications_count': len(publications)}, timezone.now())
+        project_id = project.id
+        transaction.on_commit(lambda: dashboard.invalidate(project_id))
+
+    stats.created += len(publications)
+    return publications
+
+
+def import_file(stream, file_format, project, user, publication_status='published', chunk_size=None,
+                on_progress=None):
+    """
+    Import every record in ``stream``. ``on_progress(stats)`` is called after
+    each chunk. Returns the final ``ImportStats``.
+    """
+    chunk_size = chunk_size or settings.PUBLICATIONS_IMPORT_CHUNK_SIZE
+    stats = ImportStats(settings.PUBLICATIONS_IMPORT_MAX_ERRORS)
+    seen_dois = set()
+    chunk = []
+    for number, record in enumerate(PARSERS[file_format](stream), start=1):
+        chunk.append((number, record))
+        if len(chunk) >= chunk_size:
+            import_chunk(chunk, project, user, publication_status, seen_dois, stats)
+            chunk = []
+            if on_progress:
+                on_progress(stats)
+    if chunk:
+        import_chunk(chunk, project, user, publication_status, seen_dois, stats)
+    if on_progress:
+        on_progress(stats)
+    return stats
+
+
+def _save_progress(job_id, stats, **extra):
+    return PublicationImportJob.objects.filter(id=job_id, status='running').update(
+        processed_count=stats.processed,
+        created_count=stats.created,
+        skipped_count=stats.skipped,
+        failed_count=stats.failed,
+        errors=stats.errors,
+        **extra
+    )
+
+
+def run_job(job_id):
+    """Run an import job to completion, recording progress on the job row."""
+    job = PublicationImportJob.objects.select_related('project', 'created_by').get(id=job_id)
+    if not PublicationImportJob.objects.filter(id=job_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    ):
+        return
+    stats = ImportStats(settings.PUBLICATIONS_IMPORT_MAX_ERRORS)
+
+    def on_progress(current):
+        if not _save_progress(job_id, current):
+            raise JobAbandoned()
+
+    try:
+        with job.file.open('rb') as raw:
+            stream = io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace')
+            stats = import_file(
+                stream, job.file_format, job.project, job.created_by, job.publication_status,
+                on_progress=on_progress
+            )
+    except JobAbandoned:
+        logger.warning('Publication import %s was marked failed while running; stopped', job_id)
+        return
+    except Exception as exc:
+        logger.exception('Publication import %s failed', job_id)
+        stats.error(None, f'Import stopped: {exc}')
+        _save_progress(job_id, stats, status='failed', finished_at=timezone.now())
+        return
+    _save_progress(job_id, stats, status='completed', finished_at=timezone.now())
+
+
+def fail_stale_jobs():
+    """Mark failed the jobs whose worker went away. Returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=settings.PUBLICATIONS_IMPORT_JOB_TIMEOUT)
+    stale = PublicationImportJob.objects.filter(
+        Q(status='pending', created_at__lt=cutoff) | Q(status='running', started_at__lt=cutoff)
+    )
+    failed = 0
+    for job in stale:
+        job.errors = job.errors + [{'record': None, 'error': 'Import stopped: the worker running it went away'}]
+        failed += PublicationImportJob.objects.filter(id=job.id, status=job.status).update(
+            status='failed', finished_at=timezone.now(), errors=job.errors
+        )
+    return failed
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def start_job(job):
+    """Run ``job`` in a background thread once the current transaction commits."""
+    transaction.on_commit(lambda: threading.Thread(
+        target=_run_in_thread, args=(job.id,), name=f'publication-import-{job.id}', daemon=True
+    ).start())
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.publications import dedup
+from apps.publications.models import Publication
+
+
+class Command(BaseCommand):
+    help = 'Cluster active publications that share a DOI or have near-identical titles/abstracts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=dedup.THRESHOLD)
+        parser.add_argument('--json', action='store_true', help='Print clusters as JSON lines')
+
+    def handle(self, *args, **options):
+        indexed = dedup.index_missing()
+        if indexed:
+            self.stderr.write(f'Fingerprinted {indexed} publications')
+
+        clusters = dedup.find_clusters(threshold=options['threshold'])
+        ids = [publication_id for cluster in clusters for publication_id in cluster]
+        details = {
+            row['id']: row
+            for row in Publication.objects.filter(id__in=ids).values('id', 'title', 'doi', 'created_at')
+        }
+
+        for cluster in clusters:
+            # The oldest publication is the suggested merge target.
+            keep, duplicates = cluster[0], cluster[1:]
+            if options['json']:
+                self.stdout.write(json.dumps({'keep': keep, 'duplicates': duplicates}))
+                continue
+            self.stdout.write(f"Keep {keep}: {details[keep]['title']} ({details[keep]['doi'] or 'no DOI'})")
+            for publication_id in duplicates:
+                row = details[publication_id]
+                self.stdout.write(f"  duplicate {publication_id}: {row['title']} ({row['doi'] or 'no DOI'})")
+
+        self.stderr.write(f'{len(clusters)} duplicate clusters, {len(ids) - len(clusters)} publications to merge')
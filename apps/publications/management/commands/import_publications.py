@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.projects.models import Project
+from apps.publications import importers
+from apps.publications.models import Publication
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import publications from a BibTeX, RIS or CSL-JSON file into a project'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--project', type=int, required=True, help='Project ID')
+        parser.add_argument('--user', required=True, help='E-mail of the importing user')
+        parser.add_argument('--format', dest='file_format', choices=sorted(importers.PARSERS))
+        parser.add_argument('--status', default='published', choices=[key for key, _ in Publication.STATUS_CHOICES])
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(id=options['project'], is_active=True)
+        except Project.DoesNotExist:
+            raise CommandError(f"Project {options['project']} does not exist")
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+        file_format = options['file_format'] or importers.detect_format(options['path'])
+        if file_format is None:
+            raise CommandError('Could not detect the file format; pass --format')
+
+        def report(stats):
+            self.stderr.write(
+                f'{stats.processed} read, {stats.created} created, {stats.skipped} skipped, {stats.failed} failed'
+            )
+
+        with open(options['path'], encoding='utf-8-sig', errors='replace') as stream:
+            stats = importers.import_file(
+                stream, file_format, project, user, options['status'],
+                chunk_size=options['chunk_size'], on_progress=report
+            )
+        for error in stats.errors:
+            self.stderr.write(f"Record {error['record']}: {error['error']}")
+        self.stdout.write(f'Imported {stats.created} publications')
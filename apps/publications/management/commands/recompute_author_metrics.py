@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.publications import citations
+
+
+class Command(BaseCommand):
+    help = 'Recompute citation_count and h_index for authors whose publications or citations changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute every user, not just queued authors')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = citations.recompute_author_metrics(
+            batch_size=options['batch_size'], all_authors=options['all']
+        )
+        self.stdout.write(f'Updated metrics for {updated} authors')
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:57
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_doi_normalized(apps, schema_editor):
+    """
+    Fill doi_normalized. When several active publications share a DOI only
+    the oldest gets it; find_duplicate_publications reports the others.
+    """
+    Publication = apps.get_model('publications', 'Publication')
+    prefix = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.IGNORECASE)
+
+    seen = set()
+    rows = Publication.objects.exclude(doi__isnull=True).exclude(doi='').order_by('id')
+    for publication in rows.iterator():
+        normalized = prefix.sub('', publication.doi.strip()).strip().lower() or None
+        if normalized and publication.is_active:
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+        Publication.objects.filter(id=publication.id).update(doi_normalized=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublicationBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+            ],
+            options={
+                'db_table': 'publication_bands',
+            },
+        ),
+        migrations.CreateModel(
+            name='PublicationFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('signature', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'publication_fingerprints',
+            },
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='doi_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(backfill_doi_normalized, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='publication',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('doi_normalized',), name='publication_doi_unique'),
+        ),
+        migrations.AddField(
+            model_name='publicationfingerprint',
+            name='publication',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint', to='publications.publication'),
+        ),
+        migrations.AddField(
+            model_name='publicationband',
+            name='publication',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dedup_bands', to='publications.publication'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def reset_citation_counts(apps, schema_editor):
+    """
+    Counts were never maintained before: start publications at zero (there
+    are no citation rows yet) and count findings from the publications
+    that reference them.
+    """
+    Publication = apps.get_model('publications', 'Publication')
+    Finding = apps.get_model('findings', 'Finding')
+
+    Publication.objects.update(citations_count=0)
+    linked = Publication.findings.through.objects.filter(
+        finding_id=OuterRef('pk'), publication__is_active=True
+    ).order_by().values('finding_id').annotate(n=Count('id')).values('n')
+    Finding.objects.update(citations_count=Coalesce(Subquery(linked), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_user_managers'),
+        ('publications', '0003_doi_and_dedup_index'),
+        ('findings', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingAuthorMetrics',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pending_author_metrics', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('marked_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'pending_author_metrics',
+                'ordering': ['marked_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Citation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cited_doi', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cited', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='citations', to='publications.publication')),
+                ('citing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='references', to='publications.publication')),
+            ],
+            options={
+                'db_table': 'citations',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['cited_doi'], name='citation_doi_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='citation',
+            constraint=models.UniqueConstraint(condition=models.Q(('cited__isnull', False)), fields=('citing', 'cited'), name='citation_unique_publication'),
+        ),
+        migrations.AddConstraint(
+            model_name='citation',
+            constraint=models.UniqueConstraint(condition=models.Q(('cited_doi', ''), _negated=True), fields=('citing', 'cited_doi'), name='citation_unique_doi'),
+        ),
+        migrations.AddConstraint(
+            model_name='citation',
+            constraint=models.CheckConstraint(check=models.Q(('cited__isnull', False), models.Q(('cited_doi', ''), _negated=True), _connector='OR'), name='citation_has_target'),
+        ),
+        migrations.RunPython(reset_citation_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0002_initial'),
+        ('publications', '0004_citations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublicationImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/publications/%Y/%m/')),
+                ('file_format', models.CharField(choices=[('bibtex', 'BibTeX'), ('ris', 'RIS'), ('csl_json', 'CSL-JSON')], max_length=20)),
+                ('publication_status', models.CharField(choices=[('draft', 'Draft'), ('submitted', 'Submitted'), ('in_review', 'In Review'), ('accepted', 'Accepted'), ('published', 'Published'), ('rejected', 'Rejected')], default='published', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('processed_count', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('skipped_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='publication_imports', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='publication_imports', to='projects.project')),
+            ],
+            options={
+                'db_table': 'publication_import_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:04
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_citation_text(apps, schema_editor):
+    Publication = apps.get_model('publications', 'Publication')
+    Through = Publication.authors.through
+    ids = list(Publication.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), 500):
+        batch = ids[start:start + 500]
+        names = defaultdict(list)
+        for publication_id, first_name, last_name in Through.objects.filter(
+            publication_id__in=batch
+        ).order_by('id').values_list('publication_id', 'user__first_name', 'user__last_name'):
+            names[publication_id].append(f"{first_name} {last_name}")
+        publications = list(Publication.objects.filter(id__in=batch))
+        for publication in publications:
+            authors = ", ".join(names[publication.id][:3])
+            if len(names[publication.id]) > 3:
+                authors += " et al."
+            year = publication.publication_date.year if publication.publication_date else "n.d."
+            venue = publication.journal or publication.conference or "Unpublished"
+            publication.citation_text = f"{authors} ({year}). {publication.title}. {venue}."
+        Publication.objects.bulk_update(publications, ['citation_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0005_import_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='citation_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_citation_text, migrations.RunPython.noop),
+    ]
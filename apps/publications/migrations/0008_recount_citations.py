@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def recount_citations(apps, schema_editor):
+    """Counts kept by +1/-1 missed deactivated citing publications; recount them."""
+    Publication = apps.get_model('publications', 'Publication')
+    Citation = apps.get_model('publications', 'Citation')
+    citing = Citation.objects.filter(
+        cited_id=OuterRef('pk'), citing__is_active=True
+    ).order_by().values('cited_id').annotate(n=Count('id')).values('n')
+    Publication.objects.update(citations_count=Coalesce(Subquery(citing), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0006_citation_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_citations, migrations.RunPython.noop),
+    ]
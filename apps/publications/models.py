@@ -1,11 +1,39 @@
+import re
+
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from apps.common.models import RollupTrackedMixin
+
 
 User = get_user_model()
 
+DOI_PREFIX_RE = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.IGNORECASE)
+
+
+def normalize_doi(value):
+    """
+    Strip resolver prefixes (``https://doi.org/``, ``doi:``) and whitespace.
+    Returns ``None`` for empty values.
+    """
+    if not value:
+        return None
+    return DOI_PREFIX_RE.sub('', value.strip()).strip() or None
+
+
+def format_citation(author_names, author_total, title, journal, conference, publication_date):
+    """Short reference: first three authors, year, title and venue."""
+    authors = ", ".join(author_names[:3])
+    if author_total > 3:
+        authors += " et al."
+
+    year = publication_date.year if publication_date else "n.d."
+    venue = journal or conference or "Unpublished"
 
-class Publication(models.Model):
+    return f"{authors} ({year}). {title}. {venue}."
+
+
+class Publication(RollupTrackedMixin, models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
         ('submitted', 'Submitted'),
@@ -22,11 +50,15 @@ class Publication(models.Model):
     conference = models.CharField(max_length=255, blank=True, null=True)
     publication_date = models.DateField(blank=True, null=True)
     doi = models.CharField(max_length=255, blank=True, null=True)
+    # Lower-cased DOI, unique among active publications (DOIs are case-insensitive)
+    doi_normalized = models.CharField(max_length=255, blank=True, null=True, editable=False)
     url = models.URLField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     project = models.ForeignKey('projects.Project', on_delete=models.CASCADE, related_name='publications')
     findings = models.ManyToManyField('findings.Finding', blank=True, related_name='publications')
     citations_count = models.PositiveIntegerField(default=0)
+    # Precomputed by formatting.refresh_citation_text when authors or venue change
+    citation_text = models.TextField(blank=True, default='', editable=False)
     views_count = models.PositiveIntegerField(default=0)
     downloads_count = models.PositiveIntegerField(default=0)
     tags = models.ManyToManyField('tags.Tag', blank=True, related_name='publications')
@@ -39,17 +71,171 @@ class Publication(models.Model):
     class Meta:
         db_table = 'publications'
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['doi_normalized'],
+                condition=models.Q(is_active=True),
+                name='publication_doi_unique'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        normalized = normalize_doi(self.doi)
+        self.doi_normalized = normalized.lower() if normalized else None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'doi' in update_fields:
+            if self._is_legacy_duplicate():
+                self.doi_normalized = None
+        if update_fields is not None and 'doi' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'doi_normalized'}
+        super().save(*args, **kwargs)
+
+    def _is_legacy_duplicate(self):
+        """
+        Whether this is a legacy duplicate that migration 0003 left without
+        ``doi_normalized`` because an older active publication had its DOI.
+        It keeps the DOI unclaimed until it is merged or the other one goes.
+        """
+        if self.pk is None or self.doi_normalized is None or not self.is_active:
+            return False
+        stored = type(self)._base_manager.filter(pk=self.pk).values_list('doi', 'doi_normalized').first()
+        if stored is None or stored[1] is not None:
+            return False
+        stored_doi = normalize_doi(stored[0])
+        if stored_doi is None or stored_doi.lower() != self.doi_normalized:
+            return False
+        return type(self)._base_manager.filter(
+            is_active=True, doi_normalized=self.doi_normalized
+        ).exclude(pk=self.pk).exists()
 
     @property
     def citation(self):
-        authors_str = ", ".join([author.full_name for author in self.authors.all()[:3]])
-        if self.authors.count() > 3:
-            authors_str += " et al."
+        if self.citation_text or not self.pk:
+            return self.citation_text
+        names = [
+            f"{first_name} {last_name}"
+            for first_name, last_name in self.authors.through.objects.filter(
+                publication_id=self.pk
+            ).order_by('id').values_list('user__first_name', 'user__last_name')
+        ]
+        return format_citation(
+            names, len(names), self.title, self.journal, self.conference, self.publication_date
+        )
 
-        year = self.publication_date.year if self.publication_date else "n.d."
-        venue = self.journal or self.conference or "Unpublished"
+    def __str__(self):
+        return self.title
 
-        return f"{authors_str} ({year}). {self.title}. {venue}."
+
+class PublicationFingerprint(models.Model):
+    """MinHash signature of a publication's title and abstract."""
+    publication = models.OneToOneField(Publication, on_delete=models.CASCADE, related_name='fingerprint')
+    signature = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'publication_fingerprints'
 
     def __str__(self):
-        return self.title
+        return f"Fingerprint of {self.publication}"
+
+
+class PublicationBand(models.Model):
+    """One LSH band of a fingerprint; publications sharing a key are candidates."""
+    publication = models.ForeignKey(Publication, on_delete=models.CASCADE, related_name='dedup_bands')
+    key = models.BigIntegerField(db_index=True)
+
+    class Meta:
+        db_table = 'publication_bands'
+
+    def __str__(self):
+        return f"{self.publication_id}: {self.key}"
+
+
+class Citation(models.Model):
+    """
+    A reference from one publication to another. References to works that
+    are not in the system keep only ``cited_doi``; ``cited`` is filled in
+    once a publication with that DOI is created.
+    """
+    citing = models.ForeignKey(Publication, on_delete=models.CASCADE, related_name='references')
+    cited = models.ForeignKey(Publication, on_delete=models.CASCADE, null=True, blank=True,
+                              related_name='citations')
+    cited_doi = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'citations'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['citing', 'cited'],
+                condition=models.Q(cited__isnull=False),
+                name='citation_unique_publication'
+            ),
+            models.UniqueConstraint(
+                fields=['citing', 'cited_doi'],
+                condition=~models.Q(cited_doi=''),
+                name='citation_unique_doi'
+            ),
+            models.CheckConstraint(
+                check=models.Q(cited__isnull=False) | ~models.Q(cited_doi=''),
+                name='citation_has_target'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['cited_doi'], name='citation_doi_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.citing} cites {self.cited or self.cited_doi}"
+
+
+class PendingAuthorMetrics(models.Model):
+    """Authors whose citation_count/h_index need recomputing."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='pending_author_metrics')
+    marked_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'pending_author_metrics'
+        ordering = ['marked_at']
+
+    def __str__(self):
+        return f"{self.user_id} pending since {self.marked_at}"
+
+
+class PublicationImportJob(models.Model):
+    """A BibTeX/RIS/CSL-JSON file being imported into a project."""
+    FORMAT_CHOICES = [
+        ('bibtex', 'BibTeX'),
+        ('ris', 'RIS'),
+        ('csl_json', 'CSL-JSON'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    project = models.ForeignKey('projects.Project', on_delete=models.CASCADE, related_name='publication_imports')
+    file = models.FileField(upload_to='imports/publications/%Y/%m/')
+    file_format = models.CharField(max_length=20, choices=FORMAT_CHOICES)
+    publication_status = models.CharField(max_length=20, choices=Publication.STATUS_CHOICES, default='published')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    processed_count = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='publication_imports')
+
+    class Meta:
+        db_table = 'publication_import_jobs'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import {self.id} ({self.get_file_format_display()}, {self.status})"
@@ -1,9 +1,36 @@
 from rest_framework import serializers
-from .models import Publication
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from .models import Citation, Publication, PublicationImportJob, normalize_doi
+from apps.comments.validators import validate_doi
 from apps.users.serializers import UserSerializer
 from apps.projects.serializers import ProjectSerializer
 
 
+def validate_unique_doi(value, instance=None):
+    """Normalize a DOI, check its format and that no active publication uses it."""
+    doi = normalize_doi(value)
+    if doi is None:
+        return None
+    try:
+        validate_doi(doi)
+    except DjangoValidationError as exc:
+        raise serializers.ValidationError(exc.messages)
+
+    check_doi_available(doi, instance)
+    return doi
+
+
+def check_doi_available(doi, instance=None):
+    """Raise a ValidationError if an active publication other than ``instance`` uses ``doi``."""
+    existing = Publication.objects.filter(is_active=True, doi_normalized=doi.lower())
+    if instance is not None:
+        existing = existing.exclude(pk=instance.pk)
+    existing_id = existing.values_list('id', flat=True).first()
+    if existing_id is not None:
+        raise serializers.ValidationError(f"A publication with this DOI already exists (ID {existing_id})")
+
+
 class PublicationSerializer(serializers.ModelSerializer):
     authors = UserSerializer(many=True, read_only=True)
     project = ProjectSerializer(read_only=True)
@@ -60,6 +87,9 @@ class PublicationCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Abstract must be at least 10 characters long")
         return value
 
+    def validate_doi(self, value):
+        return validate_unique_doi(value)
+
 
 class PublicationUpdateSerializer(serializers.ModelSerializer):
     author_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
@@ -73,3 +103,78 @@ class PublicationUpdateSerializer(serializers.ModelSerializer):
             'publication_date', 'doi', 'url', 'status', 'finding_ids',
             'tags', 'is_active'
         ]
+
+    def validate_doi(self, value):
+        return validate_unique_doi(value, self.instance)
+
+    def validate(self, attrs):
+        # Saving recomputes doi_normalized from the stored DOI, so an edit that
+        # leaves the DOI alone still claims it (e.g. on reactivation). Legacy
+        # duplicates have none and keep it unclaimed (Publication.save).
+        if (
+            self.instance is not None and 'doi' not in attrs and self.instance.doi_normalized is not None
+            and attrs.get('is_active', self.instance.is_active)
+        ):
+            doi = normalize_doi(self.instance.doi)
+            if doi is not None:
+                try:
+                    check_doi_available(doi, self.instance)
+                except serializers.ValidationError as exc:
+                    raise serializers.ValidationError({'doi': exc.detail})
+        return attrs
+
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError:
+            # Another request stored the same DOI after validation ran
+            raise serializers.ValidationError({'doi': ['A publication with this DOI already exists']})
+
+
+class CitationSerializer(serializers.ModelSerializer):
+    citing_title = serializers.CharField(source='citing.title', read_only=True)
+    cited_title = serializers.CharField(source='cited.title', read_only=True, default=None)
+
+    class Meta:
+        model = Citation
+        fields = ['id', 'citing', 'citing_title', 'cited', 'cited_title', 'cited_doi', 'created_at']
+        read_only_fields = fields
+
+
+class CitationCreateSerializer(serializers.Serializer):
+    cited_id = serializers.IntegerField(required=False)
+    doi = serializers.CharField(max_length=255, required=False)
+
+    def validate_doi(self, value):
+        doi = normalize_doi(value)
+        if doi is None:
+            raise serializers.ValidationError("DOI cannot be blank")
+        try:
+            validate_doi(doi)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+        return doi.lower()
+
+    def validate(self, attrs):
+        if ('cited_id' in attrs) == ('doi' in attrs):
+            raise serializers.ValidationError("Provide exactly one of cited_id or doi")
+        return attrs
+
+
+class PublicationImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PublicationImportJob
+        fields = [
+            'id', 'project', 'file_format', 'publication_status', 'status',
+            'processed_count', 'created_count', 'skipped_count', 'failed_count',
+            'errors', 'created_at', 'started_at', 'finished_at', 'created_by'
+        ]
+        read_only_fields = fields
+
+
+class PublicationImportCreateSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    project_id = serializers.IntegerField()
+    file_format = serializers.ChoiceField(choices=PublicationImportJob.FORMAT_CHOICES, required=False)
+    publication_status = serializers.ChoiceField(choices=Publication.STATUS_CHOICES, default='published')
@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import citations, dedup, formatting
+from .models import Citation, Publication
+
+
+User = get_user_model()
+
+CITATION_TEXT_FIELDS = {'title', 'journal', 'conference', 'publication_date'}
+
+
+@receiver(post_save, sender=Publication)
+def index_publication_fingerprint(sender, instance, update_fields=None, **kwargs):
+    """Refresh the near-duplicate index when the title or abstract may have changed"""
+    if update_fields is None or {'title', 'abstract'} & set(update_fields):
+        dedup.index_publication(instance)
+
+
+@receiver(pre_save, sender=Publication)
+def remember_citation_state(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored is_active and DOI so post_save can tell what changed"""
+    if instance.pk and (update_fields is None or {'is_active', 'doi'} & set(update_fields)):
+        instance._citation_state = Publication._base_manager.filter(pk=instance.pk).values_list(
+            'is_active', 'doi_normalized'
+        ).first()
+
+
+@receiver(post_save, sender=Publication)
+def refresh_publication_citations(sender, instance, created, update_fields=None, **kwargs):
+    """Attach DOI-only citations to a new publication; refresh counts and metrics on changes"""
+    if created:
+        citations.resolve_external_citations([instance])
+        return
+    previous = instance.__dict__.pop('_citation_state', None)
+    if previous is not None:
+        was_active, previous_doi = previous
+        if was_active != instance.is_active:
+            # Publications this one cites gain or lose a citing publication.
+            citations.recount_publications(
+                instance.references.filter(cited__isnull=False).values_list('cited_id', flat=True)
+            )
+        if was_active != instance.is_active or previous_doi != instance.doi_normalized:
+            citations.sync_external_citations(instance)
+    # Counter-only saves (views, downloads) pass update_fields and cannot
+    # change is_active.
+    if update_fields is None:
+        citations.recount_findings(instance.findings.values_list('id', flat=True))
+        citations.mark_publication_authors_dirty([instance.id])
+
+
+@receiver(pre_delete, sender=Publication)
+def mark_deleted_publication_authors(sender, instance, **kwargs):
+    citations.mark_publication_authors_dirty([instance.id])
+
+
+def _counts(citation):
+    # Only active citing publications count.
+    return citation.cited_id is not None and Publication.objects.filter(
+        id=citation.citing_id, is_active=True
+    ).exists()
+
+
+@receiver(post_save, sender=Citation)
+def count_added_citation(sender, instance, created, **kwargs):
+    if created and _counts(instance):
+        citations.add_citations(instance.cited_id, 1)
+
+
+@receiver(post_delete, sender=Citation)
+def count_removed_citation(sender, instance, **kwargs):
+    if _counts(instance):
+        citations.add_citations(instance.cited_id, -1)
+
+
+@receiver(m2m_changed, sender=Publication.findings.through)
+def recount_finding_citations(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Finding.citations_count equal to the number of active publications linking it"""
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            citations.recount_findings([instance.pk])
+    elif action == 'pre_clear':
+        instance._cleared_finding_ids = list(instance.findings.values_list('id', flat=True))
+    elif action == 'post_clear':
+        citations.recount_findings(getattr(instance, '_cleared_finding_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        citations.recount_findings(pk_set)
+
+
+@receiver(m2m_changed, sender=Publication.authors.through)
+def mark_changed_authors(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            citations.mark_authors_dirty([instance.pk])
+    elif action == 'pre_clear':
+        citations.mark_authors_dirty(instance.authors.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        citations.mark_authors_dirty(pk_set)
+
+
+@receiver(post_save, sender=Publication)
+def refresh_publication_citation_text(sender, instance, created, update_fields=None, **kwargs):
+    # New publications have no authors yet; adding them refreshes the text.
+    if not created and (update_fields is None or CITATION_TEXT_FIELDS & set(update_fields)):
+        formatting.refresh_citation_text([instance.pk])
+
+
+@receiver(m2m_changed, sender=Publication.authors.through)
+def refresh_author_citation_text(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            formatting.refresh_citation_text([instance.pk])
+    elif action == 'pre_clear':
+        instance._cleared_publication_ids = list(instance.authored_publications.values_list('id', flat=True))
+    elif action == 'post_clear':
+        formatting.refresh_citation_text(getattr(instance, '_cleared_publication_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        formatting.refresh_citation_text(pk_set)
+
+
+@receiver(post_save, sender=User)
+def refresh_citation_text_for_author(sender, instance, created, update_fields=None, **kwargs):
+    """Author names are part of the precomputed reference"""
+    if created or not (update_fields is None or {'first_name', 'last_name'} & set(update_fields)):
+        return
+    formatting.refresh_citation_text(instance.authored_publications.values_list('id', flat=True))
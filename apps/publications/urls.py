@@ -5,4 +5,12 @@ from . import views
 urlpatterns = [
     path('', views.PublicationListCreateView.as_view(), name='publication-list-create'),
     path('<int:pk>/', views.PublicationDetailView.as_view(), name='publication-detail'),
+    path('export/', views.PublicationExportView.as_view(), name='publication-export'),
+    path('imports/', views.PublicationImportListCreateView.as_view(), name='publication-import-list-create'),
+    path('imports/<int:pk>/', views.PublicationImportDetailView.as_view(), name='publication-import-detail'),
+    path('<int:pk>/related/', views.related_publications, name='publication-related'),
+    path('<int:pk>/references/', views.PublicationReferenceListCreateView.as_view(), name='publication-references'),
+    path('<int:pk>/references/<int:citation_id>/', views.PublicationReferenceDeleteView.as_view(),
+         name='publication-reference-delete'),
+    path('<int:pk>/citations/', views.PublicationCitationListView.as_view(), name='publication-citations'),
 ]
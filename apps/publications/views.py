@@ -1,15 +1,24 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .models import Publication
-from .serializers import PublicationSerializer, PublicationCreateSerializer, PublicationUpdateSerializer
+from .models import Citation, Publication, PublicationImportJob
+from . import dedup, formatting, importers
+from .serializers import (
+    PublicationSerializer, PublicationCreateSerializer, PublicationUpdateSerializer,
+    CitationSerializer, CitationCreateSerializer, PublicationImportJobSerializer,
+    PublicationImportCreateSerializer
+)
 from apps.projects.models import Project
 from apps.findings.models import Finding
 from apps.tags.models import Tag
+from apps.analytics import trending
+from apps.tags.related import related_items
 
 
 User = get_user_model()
@@ -75,11 +84,19 @@ class PublicationListCreateView(generics.ListCreateAPIView):
                 {'detail': f'Findings with IDs {invalid_findings} do not exist'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        publication = serializer.save(
-            project=project,
-            created_by=request.user,
-            updated_by=request.user
-        )
+        try:
+            with transaction.atomic():
+                publication = serializer.save(
+                    project=project,
+                    created_by=request.user,
+                    updated_by=request.user
+                )
+        except IntegrityError:
+            # Another request stored the same DOI after validation ran
+            return Response(
+                {'doi': ['A publication with this DOI already exists']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         for author in valid_authors:
             publication.authors.add(author)
 
@@ -90,8 +107,12 @@ class PublicationListCreateView(generics.ListCreateAPIView):
             tag, created = Tag.objects.get_or_create(name=tag_name)
             publication.tags.add(tag)
         response_serializer = PublicationSerializer(publication)
-        headers = self.get_success_headers(response_serializer.data)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+        data = response_serializer.data
+        data['possible_duplicates'] = dedup.possible_duplicates(
+            publication.title, publication.abstract, exclude_id=publication.id
+        )
+        headers = self.get_success_headers(data)
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
 
 
 class PublicationDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -112,6 +133,7 @@ class PublicationDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance = self.get_object()
         instance.views_count += 1
         instance.save(update_fields=['views_count'])
+        trending.record(instance, 'view')
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -119,8 +141,7 @@ class PublicationDetailView(generics.RetrieveUpdateDestroyAPIView):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
 
-        if (not instance.authors.filter(id=request.user.id).exists() and
-                not request.user.is_staff):
+        if not _can_edit_publication(request.user, instance):
             return Response(
                 {'detail': 'Only publication authors or admin can update publication'},
                 status=status.HTTP_403_FORBIDDEN
@@ -186,9 +207,189 @@ class PublicationDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Response(PublicationSerializer(publication).data)
 
     def perform_destroy(self, instance):
-        if (not instance.authors.filter(id=self.request.user.id).exists() and
-                not self.request.user.is_staff):
+        if not _can_edit_publication(self.request.user, instance):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("Only publication authors or admin can delete publication")
         instance.is_active = False
         instance.save()
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def related_publications(request, pk):
+    """List findings and publications related to a publication"""
+    publication = get_object_or_404(Publication, id=pk, is_active=True)
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+    except ValueError:
+        return Response(
+            {'detail': 'limit must be an integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response({'results': related_items(publication, limit)})
+
+
+def _can_edit_publication(user, publication):
+    # Imported publications may have no author with an account; their importer edits them.
+    return user.is_staff or publication.authors.filter(id=user.id).exists() or (
+        publication.created_by_id == user.id and not publication.authors.exists()
+    )
+
+
+class PublicationReferenceListCreateView(generics.ListCreateAPIView):
+    """List the works a publication cites or add a reference"""
+
+    def get_permissions(self):
+        if self.request.method == 'POST':
+            return [IsAuthenticated()]
+        return [AllowAny()]
+
+    def get_serializer_class(self):
+        if self.request.method == 'POST':
+            return CitationCreateSerializer
+        return CitationSerializer
+
+    def get_publication(self):
+        return get_object_or_404(Publication, id=self.kwargs['pk'], is_active=True)
+
+    def get_queryset(self):
+        return Citation.objects.filter(citing_id=self.kwargs['pk']).select_related('citing', 'cited')
+
+    def create(self, request, *args, **kwargs):
+        publication = self.get_publication()
+        if not _can_edit_publication(request.user, publication):
+            return Response(
+                {'detail': 'Only publication authors or admin can add references'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        cited_id = serializer.validated_data.get('cited_id')
+        doi = serializer.validated_data.get('doi', '')
+        if cited_id is None:
+            # Link to the publication when the DOI is already in the system.
+            cited_id = Publication.objects.filter(
+                is_active=True, doi_normalized=doi
+            ).values_list('id', flat=True).first()
+        elif not Publication.objects.filter(id=cited_id, is_active=True).exists():
+            return Response(
+                {'detail': f'Publication with ID {cited_id} does not exist'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if cited_id == publication.id:
+            return Response(
+                {'detail': 'A publication cannot cite itself'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            with transaction.atomic():
+                citation = Citation.objects.create(citing=publication, cited_id=cited_id, cited_doi=doi)
+        except IntegrityError:
+            return Response(
+                {'detail': 'This reference already exists'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(CitationSerializer(citation).data, status=status.HTTP_201_CREATED)
+
+
+class PublicationReferenceDeleteView(generics.DestroyAPIView):
+    """Remove a reference from a publication"""
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        citation = get_object_or_404(
+            Citation.objects.select_related('citing'),
+            id=self.kwargs['citation_id'], citing_id=self.kwargs['pk']
+        )
+        if not _can_edit_publication(self.request.user, citation.citing):
+            from rest_framework.exceptions import PermissionDenied
+            raise PermissionDenied("Only publication authors or admin can remove references")
+        return citation
+
+
+class PublicationCitationListView(generics.ListAPIView):
+    """List the publications that cite a publication"""
+    serializer_class = CitationSerializer
+    permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        publication = get_object_or_404(Publication, id=self.kwargs['pk'], is_active=True)
+        return Citation.objects.filter(
+            cited=publication, citing__is_active=True
+        ).select_related('citing', 'cited')
+
+
+class PublicationImportListCreateView(generics.ListCreateAPIView):
+    """List your publication imports or upload a BibTeX/RIS/CSL-JSON file"""
+    permission_classes = [IsAuthenticated]
+
+    def get_serializer_class(self):
+        if self.request.method == 'POST':
+            return PublicationImportCreateSerializer
+        return PublicationImportJobSerializer
+
+    def get_queryset(self):
+        importers.fail_stale_jobs()
+        return PublicationImportJob.objects.filter(created_by=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        project = get_object_or_404(Project, id=serializer.validated_data['project_id'], is_active=True)
+        if not project.members.filter(user=request.user, is_active=True).exists():
+            return Response(
+                {'detail': 'Only project members can import publications'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        upload = serializer.validated_data['file']
+        file_format = serializer.validated_data.get('file_format') or importers.detect_format(upload.name)
+        if file_format is None:
+            return Response(
+                {'detail': 'Could not detect the file format; pass file_format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        with transaction.atomic():
+            job = PublicationImportJob.objects.create(
+                project=project,
+                file=upload,
+                file_format=file_format,
+                publication_status=serializer.validated_data['publication_status'],
+                created_by=request.user
+            )
+            importers.start_job(job)
+        return Response(PublicationImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class PublicationImportDetailView(generics.RetrieveAPIView):
+    """Get the progress of a publication import"""
+    serializer_class = PublicationImportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        importers.fail_stale_jobs()
+        if self.request.user.is_staff:
+            return PublicationImportJob.objects.all()
+        return PublicationImportJob.objects.filter(created_by=self.request.user)
+
+
+class PublicationExportView(generics.GenericAPIView):
+    """Export publications as BibTeX or CSL-JSON (``?file_format=``)"""
+    queryset = Publication.objects.filter(is_active=True)
+    permission_classes = [AllowAny]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status', 'project', 'authors', 'tags']
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.query_params.get('file_format', 'bibtex')
+        if file_format not in formatting.EXPORT_FORMATS:
+            return Response(
+                {'detail': f'file_format must be one of {list(formatting.EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        tag = request.query_params.get('tag')
+        if tag:
+            queryset = queryset.filter(tags__slug=tag)
+        return formatting.stream_export(queryset.distinct(), file_format)
@@ -9,6 +9,13 @@ class ResearchGroupAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description', 'institution']
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_stats()
+
+    @admin.display(ordering='members_count')
+    def members_count(self, obj):
+        return obj.members_count
+
 
 @admin.register(ResearchGroupMember)
 class ResearchGroupMemberAdmin(admin.ModelAdmin):
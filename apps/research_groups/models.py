@@ -1,9 +1,57 @@
 from django.db import models
+from django.db.models import IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
+from apps.common.models import Rollup, RollupTrackedMixin
+
 User = get_user_model()
 
 
+def _rolled_up(field):
+    """``field`` of the outer group's rollup row."""
+    return Subquery(Rollup.objects.filter(level='group', object_id=OuterRef('pk')).values(field)[:1])
+
+
+def _per_group(queryset, group_field, aggregate):
+    """``aggregate`` over ``queryset`` for the outer group, as a correlated GROUP BY subquery."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{group_field: OuterRef('pk')}).order_by()
+            .values(group_field).annotate(value=aggregate).values('value'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+class ResearchGroupQuerySet(models.QuerySet):
+    def with_stats(self):
+        """
+        Annotate ``members_count``, ``projects_count``, ``publications_count``,
+        ``findings_count``, ``attachment_bytes`` and ``last_activity_at`` from
+        the group's rollup, and ``citations_count`` (citations of the group's
+        publications and findings) as one grouped subquery per table.
+        """
+        from apps.findings.models import Finding
+        from apps.publications.models import Publication
+
+        publications = Publication.objects.filter(is_active=True)
+        findings = Finding.objects.filter(is_active=True)
+        return self.annotate(
+            members_count=Coalesce(_rolled_up('members_count'), 0),
+            projects_count=Coalesce(_rolled_up('projects_count'), 0),
+            publications_count=Coalesce(_rolled_up('publications_count'), 0),
+            findings_count=Coalesce(_rolled_up('findings_count'), 0),
+            attachment_bytes=Coalesce(_rolled_up('attachment_bytes'), 0),
+            last_activity_at=_rolled_up('last_activity_at'),
+            citations_count=(
+                _per_group(publications, 'project__research_group', Sum('citations_count'))
+                + _per_group(findings, 'experiment__project__research_group', Sum('citations_count'))
+            ),
+        )
+
+
 class ResearchGroup(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
@@ -18,26 +66,16 @@ class ResearchGroup(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_groups')
     updated_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='updated_groups')
 
+    objects = ResearchGroupQuerySet.as_manager()
+
     class Meta:
         db_table = 'research_groups'
 
-    @property
-    def members_count(self):
-        return self.members.filter(is_active=True).count()
-
-    @property
-    def projects_count(self):
-        return self.projects.filter(is_active=True).count()
-
-    @property
-    def publications_count(self):
-        return sum(project.publications.filter(is_active=True).count() for project in self.projects.all())
-
     def __str__(self):
         return self.name
 
 
-class ResearchGroupMember(models.Model):
+class ResearchGroupMember(RollupTrackedMixin, models.Model):
     ROLE_CHOICES = [
         ('leader', 'Leader'),
         ('co_leader', 'Co-Leader'),
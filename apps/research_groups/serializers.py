@@ -1,13 +1,26 @@
+from django.db import models
 from rest_framework import serializers
+from . import stats
 from .models import ResearchGroup, ResearchGroupMember
 from apps.users.serializers import UserSerializer
 
 
+class ResearchGroupListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        groups = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        stats.attach(groups)
+        return super().to_representation(groups)
+
+
 class ResearchGroupSerializer(serializers.ModelSerializer):
     leader = UserSerializer(read_only=True)
-    members_count = serializers.ReadOnlyField()
-    projects_count = serializers.ReadOnlyField()
-    publications_count = serializers.ReadOnlyField()
+    members_count = serializers.IntegerField(read_only=True)
+    projects_count = serializers.IntegerField(read_only=True)
+    publications_count = serializers.IntegerField(read_only=True)
+    findings_count = serializers.IntegerField(read_only=True)
+    citations_count = serializers.IntegerField(read_only=True)
+    attachment_bytes = serializers.IntegerField(read_only=True)
+    last_activity_at = serializers.DateTimeField(read_only=True)
     created_by = UserSerializer(read_only=True)
     updated_by = UserSerializer(read_only=True)
 
@@ -16,13 +29,19 @@ class ResearchGroupSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'institution', 'department',
             'website', 'logo', 'leader', 'members_count', 'projects_count',
-            'publications_count', 'is_active', 'created_at', 'updated_at',
-            'created_by', 'updated_by'
+            'publications_count', 'findings_count', 'citations_count',
+            'attachment_bytes', 'last_activity_at', 'is_active', 'created_at', 'updated_at', 'created_by', 'updated_by'
         ]
         read_only_fields = [
             'id', 'leader', 'is_active', 'created_at', 'updated_at',
             'created_by', 'updated_by'
         ]
+        list_serializer_class = ResearchGroupListSerializer
+
+    def to_representation(self, instance):
+        # Groups nested in other payloads come without with_stats().
+        stats.attach([instance])
+        return super().to_representation(instance)
 
 
 class ResearchGroupCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,77 @@
+"""
+Research group statistics: members, projects, publications, findings,
+citations, attachment bytes and last activity.
+
+``ResearchGroup.objects.with_stats()`` annotates them onto a queryset,
+mostly from the group's rollup, and is what group listings use. Groups that reach a serializer without the
+annotations, such as the one nested in every project, read them from the
+cache instead. Each group is cached for
+``RESEARCH_GROUPS_STATS_CACHE_TIMEOUT`` seconds, and all misses are
+filled by one query. The rollups (``apps.common.rollups.apply``) and the
+citation recounts (``apps.publications.citations``) drop a group's entry
+once their transaction commits.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ResearchGroup
+
+
+STAT_FIELDS = (
+    'members_count', 'projects_count', 'publications_count', 'findings_count', 'citations_count',
+    'attachment_bytes', 'last_activity_at',
+)
+
+
+def cache_key(group_id):
+    return f'research_groups:stats:{group_id}'
+
+
+def invalidate(*group_ids):
+    keys = [cache_key(group_id) for group_id in set(group_ids) if group_id]
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_on_commit(*group_ids):
+    group_ids = set(group_ids)
+    if group_ids:
+        transaction.on_commit(lambda: invalidate(*group_ids))
+
+
+def has_stats(group):
+    return all(field in group.__dict__ for field in STAT_FIELDS)
+
+
+def get_many(group_ids):
+    """``{group id: stats}`` for ``group_ids``, from the cache where possible."""
+    group_ids = set(group_ids)
+    if not group_ids:
+        return {}
+    cached = cache.get_many([cache_key(group_id) for group_id in group_ids])
+    stats = {group_id: cached[cache_key(group_id)] for group_id in group_ids if cache_key(group_id) in cached}
+    missing = group_ids - set(stats)
+    if missing:
+        fresh = {
+            row.pop('id'): row
+            for row in ResearchGroup.objects.filter(id__in=missing).with_stats().values('id', *STAT_FIELDS)
+        }
+        cache.set_many(
+            {cache_key(group_id): row for group_id, row in fresh.items()},
+            settings.RESEARCH_GROUPS_STATS_CACHE_TIMEOUT,
+        )
+        stats.update(fresh)
+    return stats
+
+
+def get_stats(group_id):
+    return get_many([group_id]).get(group_id)
+
+
+def attach(groups):
+    """Set the stats on each group in ``groups`` that was fetched without them."""
+    groups = [group for group in groups if group is not None and not has_stats(group)]
+    stats = get_many(group.pk for group in groups)
+    for group in groups:
+        group.__dict__.update(stats.get(group.pk) or {**dict.fromkeys(STAT_FIELDS, 0), 'last_activity_at': None})
@@ -1,11 +1,13 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
+from . import stats
 from .models import ResearchGroup, ResearchGroupMember
 from .serializers import (
     ResearchGroupSerializer, ResearchGroupCreateSerializer,
@@ -18,11 +20,15 @@ User = get_user_model()
 
 class ResearchGroupListCreateView(generics.ListCreateAPIView):
     """List all research groups or create a new one"""
-    queryset = ResearchGroup.objects.filter(is_active=True)
+    queryset = ResearchGroup.objects.filter(is_active=True).with_stats()
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['institution', 'department']
     search_fields = ['name', 'description', 'institution']
-    ordering_fields = ['name', 'created_at', 'members_count']
+    ordering_fields = [
+        'name', 'created_at', 'members_count', 'projects_count',
+        'publications_count', 'findings_count', 'citations_count',
+        'attachment_bytes', 'last_activity_at'
+    ]
     ordering = ['name']
 
     def get_serializer_class(self):
@@ -51,7 +57,7 @@ class ResearchGroupListCreateView(generics.ListCreateAPIView):
 
 class ResearchGroupDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a research group"""
-    queryset = ResearchGroup.objects.filter(is_active=True)
+    queryset = ResearchGroup.objects.filter(is_active=True).with_stats()
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -78,6 +84,14 @@ class ResearchGroupDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.save()
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def research_group_stats(request, pk):
+    """Member, project, publication, finding and citation counts of a research group"""
+    group = get_object_or_404(ResearchGroup, id=pk, is_active=True)
+    return Response({'id': group.id, **stats.get_stats(group.id)})
+
+
 class ResearchGroupMemberListCreateView(generics.ListCreateAPIView):
     """List members of a research group or add a new member"""
     filter_backends = [DjangoFilterBackend, OrderingFilter]
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.tags.related import build
+
+
+class Command(BaseCommand):
+    help = 'Rebuild related findings/publications (incremental unless --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=10)
+        parser.add_argument('--full', action='store_true', help='Rebuild every item and recompute the IDF, not only changed ones')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rebuilt = build(top_n=options['top_n'], full=options['full'])
+        self.stdout.write(f'Rebuilt related content for {rebuilt} items in {time.monotonic() - started:.1f}s')
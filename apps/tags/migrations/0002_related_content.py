@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('related_object_id', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('related_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'db_table': 'related_content',
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['content_type', 'object_id', '-score'], name='related_source_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tags', '0002_related_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedIdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idf', models.BinaryField()),
+                ('documents_count', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'related_idf',
+                'ordering': ['-computed_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField()),
+                ('tags_signature', models.BigIntegerField()),
+                ('lsh_keys', models.JSONField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'db_table': 'related_sources',
+                'ordering': ['content_type', 'object_id'],
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 from django.utils.text import slugify
 
 
@@ -27,3 +29,56 @@ class Tag(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class RelatedContent(models.Model):
+    """Precomputed related item, rebuilt by build_related_content."""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.PositiveIntegerField()
+    related_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    related_object_id = models.PositiveIntegerField()
+    score = models.FloatField()
+    # Start time of the run that wrote the row.
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'related_content'
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', '-score'], name='related_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.content_type.model} {self.object_id} -> {self.related_content_type.model} {self.related_object_id}"
+
+
+class RelatedSource(models.Model):
+    """An item of the related-content index as of the build that last vectorized it."""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.PositiveIntegerField()
+    updated_at = models.DateTimeField()
+    tags_signature = models.BigIntegerField()
+    lsh_keys = models.JSONField()
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'related_sources'
+        ordering = ['content_type', 'object_id']
+        unique_together = ['content_type', 'object_id']
+
+    def __str__(self):
+        return f"{self.content_type.model} {self.object_id}"
+
+
+class RelatedIdf(models.Model):
+    """Inverse document frequencies of the last full build, reused by incremental ones."""
+    idf = models.BinaryField()
+    documents_count = models.PositiveIntegerField()
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'related_idf'
+        ordering = ['-computed_at']
+
+    def __str__(self):
+        return f"IDF of {self.documents_count} documents at {self.computed_at}"
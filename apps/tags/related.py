@@ -0,0 +1,324 @@
+"""
+Related findings and publications.
+
+Each public finding and active publication becomes a hashed TF-IDF vector
+over the words of its title and body plus its tags (the hashing trick keeps
+the vocabulary fixed at ``N_FEATURES`` columns, so no dictionary has to be
+stored between runs). Rows are L2-normalized, so a dot product is the cosine
+similarity.
+
+Nearest neighbours are approximate. Random-hyperplane LSH puts every vector
+in one bucket per table, and exact cosine is computed only against items
+that share a bucket in at least one table. The top N per item are stored in
+``related_content``. Incremental runs only vectorize items whose text or
+tags changed since the last run and the items around them, reusing the IDF
+and bucket keys stored by earlier runs (``related_idf``, ``related_sources``);
+run a full build now and then so the IDF follows the corpus.
+"""
+import math
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RelatedContent, RelatedIdf, RelatedSource
+
+
+N_FEATURES = 1 << 16
+TAG_WEIGHT = 2.0
+LSH_TABLES = 6
+LSH_BITS = 12
+MAX_BUCKET_CANDIDATES = 500
+LSH_SEED = 7919
+WRITE_BATCH_SIZE = 500
+
+TOKEN_RE = re.compile(r'[a-z0-9]{2,}')
+STOP_WORDS = frozenset("""
+    a an and are as at be been but by can for from has have in into is it its
+    of on or our that the their these this to was we were which with
+""".split())
+
+
+def _hash(feature):
+    # zlib.crc32 is stable across processes, unlike hash().
+    return zlib.crc32(feature.encode()) % N_FEATURES
+
+
+def _sources():
+    """Return the querysets that make up the corpus, keyed by model name."""
+    from apps.findings.models import Finding
+    from apps.publications.models import Publication
+
+    return {
+        'finding': (
+            Finding.objects.filter(is_active=True, visibility='public'),
+            ['title', 'description', 'conclusion'],
+        ),
+        'publication': (
+            Publication.objects.filter(is_active=True),
+            ['title', 'abstract'],
+        ),
+    }
+
+
+def _signature(tag_ids):
+    return zlib.crc32(','.join(map(str, sorted(tag_ids))).encode())
+
+
+def _load_items():
+    """
+    Return ``{(content_type_id, object_id): (updated_at, tag_ids)}`` for the
+    whole corpus, without the text.
+    """
+    items = {}
+    for model_name, (queryset, _) in _sources().items():
+        model = queryset.model
+        content_type = ContentType.objects.get_for_model(model)
+        tags = defaultdict(list)
+        for object_id, tag_id in model.tags.through.objects.values_list(f'{model_name}_id', 'tag_id'):
+            tags[object_id].append(tag_id)
+
+        for object_id, updated_at in queryset.values_list('id', 'updated_at').iterator(chunk_size=2000):
+            items[(content_type.id, object_id)] = (updated_at, tags.get(object_id, []))
+    return items
+
+
+def _load_texts(keys):
+    """Return ``{(content_type_id, object_id): text}`` for ``keys``."""
+    wanted = defaultdict(list)
+    for content_type_id, object_id in keys:
+        wanted[content_type_id].append(object_id)
+
+    texts = {}
+    for queryset, text_fields in _sources().values():
+        content_type_id = ContentType.objects.get_for_model(queryset.model).id
+        object_ids = wanted.get(content_type_id, [])
+        for start in range(0, len(object_ids), WRITE_BATCH_SIZE):
+            rows = queryset.filter(id__in=object_ids[start:start + WRITE_BATCH_SIZE]).values_list('id', *text_fields)
+            for row in rows:
+                texts[(content_type_id, row[0])] = ' '.join(text or '' for text in row[1:])
+    return texts
+
+
+def vectorize(documents, idf=None):
+    """
+    Build the row-normalized TF-IDF matrix for ``documents``, a list of
+    ``(text, tag_ids)``. The IDF is computed from ``documents`` unless given.
+    Returns ``(matrix, idf)``.
+    """
+    rows, cols, values = [], [], []
+    for row, (text, tag_ids) in enumerate(documents):
+        counts = defaultdict(int)
+        for token in TOKEN_RE.findall(text.lower()):
+            if token not in STOP_WORDS:
+                counts[_hash(token)] += 1
+        features = {column: 1.0 + math.log(count) for column, count in counts.items()}
+        for tag_id in tag_ids:
+            column = _hash(f'tag:{tag_id}')
+            features[column] = features.get(column, 0.0) + TAG_WEIGHT
+        rows.extend([row] * len(features))
+        cols.extend(features.keys())
+        values.extend(features.values())
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.float32), (rows, cols)),
+        shape=(len(documents), N_FEATURES)
+    )
+    if idf is None:
+        document_frequency = np.bincount(matrix.indices, minlength=N_FEATURES)
+        idf = (np.log((1.0 + len(documents)) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+    matrix = matrix @ sparse.diags(idf)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sparse.diags(1.0 / norms) @ matrix).tocsr(), idf
+
+
+def lsh_keys(matrix):
+    """Return an ``(n, LSH_TABLES)`` array of bucket keys."""
+    planes = np.random.default_rng(LSH_SEED).standard_normal(
+        (N_FEATURES, LSH_TABLES * LSH_BITS), dtype=np.float32
+    )
+    bits = np.asarray(matrix @ planes) > 0
+    powers = 1 << np.arange(LSH_BITS)
+    return np.stack([
+        bits[:, table * LSH_BITS:(table + 1) * LSH_BITS] @ powers
+        for table in range(LSH_TABLES)
+    ], axis=1)
+
+
+def _buckets(keys):
+    """Index ``{item: bucket keys}`` by table and bucket."""
+    buckets = [defaultdict(list) for _ in range(LSH_TABLES)]
+    for item, item_keys in keys.items():
+        for table, key in enumerate(item_keys):
+            buckets[table][key].append(item)
+    return buckets
+
+
+def _candidates(item_keys, buckets):
+    candidates = set()
+    for table, key in enumerate(item_keys):
+        candidates.update(buckets[table].get(key, [])[:MAX_BUCKET_CANDIDATES])
+    return candidates
+
+
+def _neighbours(item, rows, matrix, candidates, top_n):
+    # Sorted, with a stable argsort below, so ties break the same way on every run.
+    candidates = sorted(candidate for candidate in candidates if candidate != item)
+    if not candidates:
+        return []
+    scores = np.asarray(
+        (matrix[[rows[candidate] for candidate in candidates]] @ matrix[rows[item]].T).todense()
+    ).ravel()
+    order = np.argsort(-scores, kind='stable')[:top_n]
+    return [(candidates[i], float(scores[i])) for i in order if scores[i] > 0]
+
+
+def _by_type(items):
+    by_type = defaultdict(list)
+    for content_type_id, object_id in items:
+        by_type[content_type_id].append(object_id)
+    return by_type.items()
+
+
+def _delete_sources(sources, related=True):
+    for content_type_id, object_ids in _by_type(sources):
+        if related:
+            RelatedContent.objects.filter(content_type_id=content_type_id, object_id__in=object_ids).delete()
+        RelatedSource.objects.filter(content_type_id=content_type_id, object_id__in=object_ids).delete()
+
+
+def _stored_idf():
+    stored = RelatedIdf.objects.first()
+    return np.frombuffer(stored.idf, dtype=np.float32) if stored else None
+
+
+def build(top_n=10, full=False):
+    """
+    Recompute related content. Returns the number of items whose related
+    list was rebuilt.
+
+    A full build vectorizes the whole corpus and stores its IDF. An
+    incremental one reuses that IDF and only vectorizes the items whose text
+    or tags changed, the items sharing a bucket with them (whose lists are
+    rebuilt) and the bucket-mates of those (which they are scored against).
+    Unchanged items keep the bucket keys stored when they were vectorized.
+    """
+    started = timezone.now()
+    items = _load_items()
+    idf = None if full else _stored_idf()
+
+    sources = {}
+    if idf is not None:
+        for content_type_id, object_id, updated_at, signature, keys in RelatedSource.objects.values_list(
+            'content_type_id', 'object_id', 'updated_at', 'tags_signature', 'lsh_keys'
+        ).iterator(chunk_size=2000):
+            sources[(content_type_id, object_id)] = (updated_at, signature, keys)
+        # Items deleted or made private since the last run.
+        removed = set(sources) - set(items)
+    else:
+        RelatedSource.objects.all().delete()
+        removed = set(RelatedContent.objects.values_list('content_type_id', 'object_id').distinct()) - set(items)
+    _delete_sources(removed)
+
+    changed = [
+        item for item, (updated_at, tag_ids) in items.items()
+        if item not in sources
+        or sources[item][0] != updated_at
+        or sources[item][1] != _signature(tag_ids)
+    ]
+    if not changed and not removed:
+        return 0
+
+    texts = _load_texts(changed)
+    changed_matrix, changed_idf = vectorize([(texts[item], items[item][1]) for item in changed], idf)
+    if idf is None:
+        RelatedIdf.objects.all().delete()
+        RelatedIdf.objects.create(idf=changed_idf.tobytes(), documents_count=len(changed), computed_at=started)
+        idf = changed_idf
+    changed_keys = {item: row.tolist() for item, row in zip(changed, lsh_keys(changed_matrix))}
+
+    keys = {item: stored[2] for item, stored in sources.items() if item in items}
+    keys.update(changed_keys)
+    buckets = _buckets(keys)
+
+    # Changed items, their new bucket-mates, and the items that shared a
+    # bucket with a changed or removed item before.
+    affected = set(changed)
+    for item in changed:
+        affected |= _candidates(keys[item], buckets)
+    for item in removed.union(changed):
+        if item in sources:
+            affected |= _candidates(sources[item][2], buckets)
+
+    candidates = {item: _candidates(keys[item], buckets) for item in affected}
+    unchanged = sorted(set(affected).union(*candidates.values()) - set(changed))
+    texts = _load_texts(unchanged)
+    unchanged_matrix, _ = vectorize([(texts[item], items[item][1]) for item in unchanged], idf)
+    matrix = sparse.vstack([changed_matrix, unchanged_matrix]).tocsr()
+    rows = {item: row for row, item in enumerate(changed + unchanged)}
+
+    _delete_sources(changed, related=False)
+    for start in range(0, len(changed), WRITE_BATCH_SIZE):
+        RelatedSource.objects.bulk_create([
+            RelatedSource(
+                content_type_id=item[0],
+                object_id=item[1],
+                updated_at=items[item][0],
+                tags_signature=_signature(items[item][1]),
+                lsh_keys=changed_keys[item],
+                computed_at=started,
+            )
+            for item in changed[start:start + WRITE_BATCH_SIZE]
+        ])
+
+    affected = sorted(affected)
+    for start in range(0, len(affected), WRITE_BATCH_SIZE):
+        batch = affected[start:start + WRITE_BATCH_SIZE]
+        related = []
+        for item in batch:
+            for neighbour, score in _neighbours(item, rows, matrix, candidates[item], top_n):
+                related.append(RelatedContent(
+                    content_type_id=item[0],
+                    object_id=item[1],
+                    related_content_type_id=neighbour[0],
+                    related_object_id=neighbour[1],
+                    score=score,
+                    computed_at=started,
+                ))
+        with transaction.atomic():
+            for content_type_id, object_ids in _by_type(batch):
+                RelatedContent.objects.filter(content_type_id=content_type_id, object_id__in=object_ids).delete()
+            RelatedContent.objects.bulk_create(related)
+
+    return len(affected)
+
+
+def related_items(instance, limit=10):
+    """Return the stored related items of ``instance`` as dicts, best first."""
+    content_type = ContentType.objects.get_for_model(instance)
+    rows = list(
+        RelatedContent.objects.filter(content_type=content_type, object_id=instance.pk)
+        .select_related('related_content_type')[:limit]
+    )
+
+    titles = {}
+    for model_name, (queryset, _) in _sources().items():
+        ids = [row.related_object_id for row in rows if row.related_content_type.model == model_name]
+        if ids:
+            for object_id, title in queryset.filter(id__in=ids).values_list('id', 'title'):
+                titles[(model_name, object_id)] = title
+
+    results = []
+    for row in rows:
+        key = (row.related_content_type.model, row.related_object_id)
+        # Skip items deleted or hidden since the last build.
+        if key in titles:
+            results.append({'type': key[0], 'id': key[1], 'title': titles[key], 'score': round(row.score, 4)})
+    return results
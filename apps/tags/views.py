@@ -70,7 +70,7 @@ def search(request):
             Q(description__icontains=query) |
             Q(institution__icontains=query),
             is_active=True
-        )[:10]
+        ).with_stats()[:10]
         results['research_groups'] = ResearchGroupSerializer(groups, many=True).data
 
     if search_type in ['project', 'all']:
@@ -79,7 +79,7 @@ def search(request):
             Q(description__icontains=query) |
             Q(short_description__icontains=query),
             is_active=True
-        )[:10]
+        ).select_related('research_group')[:10]
         results['projects'] = ProjectSerializer(projects, many=True).data
 
     if search_type in ['experiment', 'all']:
@@ -17,6 +17,7 @@ from .serializers import (
     EmailVerificationSerializer, PasswordResetSerializer,
     PasswordResetConfirmSerializer
 )
+from apps.analytics.ingest import record_activity
 
 User = get_user_model()
 
@@ -86,6 +87,7 @@ def login(request):
     if serializer.is_valid():
         user = serializer.validated_data['user']
         refresh = RefreshToken.for_user(user)
+        record_activity(request, user, 'login')
 
         return Response({
             'access': str(refresh.access_token),
@@ -103,6 +105,7 @@ def logout(request):
         refresh_token = request.data.get('refresh')
         token = RefreshToken(refresh_token)
         token.blacklist()
+        record_activity(request, request.user, 'logout')
         return Response({'detail': 'Successfully logged out'})
     except Exception:
         return Response(
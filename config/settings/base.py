@@ -45,6 +45,7 @@ LOCAL_APPS = [
     'apps.notifications',
     'apps.analytics',
     'apps.tags',
+    'apps.feeds',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -58,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.analytics.middleware.ActivityTrackingMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -133,6 +135,33 @@ STATIC_ROOT = BASE_DIR / os.environ.get('STATIC_ROOT', 'staticfiles')
 MEDIA_URL = os.environ.get('MEDIA_URL', '/media/')
 MEDIA_ROOT = BASE_DIR / os.environ.get('MEDIA_ROOT', 'media')
 
+# File storage. Attachments go to S3 (or an S3-compatible service such as
+# MinIO, via AWS_S3_ENDPOINT_URL) when USE_S3 is set; see apps.attachments.storage
+USE_S3 = os.environ.get('USE_S3', 'False').lower() == 'true'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'attachments': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+}
+if USE_S3:
+    STORAGES['attachments'] = {
+        'BACKEND': 'apps.attachments.storage.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ.get('AWS_STORAGE_BUCKET_NAME'),
+            'endpoint_url': os.environ.get('AWS_S3_ENDPOINT_URL'),
+            'region_name': os.environ.get('AWS_S3_REGION_NAME'),
+            'access_key': os.environ.get('AWS_ACCESS_KEY_ID'),
+            'secret_key': os.environ.get('AWS_SECRET_ACCESS_KEY'),
+            'location': os.environ.get('AWS_LOCATION', ''),
+            'addressing_style': os.environ.get('AWS_S3_ADDRESSING_STYLE'),
+            'public_url': os.environ.get('AWS_S3_PUBLIC_URL'),
+            'querystring_expire': int(os.environ.get('AWS_QUERYSTRING_EXPIRE', 3600)),
+            'multipart_threshold': int(os.environ.get('AWS_S3_MULTIPART_THRESHOLD', 64 * 1024 * 1024)),
+            'multipart_chunksize': int(os.environ.get('AWS_S3_MULTIPART_CHUNKSIZE', 16 * 1024 * 1024)),
+            'max_concurrency': int(os.environ.get('AWS_S3_MAX_CONCURRENCY', 8)),
+        },
+    }
+
 # Email configuration
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
 if os.environ.get('EMAIL_HOST'):
@@ -160,6 +189,69 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Analytics activity ingestion
+ANALYTICS_ACTIVITY_BUFFER_SIZE = int(os.environ.get('ANALYTICS_ACTIVITY_BUFFER_SIZE', 50000))
+ANALYTICS_ACTIVITY_BATCH_SIZE = int(os.environ.get('ANALYTICS_ACTIVITY_BATCH_SIZE', 2000))
+ANALYTICS_ACTIVITY_FLUSH_INTERVAL = int(os.environ.get('ANALYTICS_ACTIVITY_FLUSH_INTERVAL', 5))
+ANALYTICS_ACTIVITY_RETENTION_MONTHS = int(os.environ.get('ANALYTICS_ACTIVITY_RETENTION_MONTHS', 24))
+# 'memory' keeps a separate ranking in every worker process; use it only with a single process.
+ANALYTICS_TRENDING_BACKEND = os.environ.get(
+    'ANALYTICS_TRENDING_BACKEND', 'redis' if os.environ.get('REDIS_URL') else 'memory'
+)
+ANALYTICS_TRENDING_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
+ANALYTICS_TRENDING_HALF_LIFE_HOURS = int(os.environ.get('ANALYTICS_TRENDING_HALF_LIFE_HOURS', 24))
+ANALYTICS_TRENDING_TOP_K = int(os.environ.get('ANALYTICS_TRENDING_TOP_K', 200))
+
+# Home feed
+FEEDS_FANOUT_THRESHOLD = int(os.environ.get('FEEDS_FANOUT_THRESHOLD', 1000))
+FEEDS_BACKFILL_SIZE = int(os.environ.get('FEEDS_BACKFILL_SIZE', 20))
+FEEDS_PROJECT_UPDATE_WINDOW = int(os.environ.get('FEEDS_PROJECT_UPDATE_WINDOW', 60))
+
+# Publication imports
+PUBLICATIONS_IMPORT_CHUNK_SIZE = int(os.environ.get('PUBLICATIONS_IMPORT_CHUNK_SIZE', 500))
+PUBLICATIONS_IMPORT_MAX_ERRORS = int(os.environ.get('PUBLICATIONS_IMPORT_MAX_ERRORS', 200))
+PUBLICATIONS_IMPORT_JOB_TIMEOUT = int(os.environ.get('PUBLICATIONS_IMPORT_JOB_TIMEOUT', 3600))
+
+# Resumable attachment uploads
+ATTACHMENTS_UPLOAD_CHUNK_SIZE = int(os.environ.get('ATTACHMENTS_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+ATTACHMENTS_MAX_UPLOAD_SIZE = int(os.environ.get('ATTACHMENTS_MAX_UPLOAD_SIZE', 50 * 1024 ** 3))
+ATTACHMENTS_UPLOAD_EXPIRY_HOURS = int(os.environ.get('ATTACHMENTS_UPLOAD_EXPIRY_HOURS', 24))
+# Background assembly of completed uploads, and seconds before a stuck one may be restarted
+ATTACHMENTS_UPLOAD_WORKERS = int(os.environ.get('ATTACHMENTS_UPLOAD_WORKERS', 2))
+ATTACHMENTS_UPLOAD_ASSEMBLY_TIMEOUT = int(os.environ.get('ATTACHMENTS_UPLOAD_ASSEMBLY_TIMEOUT', 1800))
+# nginx "internal" location mapped to MEDIA_ROOT; empty serves files from Django
+ATTACHMENTS_ACCEL_REDIRECT_PREFIX = os.environ.get('ATTACHMENTS_ACCEL_REDIRECT_PREFIX', '')
+ATTACHMENTS_THUMBNAIL_SIZES = [
+    int(size) for size in os.environ.get('ATTACHMENTS_THUMBNAIL_SIZES', '128,512,1024').split(',')
+]
+ATTACHMENTS_THUMBNAIL_WORKERS = int(os.environ.get('ATTACHMENTS_THUMBNAIL_WORKERS', 2))
+# Seconds before a thumbnail run still marked processing is assumed dead
+ATTACHMENTS_THUMBNAIL_TIMEOUT = int(os.environ.get('ATTACHMENTS_THUMBNAIL_TIMEOUT', 300))
+# Thumbnails and previews: attempts before giving up, and the first retry delay (doubled each time)
+ATTACHMENTS_DERIVED_MAX_ATTEMPTS = int(os.environ.get('ATTACHMENTS_DERIVED_MAX_ATTEMPTS', 3))
+ATTACHMENTS_DERIVED_RETRY_SECONDS = int(os.environ.get('ATTACHMENTS_DERIVED_RETRY_SECONDS', 60))
+ATTACHMENTS_STORAGE_WORKERS = int(os.environ.get('ATTACHMENTS_STORAGE_WORKERS', 8))
+# Used by the reap_attachments command
+ATTACHMENTS_PURGE_AFTER_DAYS = int(os.environ.get('ATTACHMENTS_PURGE_AFTER_DAYS', 30))
+ATTACHMENTS_ORPHAN_GRACE_HOURS = int(os.environ.get('ATTACHMENTS_ORPHAN_GRACE_HOURS', 24))
+ATTACHMENTS_PREVIEW_WORKERS = int(os.environ.get('ATTACHMENTS_PREVIEW_WORKERS', 1))
+# Seconds before a preview run still marked processing is assumed dead
+ATTACHMENTS_PREVIEW_TIMEOUT = int(os.environ.get('ATTACHMENTS_PREVIEW_TIMEOUT', 900))
+ATTACHMENTS_PREVIEW_SAMPLE_ROWS = int(os.environ.get('ATTACHMENTS_PREVIEW_SAMPLE_ROWS', 20))
+# Rows read per NumPy batch, and the most rows scanned for statistics
+ATTACHMENTS_PREVIEW_CHUNK_ROWS = int(os.environ.get('ATTACHMENTS_PREVIEW_CHUNK_ROWS', 10000))
+ATTACHMENTS_PREVIEW_MAX_ROWS = int(os.environ.get('ATTACHMENTS_PREVIEW_MAX_ROWS', 1000000))
+
+# Project dashboards are cached and dropped on writes to the project
+PROJECTS_DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('PROJECTS_DASHBOARD_CACHE_TIMEOUT', 300))
+
+# Stats of research groups shown nested in other payloads
+RESEARCH_GROUPS_STATS_CACHE_TIMEOUT = int(os.environ.get('RESEARCH_GROUPS_STATS_CACHE_TIMEOUT', 300))
+
+# Buffered counters (apps.common.counters)
+COUNTERS_FLUSH_INTERVAL = int(os.environ.get('COUNTERS_FLUSH_INTERVAL', 5))
+COUNTERS_MAX_PENDING = int(os.environ.get('COUNTERS_MAX_PENDING', 1000))
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -17,6 +17,15 @@ DATABASES = {
     }
 }
 
+# Cache - shared between instances when Redis is available
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+
 # Static files for production
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'config' / 'staticfiles'
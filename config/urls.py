@@ -25,6 +25,7 @@ urlpatterns = [
     path('api/v1/notifications/', include('apps.notifications.urls')),
     path('api/v1/analytics/', include('apps.analytics.urls')),
     path('api/v1/tags/', include('apps.tags.urls')),
+    path('api/v1/feed/', include('apps.feeds.urls')),
 
     path('api/v1/', include('apps.likes.urls')),
 